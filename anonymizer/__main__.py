@@ -1,6 +1,10 @@
+import os
+import tempfile
 import pandas as pd
 from anonymizer import anonymisation, pseudonymisation, datamanager, detection
 from datamanager import WorkData
+# a többi modul is így importálja, így a hookok egyetlen közös listában vannak
+import instrumentation
 
 column_names = tuple()
 sensitive_column = ''
@@ -15,7 +19,7 @@ column_names = (
     'nev', 'kor', 'email', 'telefonszam', 'bankszamla', 'rendszam', 'idopont', 'koord1', 'koord2'
 )
 sensitive_column = 'nev'
-df = pd.read_csv('data/test.csv', index_col=False, header=None, names=column_names)
+df = datamanager.read_dataset('data/test.csv', column_names=column_names)
 categorical = {'nev',
                'email',
                'telefonszam',
@@ -31,28 +35,143 @@ testclass = WorkData(df, sensitive_column, K, L, P, categorical=categorical)
 # datamanager.replace_nan_values(df, categorical) # ezt azelott kell megcsinalni, mielott a kategoriakat hozzarendelem a tablazathoz, mert kesobb nem fogja engedni a modositast
 
 
-def auto_anon_and_pseud(workdata: WorkData, func: str):
-
-    labels_csv = detection.find_and_label(workdata.df, datamanager.read_labels_file())
+def auto_anon_and_pseud(workdata: WorkData, func: str, output_path='data/output/outputtest.csv', dataset=None):
+    rows = len(workdata.df)
+    with instrumentation.stage('detection', rows=rows):
+        labels_csv = detection.find_and_label(workdata.df, datamanager.read_labels_file(), dataset=dataset)
     workdata.feature_columns = list(labels_csv['name'].unique())
 
     if workdata.sensitive_column in workdata.feature_columns:
         workdata.feature_columns.remove(workdata.sensitive_column)
 
-    pseudonymisation.auto_pseudonymise_by_label(workdata, labels_csv)
+    with instrumentation.stage('pseudonymisation', rows=rows):
+        pseudonymisation.auto_pseudonymise_by_label(workdata, labels_csv)
 
-    for name in workdata.categorical:
-        workdata.df[name] = workdata.df[name].astype('category')
+    with instrumentation.stage('categorical conversion', rows=rows):
+        for name in workdata.categorical:
+            workdata.df[name] = workdata.df[name].astype('category')
 
-    workdata.df = anonymisation.anonymise_dataset(workdata, func)
-    pseudonymisation.auto_pseudonymise_id_data(workdata, labels_csv)
+    with instrumentation.stage('anonymisation', rows=rows, func=func):
+        workdata.df = anonymisation.anonymise_dataset(workdata, func)
+    with instrumentation.stage('identifier pseudonymisation', rows=len(workdata.df)):
+        pseudonymisation.auto_pseudonymise_id_data(workdata, labels_csv)
 
-    workdata.df.to_csv(path_or_buf='data/output/outputtest.csv', index=False)
+    with instrumentation.stage('output', rows=len(workdata.df)):
+        datamanager.write_dataset(workdata.df, output_path)
     return workdata.df
 
 
+def auto_anon_and_pseud_streaming(input_path, output_path, column_names, sensitive_column, categorical, k, ldiv, p,
+                                  func, chunksize=100000, sample_size=10000, pseudonym_key=None, mapping_store=None):
+    """
+    Az auto_anon_and_pseud() darabokban olvasó változata, nagy fileokhoz. A címkézés az első sample_size soron történik,
+    az eredmény a bemeneti file neve szerint gyorsítótárazódik (lásd detection.find_and_label()).
+    A soronként elvégezhető pszeudonimizálás (email, ország, életkor intervallum) darabonként, a darabok között
+    megőrzött hozzárendelésekkel történik, az eredmény egy ideiglenes fileba íródik. A memóriában csak az anonimizálandó
+    oszlopok és a szenzitív oszlop maradnak meg. Az anonimizálás után az ideiglenes file darabonként újra beolvasódik, az
+    anonimizált oszlopok visszaíródnak, az azonosítók számmá alakulnak, és a darabok a kimeneti fileba íródnak. Az
+    auto_anon_and_pseud() függvénnyel ellentétben a sorok az eredeti sorrendjükben maradnak. A bemeneti és kimeneti file
+    lehet csv, Parquet vagy Feather is (lásd datamanager.read_dataset()), Parquet bemenet esetén a darabok a
+    sorcsoportokból készülnek. Oszlopos kimenet esetén az ideiglenes file Parquet formátumú, és a kategorikus
+    oszlopok anonimizált értékei kategorikus típusként íródnak ki.
+    :param input_path: a bemeneti file
+    :param output_path: a kimeneti file
+    :param column_names: fejléc nélküli csv bemenet esetén az oszlopok nevei, egyébként None
+    :param sensitive_column: a szenzitív oszlop
+    :param categorical: a kategorikus oszlopok halmaza
+    :param k: k-anonimitás paramétere
+    :param ldiv: l-diverzitás paramétere
+    :param p: t-közeliség paramétere
+    :param func: az anonimizáló függvény: 'k', 'l', 't' vagy 'g'
+    :param chunksize: egy darabban beolvasott sorok száma
+    :param sample_size: a címkézéshez használt sorok száma
+    :param pseudonym_key: ha meg van adva, akkor a pszeudonimizálás ezzel a titkos kulccsal, determinisztikusan történik
+    :param mapping_store: ha meg van adva, akkor a kiosztott pszeudonimek ebbe a datamanager.MappingStore tárba is
+    elmentődnek
+    :return: a kimeneti file sorainak száma
+    """
+    sample = datamanager.read_dataset(input_path, column_names=column_names, nrows=sample_size)
+    with instrumentation.stage('detection', rows=len(sample)):
+        labels_csv = detection.find_and_label(sample, datamanager.read_labels_file(), dataset=input_path)
+    labels_csv = labels_csv[labels_csv['name'].isin(sample.columns)]
+    feature_columns = [name for name in labels_csv['name'].unique() if name != sensitive_column]
+
+    # a darabok között megőrzött hozzárendelések és paraméterek
+    options = {}
+    for record in labels_csv.to_dict('records'):
+        key = (record['name'], record['type'])
+        if record['type'] == 'human age':
+            maximum = max(chunk[record['name']].max() for chunk in
+                          datamanager.iter_dataset(input_path, chunksize, [record['name']], column_names))
+            options[key] = {'maximum': maximum}
+        elif record['type'] == 'email address':
+            options[key] = {'mappings': pseudonymisation.new_email_mappings()}
+        elif record['identifier'] is True:
+            options[key] = {'mapping': dict()}
+    # a számmá alakított azonosítók szövegként olvasódnak be, így a típusuk (pl. '007' vagy 7, 12 vagy 12.0) nem függ
+    # attól, hogy egy darabban milyen értékek szerepelnek, és a hozzárendelések a darabok között is egyeznek. A
+    # folytonos feature oszlopok kivételek, mert ezek számként anonimizálódnak (a partíciók átlagára).
+    text_dtypes = {record['name']: str for record in labels_csv.to_dict('records')
+                   if record['identifier'] is True
+                   and record['type'] not in pseudonymisation.labels_and_psudonymisation_functions
+                   and (record['name'] in categorical or record['name'] not in feature_columns)}
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        is_csv = datamanager.get_dataset_format(output_path) == 'csv'
+        pseudonymised_path = os.path.join(temporary_directory,
+                                          'pseudonymised.csv' if is_csv else 'pseudonymised.parquet')
+
+        quasi_identifiers = []
+        chunk_data = None
+        pseudonymised_writer = datamanager.DatasetWriter(pseudonymised_path)
+        for chunk in datamanager.iter_dataset(input_path, chunksize, column_names=column_names, dtype=text_dtypes):
+            chunk_data = WorkData(chunk, sensitive_column, k, ldiv, p, categorical=set(categorical),
+                                  feature_columns=list(feature_columns), pseudonym_key=pseudonym_key,
+                                  mapping_store=mapping_store)
+            pseudonymisation.auto_pseudonymise_by_label(chunk_data, labels_csv, options)
+            pseudonymised_writer.write(chunk_data.df)
+            quasi_identifiers.append(chunk_data.df[chunk_data.feature_columns + [sensitive_column]])
+        pseudonymised_writer.close()
+        if chunk_data is None:
+            return 0
+
+        # az anonimizálás a memóriában, csak a szükséges oszlopokon történik
+        workdata = WorkData(pd.concat(quasi_identifiers, ignore_index=True), sensitive_column, k, ldiv, p,
+                            categorical=chunk_data.categorical, feature_columns=chunk_data.feature_columns)
+        del quasi_identifiers
+        for name in workdata.categorical & set(workdata.df.columns):
+            workdata.df[name] = workdata.df[name].astype('category')
+        with instrumentation.stage('anonymisation', rows=len(workdata.df), func=func):
+            anonymised = anonymisation.anonymise_dataset(workdata, func).sort_index()
+        anonymised_columns = list(anonymised.columns)
+        if not is_csv:
+            # egyetlen közös szótár, így minden sorcsoportban ugyanazok a kategóriák szerepelnek
+            for name in workdata.categorical & set(anonymised_columns):
+                anonymised[name] = anonymised[name].astype('category')
+
+        offset = 0
+        output_writer = datamanager.DatasetWriter(output_path)
+        for chunk in datamanager.iter_dataset(pseudonymised_path, chunksize, dtype=text_dtypes):
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            start = anonymised.index.searchsorted(chunk.index[0], side='left')
+            end = anonymised.index.searchsorted(chunk.index[-1], side='right')
+            part = anonymised.iloc[start:end]
+            chunk = chunk.loc[part.index]
+            for name in anonymised_columns:
+                chunk[name] = part[name].values
+
+            chunk_data = WorkData(chunk, sensitive_column, k, ldiv, p, categorical=set(workdata.categorical),
+                                  feature_columns=list(workdata.feature_columns), pseudonym_key=pseudonym_key,
+                                  mapping_store=mapping_store)
+            pseudonymisation.auto_pseudonymise_id_data(chunk_data, labels_csv, options)
+            output_writer.write(chunk_data.df)
+        output_writer.close()
+    return output_writer.rows
+
+
 if __name__ == "__main__":
     print("Welcome to Python Anonymizer")
     print(testclass)
-    test = auto_anon_and_pseud(testclass, func)
+    test = auto_anon_and_pseud(testclass, func, dataset='data/test.csv')
     print("Called anonymisation function: {}".format(func))
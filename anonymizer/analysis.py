@@ -1,5 +1,6 @@
+from statistics import NormalDist
+import numpy as np
 import pandas as pd
-import itertools
 
 
 def unique_percentage(df):
@@ -19,30 +20,313 @@ def unique_percentage(df):
     return 100 * diversity_series / len(df)
 
 
-def combinations_unique_percentage(df, columns: list):
+class HyperLogLog:
+    """
+    Egy oszlop különböző értékeinek számát becslő HyperLogLog vázlat. Az értékek 64 bites hash-éből az első precision
+    bit egy regisztert választ ki, a regiszter pedig a maradék bitek elején álló nullák számának eddigi legnagyobb
+    értékét (plusz egyet) tárolja. A vázlat mérete 2^precision bájt, a becslés relatív standard hibája
+    1.04 / sqrt(2^precision), pl. 14 bites pontosságnál 16 KB és 0.8%. Két vázlat egyesítése a regiszterek maximuma,
+    így a darabokban vagy külön folyamatokban feldolgozott adatok vázlatai utólag összevonhatók.
+    """
+
+    def __init__(self, precision=14):
+        """
+        :param precision: a regiszterek számának kettes alapú logaritmusa, 4 és 18 között
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError("Precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        """
+        Hozzáadja az értékeket a vázlathoz. A számok (és logikai értékek) lebegőpontos számként hash-elődnek, így az
+        egész és a hiányzó érték miatt lebegőpontossá vált darabokban ugyanaz a szám ugyanazt a hash-t kapja.
+        :param values: az értékeket tartalmazó Series vagy tömb
+        :return:
+        """
+        values = np.asarray(values)
+        if values.dtype.kind in 'biuf':
+            values = values.astype(np.float64)
+        elif values.dtype.kind != 'O':
+            values = values.astype(object)
+        hashes = pd.util.hash_array(values, categorize=False)
+        precision = np.uint64(self.precision)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # a maradék bitek mögé egy 1-es bit kerül, így a nullák száma legfeljebb 64 - precision
+        rest = (hashes << precision) | (np.uint64(1) << (precision - np.uint64(1)))
+        bit_length = np.zeros(len(rest), dtype=np.int64)
+        for shift in (32, 16, 8, 4, 2, 1):
+            larger = rest >= (np.uint64(1) << np.uint64(shift))
+            bit_length += larger * shift
+            rest = np.where(larger, rest >> np.uint64(shift), rest)
+        bit_length += rest.astype(np.int64)
+        # a regiszterbe a vezető nullák száma plusz egy kerül
+        rank = 65 - bit_length
+        # regiszterenként a legnagyobb előfordult érték egy (regiszter, érték) jelölőmátrixból olvasható ki
+        seen = np.zeros((len(self.registers), 64), dtype=bool)
+        seen[index, rank] = True
+        seen[:, 0] = True
+        self.registers = np.maximum(self.registers, 63 - np.argmax(seen[:, ::-1], axis=1).astype(np.uint8))
+
+    def merge(self, other):
+        """
+        A másik vázlatot ebbe a vázlatba olvasztja.
+        :param other: egy azonos pontosságú HyperLogLog példány
+        :return:
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def relative_error(self):
+        """
+        :return: a becslés relatív standard hibája
+        """
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def estimate(self):
+        """
+        Megbecsüli a vázlathoz adott különböző értékek számát a regiszterértékek gyakoriságaiból (Ertl javított
+        becslője), ami a darabszám teljes tartományában torzítatlan, így nincs szükség a kis és nagy darabszámok
+        külön kezelésére.
+        :return: a becsült darabszám
+        """
+        m = len(self.registers)
+        q = 64 - self.precision
+        counts = np.bincount(self.registers, minlength=q + 2).astype(np.float64)
+        denominator = m * self.tau(1 - counts[q + 1] / m)
+        for k in range(q, 0, -1):
+            denominator = 0.5 * (denominator + counts[k])
+        denominator += m * self.sigma(counts[0] / m)
+        return float(m * m / (2 * np.log(2)) / denominator)
+
+    @staticmethod
+    def sigma(x):
+        """
+        Az üres regiszterek arányából számolt korrekciós tag (Ertl: sigma függvény).
+        :param x: az üres regiszterek aránya
+        :return: a korrekciós tag
+        """
+        if x == 1:
+            return np.inf
+        y = 1.0
+        result = x
+        while True:
+            x = x * x
+            previous = result
+            result += x * y
+            y += y
+            if result == previous:
+                return result
+
+    @staticmethod
+    def tau(x):
+        """
+        A telített regiszterek arányából számolt korrekciós tag (Ertl: tau függvény).
+        :param x: a nem telített regiszterek aránya
+        :return: a korrekciós tag
+        """
+        if x == 0 or x == 1:
+            return 0.0
+        y = 1.0
+        result = 1 - x
+        while True:
+            x = np.sqrt(x)
+            previous = result
+            y *= 0.5
+            result -= (1 - x) ** 2 * y
+            if result == previous:
+                return result / 3
+
+
+def column_sketches(df, precision=14, sketches=None):
+    """
+    A DataFrame minden oszlopának értékeit egy-egy HyperLogLog vázlathoz adja.
+    :param df: a DataFrame (pl. egy nagy adathalmaz egy darabja)
+    :param precision: az új vázlatok pontossága
+    :param sketches: ha meg van adva, akkor a korábbi darabok vázlatai, ezek bővülnek
+    :return: szótár, ami az oszlopokhoz a vázlataikat rendeli
+    """
+    if sketches is None:
+        sketches = {}
+    for column in df.columns:
+        if column not in sketches:
+            sketches[column] = HyperLogLog(precision)
+        sketches[column].add(df[column])
+    return sketches
+
+
+def merge_sketches(sketches, other):
+    """
+    Egy másik (pl. párhuzamosan feldolgozott) darabsorozat vázlatait olvasztja a vázlatokba.
+    :param sketches: a column_sketches() által visszaadott szótár, ez bővül
+    :param other: a másik column_sketches() által visszaadott szótár
+    :return: a bővített szótár
+    """
+    for column, sketch in other.items():
+        if column in sketches:
+            sketches[column].merge(sketch)
+        else:
+            sketches[column] = sketch
+    return sketches
+
+
+def sketch_unique_percentage(sketches, rows, confidence=0.99):
+    """
+    A vázlatokból az unique_percentage() becslését adja vissza, hibahatárokkal.
+    :param sketches: a column_sketches() által visszaadott szótár
+    :param rows: a vázlatokhoz adott sorok száma
+    :param confidence: a hibahatárok megbízhatósági szintje
+    :return: DataFrame, ami az oszlopokhoz a becsült százalékot ('percentage') és a hibahatárokat ('lower', 'upper')
+    rendeli
+    """
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    result = {}
+    for column, sketch in sketches.items():
+        estimate = min(sketch.estimate(), rows)
+        error = z * sketch.relative_error() * estimate
+        result[column] = (100 * estimate / rows, 100 * max(estimate - error, 0) / rows,
+                          100 * min(estimate + error, rows) / rows)
+    return pd.DataFrame.from_dict(result, orient='index', columns=['percentage', 'lower', 'upper'])
+
+
+def streaming_unique_percentage(chunks, precision=14, confidence=0.99):
+    """
+    Az unique_percentage() darabokban feldolgozó, közelítő változata, ami a teljes adathalmaz helyett oszloponként
+    csak egy HyperLogLog vázlatot tart a memóriában, így tetszőleges méretű adathalmazra használható, pl.
+    streaming_unique_percentage(datamanager.iter_dataset(path, 1000000)).
+    :param chunks: a DataFrame darabjait adó iterálható objektum
+    :param precision: a vázlatok pontossága (lásd HyperLogLog)
+    :param confidence: a hibahatárok megbízhatósági szintje
+    :return: a sketch_unique_percentage() által visszaadott DataFrame
+    """
+    sketches = {}
+    rows = 0
+    for chunk in chunks:
+        column_sketches(chunk, precision, sketches)
+        rows += len(chunk)
+    if not rows:
+        raise ValueError("The dataset is empty")
+    return sketch_unique_percentage(sketches, rows, confidence)
+
+
+def factorize_columns(df, columns):
+    """
+    Az oszlopokat egész kódokká alakítja. A hiányzó érték kódja 0, ami külön értéknek számít, ahogy a
+    drop_duplicates() esetén is.
+    :param df: a DataFrame
+    :param columns: az oszlopok listája
+    :return: (kódok, különböző kódok száma) párok listája
+    """
+    encoded = []
+    for column in columns:
+        codes, uniques = pd.factorize(df[column])
+        encoded.append((codes.astype(np.int64) + 1, len(uniques) + 1))
+    return encoded
+
+
+def combine_groups(group_ids, codes, cardinality):
+    """
+    Egy oszlopkombináció csoportjait egy újabb oszloppal bővíti: a sorok csoport-sorszáma és az új oszlop kódja egyetlen
+    egész kulccsá keveredik, amiből újra 0-tól sorszámozott csoportok lesznek.
+    :param group_ids: a szülő kombináció csoport-sorszámai soronként
+    :param codes: az új oszlop kódjai
+    :param cardinality: az új oszlop különböző kódjainak száma
+    :return: a bővített kombináció csoport-sorszámai és a csoportok száma
+    """
+    group_ids, uniques = pd.factorize(group_ids * cardinality + codes)
+    return group_ids, len(uniques)
+
+
+def estimate_distinct_count(group_ids, group_count, total_rows):
+    """
+    A mintában talált csoportok gyakoriságaiból megbecsüli a teljes adathalmaz különböző értékeinek számát (Shlosser
+    becslő). Ha a mintában minden érték egyszer fordul elő, akkor a becslés a teljes sorszám, ha pedig egyik sem, akkor
+    a mintában talált csoportok száma. Egyenletes eloszlású értékeknél inkább felülbecsül, ami az újraazonosítási
+    kockázat szempontjából az óvatosabb irány.
+    :param group_ids: a minta sorainak csoport-sorszámai
+    :param group_count: a mintában talált csoportok száma
+    :param total_rows: a teljes adathalmaz sorainak száma
+    :return: a becsült különböző értékek száma
+    """
+    # frequencies[i]: a mintában pontosan i-szer előforduló csoportok száma
+    frequencies = np.bincount(np.bincount(group_ids, minlength=group_count))
+    if len(frequencies) < 2 or frequencies[1] == 0:
+        return group_count
+    q = len(group_ids) / total_rows
+    i = np.arange(1, len(frequencies))
+    numerator = np.sum((1 - q) ** i * frequencies[1:])
+    denominator = np.sum(i * q * (1 - q) ** (i - 1) * frequencies[1:])
+    return min(group_count + frequencies[1] * numerator / denominator, total_rows)
+
+
+def combinations_unique_percentage(df, columns: list, max_size: int = None, sample_size: int = None,
+                                   random_state=0):
     """
     Visszaadja, hogy a paraméterben kapott DataFrame paraméterben kapott oszlopainak összes lehetséges kombinációi
     mekkora valószínűséggel azonosítják az egyént. Az oszlopok kombinációiban kiszámítja az egyedi sorok és az összes
     sor hányadosát, százalékos értéket visszaadva. Minél magasabb a százalék, az oszlopkombináció annál egyedibb
     értékekkel rendelkezik.
+    Az oszlopok egyszer alakulnak egész kódokká, a kombinációk pedig mélységi bejárással, a szülő kombináció
+    csoportjainak egy újabb, a szülő oszlopainál kisebb sorszámú oszloppal való bővítésével állnak elő (lásd
+    combine_groups()), így a memóriában egyszerre csak a bejárt útvonal csoportjai vannak. A bejárás sorrendjében minden
+    kombináció összes részkombinációja előtte szerepel, ezért egy teljesen egyedi kombináció minden bővítése (nem csak a
+    bejárás szerinti leszármazottai) számolás nélkül kapja meg az értékét.
     :param df: a DataFrame
     :param columns: a kombinálandó oszlopok listája
+    :param max_size: ha meg van adva, akkor legfeljebb ennyi oszlopból álló kombinációk vizsgálódnak
+    :param sample_size: ha meg van adva, akkor a vizsgálat egy ekkora véletlen mintán történik, és a különböző sorok
+    száma a teljes adathalmazra becsülődik (lásd estimate_distinct_count())
+    :param random_state: a mintavételezés véletlenszám-generátorának kezdőértéke
     :return: a kombinált oszlopok és a hozzájuk tartozó százalék érték
     """
-    # a lista elemeit az összes lehetséges módon kombinálja
-    combinations = []
-    for i in range(len(columns)):
-        oc = itertools.combinations(columns, i + 1)
-        for c in oc:
-            combinations.append(list(c))
+    total_rows = len(df)
+    if sample_size is not None and total_rows > sample_size:
+        df = df.sample(n=sample_size, random_state=random_state)
+    else:
+        sample_size = None
+    if max_size is None:
+        max_size = len(columns)
+    encoded = factorize_columns(df, columns)
+    rows = len(df)
 
+    def percentage(group_ids, group_count):
+        if sample_size is None:
+            return group_count / total_rows * 100
+        return estimate_distinct_count(group_ids, group_count, total_rows) / total_rows * 100
+
+    # a kombinációk az oszlopok sorszámainak növekvő sorozatai, a bővítés mindig a legkisebb sorszám elé kerül. A
+    # gyökerek és a bővítések növekvő sorszám szerint dolgozódnak fel, így a bejárás a kombinációk bitmaszkjai szerint
+    # növekvő sorrendű, és minden részkombináció a kombináció előtt kerül sorra. Egy kombináció teljesen egyedi, ha egy
+    # eggyel kisebb részkombinációja az, mert a nagyobb különbségű egyedi részkombinációk ezeken keresztül öröklődnek.
     diversity = dict()
-    for i in combinations:
-        key = ', '.join(map(str, i))
-        diversity[key] = len(df[i].drop_duplicates()) / len(df) * 100
+    unique_combinations = set()
+    stack = [((index,), np.zeros(rows, dtype=np.int64), None) for index in reversed(range(len(columns)))]
+    while stack:
+        combination, parent_ids, unique_value = stack.pop()
+        if unique_value is None:
+            for i in range(1, len(combination)):
+                subset = combination[:i] + combination[i + 1:]
+                if subset in unique_combinations:
+                    unique_value = diversity[subset]
+                    break
+        group_ids = None
+        if unique_value is None:
+            codes, cardinality = encoded[combination[0]]
+            group_ids, group_count = combine_groups(parent_ids, codes, cardinality)
+            diversity[combination] = percentage(group_ids, group_count)
+            if group_count == rows:
+                unique_value = diversity[combination]
+        else:
+            diversity[combination] = unique_value
+        if unique_value is not None:
+            unique_combinations.add(combination)
+        if len(combination) < max_size:
+            for index in reversed(range(combination[0])):
+                stack.append(((index,) + combination, group_ids, unique_value))
 
-    diversity_series = pd.Series(diversity)
+    diversity = {', '.join(str(columns[index]) for index in combination): diversity[combination]
+                 for combination in sorted(diversity, key=lambda x: (len(x), x))}
+    diversity_series = pd.Series(diversity, dtype=float)
     return diversity_series
-
-
-
@@ -1,4 +1,11 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+import numpy as np
 import pandas as pd
+import instrumentation
+import recoding
 from datamanager import WorkData
 
 
@@ -86,61 +93,521 @@ def is_t_close(workdata, partition, global_freqs):
     return t_closeness(workdata.df, partition, workdata.sensitive_column, global_freqs) <= workdata.p
 
 
-def partition_dataset(workdata, scale, is_valid):
+def encode_column(column, is_categorical):
+    """
+    Az oszlop értékeit NumPy tömbbé alakítja a partícionáláshoz. Kategorikus oszlop esetén az értékek egész kódokra
+    cserélődnek (a hiányzó érték kódja -1, ami külön értéknek számít), folytonos oszlop esetén az értékek számként
+    maradnak meg.
+    :param column: az oszlop (Series)
+    :param is_categorical: True, ha az oszlop kategorikus
+    :return: a kódolt oszlop
+    """
+    if is_categorical:
+        return pd.factorize(column)[0]
+    values = column.to_numpy()
+    if values.dtype.kind not in 'iuf':
+        values = column.to_numpy(dtype=float)
+    return values
+
+
+def get_position_span(values, positions, is_categorical, tree=None):
+    """
+    A get_spans() függvény megfelelője egyetlen kódolt oszlopra: kategorikus oszlop esetén a partícióban szereplő
+    egyedi értékek száma, hierarchiával rendelkező oszlop esetén az értékek legközelebbi közös őse alatti levelek
+    száma, folytonos oszlop esetén a legnagyobb és legkisebb érték különbsége.
+    :param values: a kódolt oszlop
+    :param positions: a partíció sorainak pozíciói
+    :param is_categorical: True, ha az oszlop kategorikus
+    :param tree: az oszlop hierarchiájának HierarchyTree példánya, vagy None
+    :return: az oszlophoz kiszámított érték
+    """
+    part = values[positions]
+    if tree is not None:
+        return tree.span(part)
+    if is_categorical:
+        return len(pd.unique(part))
+    return np.nanmax(part) - np.nanmin(part)
+
+
+def split_positions(values, positions, is_categorical, tree=None):
     """
-    Partíciókra vágja a DataFramet.
+    A split() függvény megfelelője egyetlen kódolt oszlopra. Folytonos oszlop esetén a medián alatti és a mediánnál
+    nagyobb vagy egyenlő értékek kerülnek külön, kategorikus oszlop esetén az egyedi értékek előfordulási sorrendjük
+    szerinti első és második fele, hierarchiával rendelkező oszlop esetén pedig a legközelebbi közös ős gyerekei
+    (lásd hierarchy.HierarchyTree.split()).
+    :param values: a kódolt oszlop
+    :param positions: a partíció sorainak pozíciói
+    :param is_categorical: True, ha az oszlop kategorikus
+    :param tree: az oszlop hierarchiájának HierarchyTree példánya, vagy None
+    :return: a két részpartíció sorainak pozíciói
+    """
+    part = values[positions]
+    if tree is not None:
+        left = tree.split(part)
+        return positions[left], positions[~left]
+    if is_categorical:
+        uniques = pd.unique(part)
+        left = np.isin(part, uniques[:len(uniques) // 2])
+        return positions[left], positions[~left]
+    median = np.nanmedian(part)
+    return positions[part < median], positions[part >= median]
+
+
+def get_hierarchy(workdata, column):
+    """
+    Visszaadja az oszlop általánosítási hierarchiáját. Hierarchia csak kategorikus oszlophoz tartozhat.
     :param workdata: a WorkData példány
-    :param scale: a get_spans() függvény számára átadott paraméter
-    :param is_valid: validációs függvény, pl. k-anonimitás, l-diverzitás, t-közeliség
-    :return: a partícionált DataFrame
+    :param column: az oszlop neve
+    :return: a hierarchy.Hierarchy példány, vagy None
+    """
+    if not workdata.hierarchies or column not in workdata.categorical:
+        return None
+    return workdata.hierarchies.get(column)
+
+
+def encode_columns(workdata, scale):
+    """
+    A WorkData feature oszlopait kódolja az encode_column() függvénnyel. A hierarchiával rendelkező oszlopok értékei a
+    hierarchia leveleinek sorszámaira cserélődnek, a skálázó érték pedig a levelek száma.
+    :param workdata: a WorkData példány
+    :param scale: a get_spans() függvény által a teljes DataFramere kiszámított értékek, vagy None
+    :return: lista, aminek elemei (oszlopnév, kódolt oszlop, kategorikus-e, skálázó érték, HierarchyTree vagy None)
+    ötösök
+    """
+    columns = []
+    for column in workdata.feature_columns:
+        is_categorical = column in workdata.categorical
+        span_scale = None if scale is None else scale[column]
+        hierarchy = get_hierarchy(workdata, column)
+        if hierarchy is None:
+            columns.append((column, encode_column(workdata.df[column], is_categorical), is_categorical, span_scale,
+                            None))
+            continue
+        values, tree = hierarchy.encode(workdata.df[column])
+        if scale is not None:
+            span_scale = len(tree.leaf_nodes)
+        columns.append((column, values, is_categorical, span_scale, tree))
+    return columns
+
+
+def split_histograms(sensitive, histogram, lp, rp):
+    """
+    Kiszámítja a két részpartíció szenzitív oszlopának értékgyakoriságait. Csak a kisebb részpartíció gyakoriságai
+    számolódnak ki közvetlenül, a másikéi a szülő gyakoriságaiból való kivonással adódnak. Ha a vágás sorokat hagyott
+    ki (folytonos oszlopnál a hiányzó értékű sorok egyik részbe sem kerülnek), akkor mindkét rész gyakoriságai
+    közvetlenül számolódnak, mert a kivonás a kimaradt sorokat is a másik részhez számolná.
+    :param sensitive: a kódolt szenzitív oszlop, vagy None
+    :param histogram: a szülő partíció gyakoriságai, vagy None
+    :param lp: a bal oldali részpartíció sorainak pozíciói
+    :param rp: a jobb oldali részpartíció sorainak pozíciói
+    :return: a két részpartíció gyakoriságai
+    """
+    if histogram is None:
+        return None, None
+    if len(lp) + len(rp) != histogram.sum():
+        return (np.bincount(sensitive[lp], minlength=len(histogram)),
+                np.bincount(sensitive[rp], minlength=len(histogram)))
+    if len(lp) <= len(rp):
+        left = np.bincount(sensitive[lp], minlength=len(histogram))
+        return left, histogram - left
+    right = np.bincount(sensitive[rp], minlength=len(histogram))
+    return histogram - right, right
+
+
+def partition_positions(columns, is_valid, positions, depth=0, order=0, subtree_size=None, sensitive=None,
+                        histogram=None, counters=None):
+    """
+    A Mondrian algoritmus magja: a paraméterben kapott partíciót addig vágja, amíg a részek érvényesek maradnak. A
+    partíciók szélességi bejárás szerint dolgozódnak fel, és mindegyikhez feljegyződik a mélysége és a szinten belüli
+    sorszáma, így a partíciók (mélység, sorszám) szerint rendezve a soros feldolgozás sorrendjét adják vissza akkor is,
+    ha egyes részfák feldolgozása máshol történik. Ha a kódolt szenzitív oszlop meg van adva, akkor minden partíció
+    magával viszi a szenzitív értékek gyakoriságait, és a validációs függvény ezeket is megkapja.
+    :param columns: az encode_columns() függvény által visszaadott lista
+    :param is_valid: a sorok pozícióit és a gyakoriságokat (vagy None-t) kapó validációs függvény
+    :param positions: a vágandó partíció sorainak pozíciói
+    :param depth: a partíció mélysége
+    :param order: a partíció sorszáma a saját szintjén belül
+    :param subtree_size: ha meg van adva, akkor az ennél nem nagyobb partíciók nem vágódnak tovább, hanem külön listába
+    kerülnek, hogy egy másik folyamat dolgozza fel őket
+    :param sensitive: a kódolt szenzitív oszlop, vagy None
+    :param histogram: a vágandó partíció szenzitív értékeinek gyakoriságai
+    :param counters: ha meg van adva, akkor egy szótár, amelynek 'rejected_splits' eleme az érvénytelen részeket adó,
+    ezért elvetett vágások számával nő
+    :return: a kész partíciók és a továbbadott partíciók listája, az előbbi (mélység, sorszám, pozíciók) hármasokból,
+    az utóbbi (mélység, sorszám, pozíciók, gyakoriságok) négyesekből áll
     """
     finished_partitions = []
-    partitions = [workdata.df.index]
+    handed_off_partitions = []
+    partitions = deque([(depth, order, positions, histogram)])
     while partitions:
-        partition = partitions.pop(0)
-        spans = get_spans(workdata.df[workdata.feature_columns], partition, workdata.categorical, scale)
-        for column, span in sorted(spans.items(), key=lambda x: -x[1]):
-            lp, rp = split(workdata.df, partition, workdata.categorical, column)
-            if not is_valid(workdata, lp) or not is_valid(workdata, rp):
+        depth, order, positions, histogram = partitions.popleft()
+        if subtree_size is not None and len(positions) <= subtree_size:
+            handed_off_partitions.append((depth, order, positions, histogram))
+            continue
+        spans = {}
+        for column, values, is_categorical, span_scale, tree in columns:
+            span = get_position_span(values, positions, is_categorical, tree)
+            if span_scale is not None:
+                span = span / span_scale
+            spans[column] = (span, values, is_categorical, tree)
+        for column, (span, values, is_categorical, tree) in sorted(spans.items(), key=lambda x: -x[1][0]):
+            lp, rp = split_positions(values, positions, is_categorical, tree)
+            lh, rh = split_histograms(sensitive, histogram, lp, rp)
+            if not is_valid(lp, lh) or not is_valid(rp, rh):
+                if counters is not None:
+                    counters['rejected_splits'] = counters.get('rejected_splits', 0) + 1
                 continue
-            partitions.extend((lp, rp))
+            partitions.extend(((depth + 1, 2 * order, lp, lh), (depth + 1, 2 * order + 1, rp, rh)))
             break
         else:
-            finished_partitions.append(partition)
-    return finished_partitions
+            finished_partitions.append((depth, order, positions))
+    return finished_partitions, handed_off_partitions
+
+
+def partition_dataset(workdata, scale, is_valid):
+    """
+    Partíciókra vágja a DataFramet a Mondrian algoritmussal. A vizsgált oszlopok egyszer, a partícionálás elején
+    kódolódnak NumPy tömbökké, a partíciók pedig a sorok pozícióit tartalmazó tömbökként, egy sorban várakoznak.
+    :param workdata: a WorkData példány
+    :param scale: a get_spans() függvény számára átadott paraméter
+    :param is_valid: validációs függvény, pl. k-anonimitás, l-diverzitás, t-közeliség
+    :return: a partícionált DataFrame
+    """
+    index = workdata.df.index
+    finished_partitions, _ = partition_positions(
+        encode_columns(workdata, scale), lambda positions, histogram: is_valid(workdata, index[positions]),
+        np.arange(len(index))
+    )
+    return [index[positions] for _, _, positions in finished_partitions]
 
 
-def build_anonymized_dataset(workdata, partitions, max_partitions=None):
+def get_position_criteria(workdata, func):
     """
-    Létrehozza az anonimizált DataFramet.
+    Előkészíti a gyakoriságok alapján működő validációhoz (is_valid_histogram()) szükséges adatokat. A szenzitív oszlop
+    egész kódokká alakul, ahol a 0 a hiányzó értéket jelöli, t-közeliség esetén pedig a kódokhoz tartozó globális
+    eloszlás is kiszámolódik. Pandas kategória típusú oszlop esetén az eloszlás a partícióban elő nem forduló
+    kategóriákat is figyelembe veszi, ahogy a t_closeness() függvény is.
+    :param workdata: a WorkData példány
+    :param func: az anonimizáló függvény betűjele: 'k', 'l' vagy 't'
+    :return: a validáció paraméterei és a kódolt szenzitív oszlop (k-anonimitás esetén None)
+    """
+    if func == 't' and workdata.sensitive_column not in workdata.categorical:
+        raise ValueError("This method only works for categorical values")
+    if func not in ('l', 't'):
+        return (func, workdata.k, None, None, None, False), None
+
+    column = workdata.df[workdata.sensitive_column]
+    include_absent = isinstance(column.dtype, pd.CategoricalDtype)
+    if include_absent:
+        codes = column.cat.codes.to_numpy().astype(np.int64)
+        value_count = len(column.cat.categories)
+    else:
+        codes, uniques = pd.factorize(column)
+        value_count = len(uniques)
+    sensitive = codes + 1
+    global_freqs = np.bincount(sensitive, minlength=value_count + 1)[1:] / float(len(column))
+    return (func, workdata.k, workdata.ldiv, workdata.p, global_freqs, include_absent), sensitive
+
+
+def is_valid_histogram(criteria, positions, histogram):
+    """
+    Az is_k_anonymous(), is_l_diverse() és is_t_close() függvények megfelelője a sorok pozícióival és a szenzitív
+    értékek gyakoriságaival megadott partícióra. A vizsgálat a különböző szenzitív értékek számával arányos időt vesz
+    igénybe, a partíció méretétől függetlenül.
+    :param criteria: a get_position_criteria() által visszaadott paraméterek
+    :param positions: a partíció sorainak pozíciói
+    :param histogram: a partíció szenzitív értékeinek gyakoriságai (a 0. elem a hiányzó értékeké)
+    :return: True, ha a partíció érvényes, False egyébként
+    """
+    func, k, ldiv, p, global_freqs, include_absent = criteria
+    if len(positions) < k:
+        return False
+    if func == 'l':
+        return np.count_nonzero(histogram) >= ldiv
+    if func == 't':
+        counts = histogram[1:]
+        distances = np.abs(counts / float(len(positions)) - global_freqs)
+        if not include_absent:
+            distances = distances[counts > 0]
+        return distances.max(initial=0.0) <= p
+    return True
+
+
+# a párhuzamos partícionálást végző folyamatok állapota: a megosztott memóriában lévő oszlopok és a validáció adatai
+worker_state = {}
+
+
+def share_array(array):
+    """
+    A tömböt megosztott memóriába másolja, hogy a többi folyamat másolás nélkül elérhesse.
+    :param array: a NumPy tömb
+    :return: a SharedMemory példány és a tömb eléréséhez szükséges (név, alak, típus) leíró
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def attach_array(descriptor):
+    """
+    A share_array() által megosztott tömböt éri el egy másik folyamatból.
+    :param descriptor: a share_array() által visszaadott leíró
+    :return: a SharedMemory példány és a tömb
+    """
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def init_partition_worker(column_descriptors, sensitive_descriptor, criteria):
+    """
+    A párhuzamos partícionálást végző folyamatok inicializáló függvénye, ami a megosztott oszlopokhoz csatlakozik.
+    :param column_descriptors: (oszlopnév, leíró, kategorikus-e, skálázó érték, HierarchyTree vagy None) ötösök
+    listája
+    :param sensitive_descriptor: a kódolt szenzitív oszlop leírója, vagy None
+    :param criteria: a get_position_criteria() által visszaadott paraméterek
+    :return:
+    """
+    handles = []
+    columns = []
+    for column, descriptor, is_categorical, span_scale, tree in column_descriptors:
+        shm, values = attach_array(descriptor)
+        handles.append(shm)
+        columns.append((column, values, is_categorical, span_scale, tree))
+    sensitive = None
+    if sensitive_descriptor is not None:
+        shm, sensitive = attach_array(sensitive_descriptor)
+        handles.append(shm)
+    worker_state.update(handles=handles, columns=columns, sensitive=sensitive,
+                        is_valid=partial(is_valid_histogram, criteria))
+
+
+def partition_subtree(depth, order, positions, histogram):
+    """
+    Egy részfát dolgoz fel teljes egészében egy párhuzamosan futó folyamatban.
+    :param depth: a részfa gyökerének mélysége
+    :param order: a részfa gyökerének sorszáma a saját szintjén belül
+    :param positions: a részfa gyökerének sorai
+    :param histogram: a részfa gyökerének szenzitív értékgyakoriságai, vagy None
+    :return: a részfa kész partíciói (mélység, sorszám, pozíciók) hármasokként, valamint az elvetett vágások száma
+    """
+    counters = {}
+    finished_partitions, _ = partition_positions(
+        worker_state['columns'], worker_state['is_valid'], positions, depth, order,
+        sensitive=worker_state['sensitive'], histogram=histogram, counters=counters
+    )
+    return finished_partitions, counters.get('rejected_splits', 0)
+
+
+def partition_dataset_by_criteria(workdata, scale, func, workers=None, subtree_size=None, counters=None):
+    """
+    A partition_dataset() változata a beépített validációkra. A k-anonimitás a partíció méretéből, az l-diverzitás és a
+    t-közeliség a szenzitív értékek partíciónként nyilvántartott gyakoriságaiból dől el (lásd is_valid_histogram()).
+    Ha a workers 1-nél nagyobb, akkor a fa felső szintjeit a hívó folyamat vágja, a subtree_size-nál nem nagyobb
+    részfákat pedig egy folyamatkészlet dolgozza fel. A kódolt oszlopok megosztott memórián keresztül jutnak el a
+    folyamatokhoz. A kész partíciók sorrendje megegyezik a soros futás sorrendjével, a folyamatok számától függetlenül.
+    :param workdata: a WorkData példány
+    :param scale: a get_spans() függvény számára átadott paraméter
+    :param func: az anonimizáló függvény betűjele: 'k', 'l' vagy 't'
+    :param workers: a párhuzamosan futó folyamatok száma, ha None vagy 1, akkor a partícionálás sorosan történik
+    :param subtree_size: ekkora vagy kisebb részfák kerülnek át a folyamatokhoz, ha None, akkor a sorok számának a
+    folyamatok négyszeresével vett hányadosa
+    :param counters: ha meg van adva, akkor az elvetett vágások száma ebbe a szótárba számolódik (lásd
+    partition_positions())
+    :return: a partícionált DataFrame
+    """
+    index = workdata.df.index
+    columns = encode_columns(workdata, scale)
+    criteria, sensitive = get_position_criteria(workdata, func)
+    histogram = None
+    if sensitive is not None:
+        histogram = np.bincount(sensitive, minlength=len(criteria[4]) + 1)
+    parallel = workers is not None and workers > 1
+    if parallel and subtree_size is None:
+        subtree_size = max(workdata.k, len(index) // (4 * workers))
+
+    finished_partitions, handed_off_partitions = partition_positions(
+        columns, partial(is_valid_histogram, criteria), np.arange(len(index)),
+        subtree_size=subtree_size if parallel else None, sensitive=sensitive, histogram=histogram, counters=counters
+    )
+    if handed_off_partitions:
+        shared = []
+        try:
+            column_descriptors = []
+            for column, values, is_categorical, span_scale, tree in columns:
+                shm, descriptor = share_array(values)
+                shared.append(shm)
+                column_descriptors.append((column, descriptor, is_categorical, span_scale, tree))
+            sensitive_descriptor = None
+            if sensitive is not None:
+                shm, sensitive_descriptor = share_array(sensitive)
+                shared.append(shm)
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_partition_worker,
+                                     initargs=(column_descriptors, sensitive_descriptor, criteria)) as executor:
+                futures = [executor.submit(partition_subtree, *partition) for partition in handed_off_partitions]
+                for future in futures:
+                    subtree_partitions, rejected_splits = future.result()
+                    finished_partitions.extend(subtree_partitions)
+                    if counters is not None:
+                        counters['rejected_splits'] = counters.get('rejected_splits', 0) + rejected_splits
+        finally:
+            for shm in shared:
+                shm.close()
+                shm.unlink()
+
+    finished_partitions.sort(key=lambda x: (x[0], x[1]))
+    return [index[positions] for _, _, positions in finished_partitions]
+
+
+def join_partition_values(column, partition_ids, return_spans=False):
+    """
+    Partíciónként a '|' karakterrel elválasztva felsorolja a partícióban szereplő egyedi értékeket, előfordulási
+    sorrendben, majd az eredményt visszaírja a partíció minden sorára. Az egyedi értékek egyszer, kódolva kerülnek
+    szövegként átalakításra, a felsorolások pedig egyetlen csoportosítással készülnek el.
+    :param column: az oszlop, partíciók szerint rendezett sorokkal
+    :param partition_ids: a sorok partícióinak sorszámai
+    :param return_spans: ha True, akkor a partíciónkénti egyedi értékek száma és az oszlop egyedi értékeinek száma is
+    visszaadódik (lásd information_loss())
+    :return: a soronkénti felsorolásokat tartalmazó tömb
+    """
+    codes, uniques = pd.factorize(column)
+    # a hiányzó érték kódja -1, ami a lista utolsó elemére, a 'nan' szövegre mutat
+    names = np.array([str(value) for value in uniques] + ['nan'], dtype=object)
+    pairs = pd.DataFrame({'partition': partition_ids, 'code': codes}).drop_duplicates()
+    joined = pd.Series(names[pairs['code'].values]).groupby(pairs['partition'].values).agg('|'.join)
+    if return_spans:
+        spans = np.bincount(pairs['partition'].values, minlength=len(joined))
+        return joined.to_numpy()[partition_ids], spans, len(uniques) + int((codes < 0).any())
+    return joined.to_numpy()[partition_ids]
+
+
+def generalise_partition_values(column, partition_ids, hierarchy, return_spans=False):
+    """
+    Partíciónként a hierarchia azon csúcsának címkéjét adja vissza, ami a partícióban szereplő értékek legközelebbi
+    közös őse. Mivel egy csúcs alatti levelek sorszámai összefüggő tartományt alkotnak, a közös ős a partíció legkisebb
+    és legnagyobb levél-sorszámából adódik, így partíciónként egyetlen minimum és maximum számolódik.
+    :param column: az oszlop, partíciók szerint rendezett sorokkal
+    :param partition_ids: a sorok partícióinak sorszámai
+    :param hierarchy: az oszlop hierarchy.Hierarchy példánya
+    :param return_spans: ha True, akkor a partíciónkénti közös ősök alatti levelek száma és az összes levél száma is
+    visszaadódik (lásd information_loss())
+    :return: a soronkénti általánosított értékeket tartalmazó tömb
+    """
+    ranks, tree = hierarchy.encode(column)
+    grouped = pd.Series(ranks).groupby(partition_ids)
+    nodes = tree.common_ancestors(grouped.min().to_numpy(), grouped.max().to_numpy())
+    if return_spans:
+        spans = tree.last_leaf[nodes] - tree.first_leaf[nodes] + 1
+        return tree.labels[nodes][partition_ids], spans, len(tree.leaf_nodes)
+    return tree.labels[nodes][partition_ids]
+
+
+def information_loss(lengths, column_spans, k=None):
+    """
+    Kiszámítja az anonimizálás információveszteségét a partíciók méreteiből és az oszlopok partíciónkénti
+    általánosításából:
+    - discernibility: a partícióméretek négyzetösszege, vagyis minden rekordra az, hogy hány rekordtól nem
+    különböztethető meg
+    - average class size: a partíciók átlagos mérete, és ha a k meg van adva, akkor ennek k-val osztott értéke
+    (normalized average class size), ami 1 esetén optimális
+    - ncp: a normalizált bizonytalansági büntetés (normalized certainty penalty) oszloponkénti rekordátlaga, ahol egy
+    rekord büntetése folytonos oszlopnál a partíció értéktartománya a teljes értéktartományhoz képest, kategorikus
+    oszlopnál (az egyedi értékek, illetve a közös ős alatti levelek száma - 1) / (az összes egyedi érték, illetve levél
+    száma - 1)
+    - columns: oszloponként az ncp és a rekordonként átlagos általánosítási tartomány (range), ami folytonos oszlopnál
+    az értéktartomány szélessége, kategorikus oszlopnál az egyedi értékek, hierarchia esetén a levelek száma
+    :param lengths: a partíciók méretei
+    :param column_spans: szótár, ami az oszlopokhoz (partíciónkénti tartományok, teljes tartomány, kategorikus-e)
+    hármasokat rendel
+    :param k: a k-anonimitás paramétere, vagy None
+    :return: a mérőszámokat tartalmazó szótár
+    """
+    rows = lengths.sum()
+    metrics = {
+        'partitions': len(lengths),
+        'discernibility': int(np.sum(lengths.astype(np.int64) ** 2)),
+        'average class size': rows / len(lengths) if len(lengths) else None
+    }
+    if k and len(lengths):
+        metrics['normalized average class size'] = metrics['average class size'] / k
+    columns = {}
+    for column, (spans, full_span, is_categorical) in column_spans.items():
+        spans = np.asarray(spans, dtype=float)
+        if is_categorical:
+            penalties = (spans - 1) / (full_span - 1) if full_span > 1 else np.zeros(len(spans))
+        else:
+            penalties = spans / full_span if full_span > 0 else np.zeros(len(spans))
+        columns[column] = {
+            'ncp': float(np.nansum(penalties * lengths) / rows) if rows else 0.0,
+            'range': float(np.nansum(spans * lengths) / rows) if rows else 0.0
+        }
+    metrics['ncp'] = float(np.mean([value['ncp'] for value in columns.values()])) if columns else 0.0
+    metrics['columns'] = columns
+    return metrics
+
+
+def build_anonymized_dataset(workdata, partitions, max_partitions=None, metrics=None):
+    """
+    Létrehozza az anonimizált DataFramet. Minden sor megkapja a partíciójának sorszámát, a partíciónkénti átlagok,
+    felsorolások és közös ősök egy-egy csoportosítással számolódnak ki, és egyetlen lépésben íródnak vissza a sorokra.
+    Ha a metrics meg van adva, akkor ugyanezekből a csoportosításokból az információveszteség mérőszámai is
+    kiszámolódnak (lásd information_loss()).
     :param workdata: a WorkData példány
     :param partitions: a már partícionált DataFrame
     :param max_partitions: ha meg van adva, akkor maximum ennyi részre osztható a DataFrame
+    :param metrics: ha meg van adva, akkor egy szótár, amibe az információveszteség mérőszámai kerülnek
     :return:
     """
-    anonymized_df = pd.DataFrame(columns=workdata.df.columns)
-    for i, partition in enumerate(partitions):
-        if max_partitions is not None and i > max_partitions:
-            break
+    if max_partitions is not None:
+        partitions = partitions[:max_partitions + 1]
+    if not partitions:
+        return pd.DataFrame(columns=workdata.df.columns)
 
-        df_part = workdata.df.loc[partition]
-        # a d szótár tartalmazza a kulcs-érték párokat, ami alapján az átírás történik
-        d = {c: i for i, c in enumerate(workdata.feature_columns)}
+    labels = partitions[0].append(list(partitions[1:]))
+    positions = workdata.df.index.get_indexer(labels)
+    lengths = np.array([len(partition) for partition in partitions])
+    partition_ids = np.repeat(np.arange(len(partitions)), lengths)
 
-        # folytonos oszlop esetén az értékek átlagára íródik át a partíció összes értéke az oszlopban, kategorikus
-        # oszlop esetén pedig a partíció adott oszlopában szereplő értékek egymástól a '|' karakterrel elválasztott
-        # felsorolására
-        for j in workdata.feature_columns:
-            if j in workdata.categorical:
-                d[df_part[j].name] = '|'.join(map(str, df_part[j].unique()))
+    # folytonos oszlop esetén az értékek átlagára íródik át a partíció összes értéke az oszlopban, kategorikus
+    # oszlop esetén pedig a partíció adott oszlopában szereplő értékek egymástól a '|' karakterrel elválasztott
+    # felsorolására, vagy ha az oszlophoz hierarchia tartozik, akkor az értékek legközelebbi közös ősére
+    data = {}
+    column_spans = {}
+    return_spans = metrics is not None
+    for column in workdata.df.columns:
+        values = workdata.df[column].take(positions)
+        hierarchy = get_hierarchy(workdata, column)
+        if column not in workdata.feature_columns:
+            data[column] = values.values
+        elif hierarchy is not None:
+            result = generalise_partition_values(values, partition_ids, hierarchy, return_spans)
+            if return_spans:
+                data[column], spans, full_span = result
+                column_spans[column] = (spans, full_span, True)
             else:
-                datatype = type(d[df_part[j].name])
-                d[df_part[j].name] = datatype(df_part[j].mean())
-
-        for key, value in d.items():
-            df_part[key] = value
-        anonymized_df = anonymized_df.append(df_part)
-    return anonymized_df
+                data[column] = result
+        elif column in workdata.categorical:
+            result = join_partition_values(values, partition_ids, return_spans)
+            if return_spans:
+                data[column], spans, full_span = result
+                column_spans[column] = (spans, full_span, True)
+            else:
+                data[column] = result
+        else:
+            grouped = values.groupby(partition_ids)
+            means = np.trunc(grouped.mean().to_numpy())
+            if not np.isnan(means).any():
+                means = means.astype(np.int64)
+            data[column] = means[partition_ids]
+            if return_spans:
+                minimums = grouped.min().to_numpy(dtype=float)
+                maximums = grouped.max().to_numpy(dtype=float)
+                full_span = np.nanmax(maximums) - np.nanmin(minimums) if not np.isnan(minimums).all() else 0.0
+                column_spans[column] = (maximums - minimums, full_span, False)
+    if return_spans:
+        metrics.update(information_loss(lengths, column_spans, workdata.k))
+    return pd.DataFrame(data, index=labels, columns=workdata.df.columns)
 
 
 def diversity(df, partition, column):
@@ -190,26 +657,74 @@ def t_closeness(df, partition, column, global_freqs):
     return d_max
 
 
-def anonymise_dataset(workdata: WorkData, func: str):
-
-    full_spans = get_spans(workdata.df, workdata.df.index, workdata.categorical)
-
-    if func == 'k':
-        finished_partitions = partition_dataset(workdata, full_spans, (lambda *args: is_k_anonymous(*args)))
-        df = build_anonymized_dataset(workdata, finished_partitions)
+def recode_dataset(workdata: WorkData, metrics: dict = None):
+    """
+    Teljes tartományú (globális) átkódolással teszi k-anonimmá a DataFramet: minden feature oszlop minden értéke
+    ugyanarra a szintre általánosítódik, így a kimenet értékei a partícióktól függetlenül egységesek. Az oszlopok
+    általánosítási szintjeiből (lásd recoding.column_levels()) álló hálóban a legkevésbé általánosított k-anonim
+    csomópont választódik ki (lásd recoding.search_lattice()).
+    :param workdata: a WorkData példány
+    :param metrics: ha meg van adva, akkor egy szótár, amibe az információveszteség mérőszámai (lásd
+    information_loss()) és a kiválasztott szintek ('levels') kerülnek
+    :return: az anonimizált DataFrame
+    """
+    rows = len(workdata.df)
+    columns = list(workdata.feature_columns)
+    with instrumentation.stage('lattice search', rows=rows, func='g') as event:
+        levels = [recoding.column_levels(workdata.df, column, column in workdata.categorical,
+                                         get_hierarchy(workdata, column))
+                  for column in columns]
+        counters = {}
+        node, (representatives, counts) = recoding.search_lattice(levels, workdata.k, counters=counters)
+        event.update(counters)
+        event['levels'] = dict(zip(columns, node))
+    with instrumentation.stage('output building', rows=rows, partitions=len(counts)) as event:
+        anonymised = recoding.apply_levels(workdata.df, columns, levels, node)
+        if metrics is not None:
+            column_spans = {}
+            for index, (column, column_level, level) in enumerate(zip(columns, levels, node)):
+                codes = column_level.level_codes[level][representatives[:, index]]
+                column_spans[column] = (column_level.level_spans[level][codes], column_level.full_span,
+                                        column_level.is_categorical)
+            metrics.update(information_loss(counts, column_spans, workdata.k))
+            metrics['levels'] = dict(zip(columns, node))
+            event.update(discernibility=metrics.get('discernibility'), ncp=metrics.get('ncp'))
+        return anonymised
 
-    elif func == 'l':
-        finished_l_diverse_partitions = partition_dataset(workdata, full_spans, (
-            lambda *args: is_k_anonymous(*args) and is_l_diverse(*args)
-            )
-        )
-        df = build_anonymized_dataset(workdata, finished_l_diverse_partitions)
 
-    elif func == 't':
-        freqs = get_global_freqs(workdata.df, workdata.sensitive_column)
-        finished_t_close_partitions = partition_dataset(
-            workdata, full_spans, lambda *args: is_k_anonymous(*args) and is_t_close(*args, freqs)
-        )
-        df = build_anonymized_dataset(workdata, finished_t_close_partitions)
+def anonymise_dataset(workdata: WorkData, func: str, workers: int = None, subtree_size: int = None,
+                      metrics: dict = None):
+    """
+    Anonimizálja a DataFramet a Mondrian algoritmussal, vagy 'g' esetén teljes tartományú átkódolással (lásd
+    recode_dataset()).
+    :param workdata: a WorkData példány
+    :param func: 'k': k-anonimitás, 'l': l-diverzitás, 't': t-közeliség, 'g': k-anonimitás globális átkódolással
+    :param workers: ha 1-nél nagyobb, akkor a partícionálás ennyi folyamatban, párhuzamosan történik ('g' esetén nem
+    adható meg)
+    :param subtree_size: párhuzamos futás esetén az ennél nem nagyobb részfák kerülnek a folyamatokhoz ('g' esetén nem
+    adható meg)
+    :param metrics: ha meg van adva, akkor egy szótár, amibe az információveszteség mérőszámai kerülnek (lásd
+    information_loss())
+    :return: az anonimizált DataFrame
+    """
+    if func not in ('k', 'l', 't', 'g'):
+        raise ValueError("Unknown anonymisation function: {}".format(func))
+    if func == 'g':
+        if (workers is not None and workers != 1) or subtree_size is not None:
+            raise ValueError("Full-domain generalisation does not support workers or subtree_size")
+        return recode_dataset(workdata, metrics)
 
-    return df
+    rows = len(workdata.df)
+    with instrumentation.stage('partitioning', rows=rows, func=func) as event:
+        full_spans = get_spans(workdata.df, workdata.df.index, workdata.categorical)
+        counters = {'rejected_splits': 0} if instrumentation.is_enabled() else None
+        finished_partitions = partition_dataset_by_criteria(workdata, full_spans, func, workers, subtree_size,
+                                                            counters)
+        event['partitions'] = len(finished_partitions)
+        if counters is not None:
+            event.update(counters)
+    with instrumentation.stage('output building', rows=rows, partitions=len(finished_partitions)) as event:
+        anonymised = build_anonymized_dataset(workdata, finished_partitions, metrics=metrics)
+        if metrics is not None:
+            event.update(discernibility=metrics.get('discernibility'), ncp=metrics.get('ncp'))
+        return anonymised
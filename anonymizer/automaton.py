@@ -0,0 +1,76 @@
+from collections import deque
+
+
+class Automaton:
+    """
+    Aho-Corasick automata, amely egy szólista elemeit egyetlen lineáris idejű végigolvasással keresi meg egy szövegben.
+    A szólista alapján egyszer épül fel, utána tetszőleges számú szövegre újrahasználható.
+    """
+
+    def __init__(self, words):
+        """
+        Felépíti az automatát a szólistából. Az üres szavak kimaradnak.
+        :param words: a keresendő szavak (bármilyen iterálható, pl. Series)
+        """
+        self.goto = [{}]  # az állapotok átmenetei karakterenként
+        self.fail = [0]  # a hibafüggvény: melyik állapotra kell lépni, ha nincs átmenet
+        self.lengths = [()]  # az adott állapotban véget érő szavak hosszai
+
+        for word in words:
+            if not isinstance(word, str) or not word:
+                continue
+            state = 0
+            for char in word:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.lengths.append(())
+                state = next_state
+            if len(word) not in self.lengths[state]:
+                self.lengths[state] = self.lengths[state] + (len(word),)
+
+        # a hibafüggvény kiszámítása szélességi bejárással, a kimenetek öröklése a hibaállapotoktól
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                inherited = tuple(x for x in self.lengths[self.fail[next_state]] if x not in self.lengths[next_state])
+                self.lengths[next_state] = self.lengths[next_state] + inherited
+
+    def search(self, text, whole_word=False):
+        """
+        Megmondja, hogy a szövegben szerepel-e valamelyik szó.
+        :param text: a vizsgálandó szöveg
+        :param whole_word: ha True, akkor csak a teljes tokenként (nem betű vagy szám karakterekkel határolt) előforduló
+        szavak számítanak találatnak
+        :return: True, ha van találat, False egyébként
+        """
+        goto = self.goto
+        fail = self.fail
+        lengths = self.lengths
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not lengths[state]:
+                continue
+            if not whole_word:
+                return True
+            end = position + 1
+            if end < len(text) and text[end].isalnum():
+                continue
+            for length in lengths[state]:
+                start = end - length
+                if start == 0 or not text[start - 1].isalnum():
+                    return True
+        return False
@@ -0,0 +1,235 @@
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import anonymisation
+import datagenerator
+import datamanager
+import detection
+import pseudonymisation
+from datamanager import WorkData
+
+# a mérési eredmények előzményeit tartalmazó file
+benchmark_history_path = 'data/local/benchmark_history.json'
+
+# a pszeudonimizáló függvények címkéi és a generált adathalmaz oszlopai, amelyeken mérődnek
+pseudonymisation_columns = {
+    'country or region': 'orszag',
+    'human age': 'kor',
+    'email address': 'email',
+    'ip address': 'ip_cim',
+    'mac address': 'mac_cim'
+}
+
+# a kulcsos (determinisztikus) módban mért pszeudonimizáló függvények és oszlopaik, valamint a mérésekhez használt kulcs
+keyed_pseudonymisation_functions = [
+    (pseudonymisation.email_multi_pseudonymise, 'email'),
+    (pseudonymisation.text_to_number, 'taj'),
+    (pseudonymisation.pseudonymise_ip_addresses, 'ip_cim'),
+    (pseudonymisation.mask_mac_addresses, 'mac_cim')
+]
+benchmark_pseudonym_key = b'benchmark key'
+
+# az anonimizálás méréséhez használt oszlopok és paraméterek
+anonymisation_columns = ['kor', 'nem', 'iranyitoszam', 'orszag']
+anonymisation_sensitive_column = 'betegseg'
+anonymisation_categorical = {'nem', 'orszag', 'betegseg'}
+
+
+def measure(stage, name, rows, function, *args, trace_memory=True):
+    """
+    Lefuttatja a függvényt, és megméri a futási időt, valamint (ha a trace_memory True) a futás alatti legnagyobb
+    memóriafoglalást a tracemalloc segítségével. A memóriamérés lassítja a tisztán Pythonban futó kódot, ezért a
+    futási idők memóriamérés nélkül pontosabbak. Ha a függvény kivételt dob, akkor az eredményben a hibaüzenet szerepel.
+    :param stage: a mért lépés (pl. 'detection')
+    :param name: a mért függvény neve
+    :param rows: a feldolgozott sorok (értékek) száma
+    :param function: a mérendő függvény
+    :param args: a függvény paraméterei
+    :param trace_memory: ha True, akkor a memóriafoglalás is mérődik
+    :return: az eredményt tartalmazó szótár
+    """
+    result = {'stage': stage, 'name': name, 'rows': rows}
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        function(*args)
+    except Exception as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, error)
+    seconds = time.perf_counter() - start
+    if trace_memory:
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    result['seconds'] = seconds
+    result['rows_per_second'] = rows / seconds if seconds > 0 and 'error' not in result else None
+    return result
+
+
+def benchmark_detection(df, trace_memory=True):
+    """
+    A detection.functions_and_labels minden kereső függvényét lefuttatja a DataFrame összes oszlopán, ahogy a
+    detection.find_and_label() is teszi.
+    :param df: a DataFrame
+    :param trace_memory: ha True, akkor a memóriafoglalás is mérődik
+    :return: az eredmények listája
+    """
+    def run(function):
+        for column in df:
+            detection.detect_ratio(function, df[column])
+
+    return [
+        measure('detection', function.__name__, len(df) * len(df.columns), run, function, trace_memory=trace_memory)
+        for function in detection.functions_and_labels
+    ]
+
+
+def benchmark_pseudonymisation(df, trace_memory=True):
+    """
+    A pseudonymisation.labels_and_psudonymisation_functions pszeudonimizáló függvényeit, valamint az azonosítók számmá
+    alakítását (text_to_number) méri a generált adathalmaz megfelelő oszlopain. Ezután a
+    keyed_pseudonymisation_functions függvényeit kulcsos módban is méri, ezek neve mögé ' (keyed)' kerül.
+    :param df: a datagenerator.generate_dataset() által generált DataFrame
+    :param trace_memory: ha True, akkor a memóriafoglalás is mérődik
+    :return: az eredmények listája
+    """
+    results = []
+    functions = [(pseudonymisation.labels_and_psudonymisation_functions[label], column, None)
+                 for label, column in pseudonymisation_columns.items()]
+    functions.append((pseudonymisation.text_to_number, 'taj', None))
+    functions += [(function, column, benchmark_pseudonym_key) for function, column in keyed_pseudonymisation_functions]
+    for function, column, key in functions:
+        workdata = WorkData(df[[column]].copy(), column, 1, categorical=set(), feature_columns=[column],
+                            pseudonym_key=key)
+        name = function.__name__ if key is None else function.__name__ + ' (keyed)'
+        results.append(measure('pseudonymisation', name, len(df), function, workdata, column,
+                               trace_memory=trace_memory))
+    return results
+
+
+def benchmark_anonymisation(df, funcs='klt', k=5, ldiv=2, p=0.2, trace_memory=True):
+    """
+    Az anonymisation.anonymise_dataset() függvényt méri a megadott anonimizáló függvényekkel.
+    :param df: a datagenerator.generate_dataset() által generált DataFrame
+    :param funcs: a mérendő anonimizáló függvények: 'k', 'l', 't', 'g'
+    :param k: k-anonimitás paramétere
+    :param ldiv: l-diverzitás paramétere
+    :param p: t-közeliség paramétere
+    :param trace_memory: ha True, akkor a memóriafoglalás is mérődik
+    :return: az eredmények listája
+    """
+    results = []
+    for func in funcs:
+        data = df[anonymisation_columns + [anonymisation_sensitive_column]].copy()
+        for name in anonymisation_categorical:
+            data[name] = data[name].astype('category')
+        workdata = WorkData(data, anonymisation_sensitive_column, k, ldiv, p, categorical=anonymisation_categorical,
+                            feature_columns=list(anonymisation_columns))
+        results.append(measure('anonymisation', func, len(df), anonymisation.anonymise_dataset, workdata, func,
+                               trace_memory=trace_memory))
+    return results
+
+
+def run_benchmarks(rows=(10000,), cardinalities=None, stages=('detection', 'pseudonymisation', 'anonymisation'),
+                   funcs='klt', seed=0, trace_memory=True):
+    """
+    Lefuttatja a méréseket a megadott méretű generált adathalmazokon.
+    :param rows: az adathalmazok sorainak száma
+    :param cardinalities: az oszlopok különböző értékeinek száma (lásd datagenerator.generate_dataset())
+    :param stages: a mérendő lépések
+    :param funcs: a mérendő anonimizáló függvények
+    :param seed: a véletlenszám-generátor kezdőértéke
+    :param trace_memory: ha True, akkor a memóriafoglalás is mérődik
+    :return: a futás adatait és az eredményeket tartalmazó szótár
+    """
+    results = []
+    for size in rows:
+        df = datagenerator.generate_dataset(size, cardinalities, seed=seed)
+        if 'detection' in stages:
+            results += benchmark_detection(df, trace_memory)
+        if 'pseudonymisation' in stages:
+            results += benchmark_pseudonymisation(df, trace_memory)
+        if 'anonymisation' in stages:
+            results += benchmark_anonymisation(df, funcs, trace_memory=trace_memory)
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cardinalities': cardinalities,
+        'results': results
+    }
+
+
+def read_benchmark_history(path=benchmark_history_path):
+    """
+    Beolvassa a korábbi mérések eredményeit.
+    :param path: az előzményeket tartalmazó file
+    :return: a futások listája, a legrégebbi az első
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def save_benchmark_run(run, path=benchmark_history_path):
+    """
+    A futás eredményét az előzményekhez fűzi.
+    :param run: a run_benchmarks() által visszaadott szótár
+    :param path: az előzményeket tartalmazó file
+    :return:
+    """
+    history = read_benchmark_history(path)
+    history.append(run)
+    datamanager.write_atomically(path, json.dumps(history, indent=1).encode('utf-8'))
+
+
+def find_regressions(previous, current, tolerance=0.2):
+    """
+    Összeveti két futás eredményeit, és visszaadja azokat a méréseket, amelyeknél az átbocsátás (sor/másodperc) a
+    megadott aránynál jobban csökkent.
+    :param previous: a korábbi futás
+    :param current: az új futás
+    :param tolerance: a még elfogadható relatív csökkenés
+    :return: (lépés, név, sorok száma, korábbi átbocsátás, új átbocsátás) elemek listája
+    """
+    def throughputs(run):
+        return {(result['stage'], result['name'], result['rows']): result['rows_per_second']
+                for result in run['results'] if 'error' not in result and result['rows_per_second']}
+
+    before = throughputs(previous)
+    regressions = []
+    for key, after in throughputs(current).items():
+        if key in before and after < before[key] * (1 - tolerance):
+            regressions.append(key + (before[key], after))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Python Anonymizer benchmarks')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000], help='number of rows of the datasets')
+    parser.add_argument('--stages', nargs='+', default=['detection', 'pseudonymisation', 'anonymisation'])
+    parser.add_argument('--funcs', default='klt', help='anonymisation functions to measure')
+    parser.add_argument('--cardinality', nargs=2, action='append', metavar=('COLUMN', 'COUNT'), default=[],
+                        help='number of distinct values of a generated column')
+    parser.add_argument('--no-memory', action='store_true', help='do not trace memory allocations')
+    parser.add_argument('--history', default=benchmark_history_path, help='the JSON history file')
+    arguments = parser.parse_args()
+
+    run = run_benchmarks(arguments.rows, {column: int(count) for column, count in arguments.cardinality} or None,
+                         arguments.stages, arguments.funcs, trace_memory=not arguments.no_memory)
+    for result in run['results']:
+        print('{stage:16} {name:32} {rows:>10} rows {seconds:10.3f} s'.format(**result),
+              result.get('error', ''))
+    history = read_benchmark_history(arguments.history)
+    if history:
+        for regression in find_regressions(history[-1], run):
+            print('Regression: {} {} ({} rows): {:.0f} -> {:.0f} rows/s'.format(*regression))
+    save_benchmark_run(run, arguments.history)
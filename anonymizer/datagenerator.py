@@ -0,0 +1,254 @@
+from string import ascii_uppercase
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+first_names = np.array([
+    'Anna', 'Bence', 'Csaba', 'Dóra', 'Eszter', 'Ferenc', 'Gábor', 'Hanna', 'István', 'Judit', 'Katalin', 'László',
+    'Márta', 'Nóra', 'Orsolya', 'Péter', 'Réka', 'Sándor', 'Tamás', 'Zoltán', 'Zsófia', 'Ágnes', 'Éva', 'Balázs'
+])
+last_names = np.array([
+    'Nagy', 'Kovács', 'Tóth', 'Szabó', 'Horváth', 'Varga', 'Kiss', 'Molnár', 'Németh', 'Farkas', 'Balogh', 'Papp',
+    'Takács', 'Juhász', 'Lakatos', 'Mészáros', 'Oláh', 'Simon', 'Rácz', 'Fekete'
+])
+email_names = np.array([unidecode(name.lower()) for name in first_names])
+email_domains = np.array(['gmail.com', 'freemail.hu', 'citromail.hu', 'outlook.com', 't-online.hu', 'yahoo.com'])
+countries = np.array(['Hungary', 'Austria', 'Slovakia', 'Romania', 'Serbia', 'Croatia', 'Slovenia', 'Ukraine',
+                      'Germany', 'Poland'])
+diseases = np.array(['influenza', 'diabetes', 'asthma', 'hypertension', 'migraine', 'pneumonia', 'bronchitis',
+                     'anemia', 'gastritis', 'arthritis'])
+phone_prefixes = np.array(['+36 20', '+36 30', '+36 70', '06 1', '06 20', '06 30', '06 70'])
+plate_letters = np.array(list(ascii_uppercase))
+hex_codes = np.array([ord(character) for character in '0123456789abcdef'], dtype=np.uint32)
+
+
+def digits_to_strings(digits):
+    """
+    Egy számjegy-mátrix sorait szövegekké alakítja, a karakterkódok egész tömbként való értelmezésével.
+    :param digits: a számjegyeket soronként tartalmazó egész mátrix
+    :return: a szövegeket tartalmazó tömb
+    """
+    codes = np.ascontiguousarray(digits + ord('0'), dtype=np.uint32)
+    return codes.view('U{}'.format(digits.shape[1])).ravel()
+
+
+def fix_checksum(digits, weights, modulus, position):
+    """
+    A paraméterben kapott számjegy-mátrix azon soraiban, ahol a súlyozott összeg maradéka nem lehet ellenőrző számjegy
+    (vagyis 10), a position helyen álló számjegyet addig növeli, amíg érvényes nem lesz.
+    :param digits: a számjegy-mátrix, helyben módosul
+    :param weights: a súlyok soronként, vagy egy közös súlyvektor
+    :param modulus: az ellenőrző összeg modulusa
+    :param position: a módosítandó számjegy oszlopa
+    :return: a súlyozott összegek maradékai
+    """
+    while True:
+        remainders = np.einsum('ij,ij->i', digits[:, :weights.shape[-1]].astype(np.int64),
+                               np.broadcast_to(weights, (len(digits), weights.shape[-1]))) % modulus
+        invalid = remainders >= 10
+        if not invalid.any():
+            return remainders
+        digits[invalid, position] = (digits[invalid, position] + 1) % 10
+
+
+def generate_taj_numbers(count, rng):
+    """
+    Érvényes ellenőrző összegű TAJ számokat generál (lásd detection.is_taj_number_hungarian()).
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :return: a szövegeket tartalmazó tömb
+    """
+    digits = rng.integers(0, 10, size=(count, 9))
+    digits[:, 8] = digits[:, :8] @ np.array([3, 7, 3, 7, 3, 7, 3, 7]) % 10
+    return digits_to_strings(digits)
+
+
+def generate_tax_numbers(count, rng):
+    """
+    Érvényes ellenőrző összegű magyar adóazonosító jeleket generál (lásd detection.is_tax_number_hungarian()).
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :return: a szövegeket tartalmazó tömb
+    """
+    digits = rng.integers(0, 10, size=(count, 10))
+    digits[:, 0] = 8
+    digits[:, 9] = fix_checksum(digits, np.arange(1, 10), 11, 8)
+    return digits_to_strings(digits)
+
+
+def generate_personal_numbers(count, rng):
+    """
+    Érvényes formátumú és ellenőrző összegű magyar személyi számokat generál (lásd
+    detection.is_personal_number_hungarian()).
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :return: a szövegeket tartalmazó tömb
+    """
+    digits = rng.integers(0, 10, size=(count, 11))
+    digits[:, 0] = rng.integers(1, 5, size=count)
+    month = rng.integers(1, 13, size=count)
+    day = rng.integers(1, 29, size=count)
+    digits[:, 3], digits[:, 4] = month // 10, month % 10
+    digits[:, 5], digits[:, 6] = day // 10, day % 10
+    year = digits[:, 1] * 10 + digits[:, 2]
+    weights = np.where((year > 96)[:, None], np.arange(10, 0, -1), np.arange(1, 11))
+    digits[:, 10] = fix_checksum(digits, weights, 11, 9)
+    return digits_to_strings(digits)
+
+
+def generate_licence_plates(count, rng):
+    """
+    Általános formátumú (3 betű, 3 szám) magyar rendszámokat generál.
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :return: a szövegeket tartalmazó tömb
+    """
+    letters = plate_letters[rng.integers(0, len(plate_letters), size=(count, 3))]
+    numbers = digits_to_strings(rng.integers(0, 10, size=(count, 3)))
+    return pd.Series(letters[:, 0]).str.cat([letters[:, 1], letters[:, 2], pd.Series(['-'] * count),
+                                             pd.Series(numbers)]).to_numpy()
+
+
+def generate_phone_numbers(count, rng):
+    """
+    Magyar telefonszámokat generál, pl. +36 30 123 4567.
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :return: a szövegeket tartalmazó tömb
+    """
+    prefixes = pd.Series(phone_prefixes[rng.integers(0, len(phone_prefixes), size=count)])
+    first = pd.Series(digits_to_strings(rng.integers(0, 10, size=(count, 3))))
+    second = pd.Series(digits_to_strings(rng.integers(0, 10, size=(count, 4))))
+    return prefixes.str.cat([first, second], sep=' ').to_numpy()
+
+
+def generate_names(count, rng):
+    """
+    Magyar neveket generál vezetéknév keresztnév formában.
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :return: a szövegeket tartalmazó tömb
+    """
+    last = pd.Series(last_names[rng.integers(0, len(last_names), size=count)])
+    first = pd.Series(first_names[rng.integers(0, len(first_names), size=count)])
+    return last.str.cat(first, sep=' ').to_numpy()
+
+
+def generate_emails(count, rng):
+    """
+    Email címeket generál. A helyi rész egy név és egy sorszám, így az értékek különbözőek.
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :return: a szövegeket tartalmazó tömb
+    """
+    names = pd.Series(email_names[rng.integers(0, len(email_names), size=count)])
+    numbers = pd.Series(np.arange(count)).astype(str)
+    domains = pd.Series(email_domains[rng.integers(0, len(email_domains), size=count)])
+    return names.str.cat(numbers, sep='.').str.cat(domains, sep='@').to_numpy()
+
+
+def hex_groups_to_strings(nibbles, group, separator):
+    """
+    Egy hexadecimális számjegy-mátrix sorait szövegekké alakítja úgy, hogy minden group számjegy után elválasztó
+    karakter kerül (kivéve a sor végét).
+    :param nibbles: a számjegyek értékeit (0-15) soronként tartalmazó egész mátrix
+    :param group: az egy csoportba tartozó számjegyek száma
+    :param separator: az elválasztó karakter
+    :return: a szövegeket tartalmazó tömb
+    """
+    count, width = nibbles.shape
+    groups = width // group
+    codes = np.full((count, groups, group + 1), ord(separator), dtype=np.uint32)
+    codes[:, :, :group] = hex_codes[nibbles.reshape(count, groups, group)]
+    codes = np.ascontiguousarray(codes.reshape(count, groups * (group + 1))[:, :-1])
+    return codes.view('U{}'.format(codes.shape[1])).ravel()
+
+
+def generate_ip_addresses(count, rng, ipv6_ratio=0.25):
+    """
+    IP címeket generál, nagyjából ipv6_ratio arányban IPv6 (teljes, nem tömörített alakú), a többi IPv4 cím.
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :param ipv6_ratio: az IPv6 címek várható aránya
+    :return: a szövegeket tartalmazó tömb
+    """
+    octets = pd.DataFrame(rng.integers(0, 256, size=(count, 4))).astype(str)
+    addresses = octets[0].str.cat([octets[1], octets[2], octets[3]], sep='.').to_numpy(dtype=object)
+    ipv6 = rng.random(count) < ipv6_ratio
+    addresses[ipv6] = hex_groups_to_strings(rng.integers(0, 16, size=(int(ipv6.sum()), 32)), 4, ':')
+    return addresses
+
+
+def generate_mac_addresses(count, rng):
+    """
+    Kettősponttal tagolt, kisbetűs MAC címeket generál, pl. 00:1a:2b:3c:4d:5e.
+    :param count: a generálandó értékek száma
+    :param rng: a numpy véletlenszám-generátor
+    :return: a szövegeket tartalmazó tömb
+    """
+    return hex_groups_to_strings(rng.integers(0, 16, size=(count, 12)), 2, ':')
+
+
+def generate_choices(values):
+    """
+    Egy olyan generátor függvényt ad vissza, ami a megadott értékek közül választ véletlenszerűen.
+    :param values: a választható értékek tömbje
+    :return: a generátor függvény
+    """
+    def generate(count, rng):
+        return values[rng.integers(0, len(values), size=count)]
+    return generate
+
+
+# az oszlopok és az értékeiket előállító függvények, a függvények paraméterei a darabszám és a véletlenszám-generátor
+column_generators = {
+    'nev': generate_names,
+    'kor': lambda count, rng: rng.integers(0, 100, size=count),
+    'nem': generate_choices(np.array(['ferfi', 'no'])),
+    'iranyitoszam': lambda count, rng: rng.integers(1000, 10000, size=count),
+    'orszag': generate_choices(countries),
+    'email': generate_emails,
+    'telefonszam': generate_phone_numbers,
+    'rendszam': generate_licence_plates,
+    'taj': generate_taj_numbers,
+    'adoszam': generate_tax_numbers,
+    'szemelyi_szam': generate_personal_numbers,
+    'ip_cim': generate_ip_addresses,
+    'mac_cim': generate_mac_addresses,
+    'betegseg': generate_choices(diseases)
+}
+
+# a generált adathalmaz kategorikus oszlopai
+categorical_columns = {'nev', 'nem', 'orszag', 'email', 'telefonszam', 'rendszam', 'taj', 'adoszam', 'szemelyi_szam',
+                       'ip_cim', 'mac_cim', 'betegseg'}
+
+
+def generate_dataset(rows, cardinalities=None, columns=None, seed=0):
+    """
+    Szintetikus, személyes adatokat tartalmazó adathalmazt generál teljesítménymérésekhez. Az azonosítók (TAJ szám,
+    adószám, személyi szám) érvényes ellenőrző összeggel készülnek, így a kereső függvények felismerik őket. Ha egy
+    oszlophoz számosság van megadva, akkor először annyi érték generálódik, és a sorok ezek közül kapnak
+    véletlenszerűen egyet, egyébként minden sor külön generált értéket kap. A különböző értékek száma legfeljebb a
+    megadott számosság (a szűk értékkészletű oszlopoknál, pl. nem, kevesebb is lehet).
+    :param rows: a sorok száma
+    :param cardinalities: szótár, ami oszlopnevekhez a különböző értékeik számát rendeli
+    :param columns: a generálandó oszlopok (a column_generators kulcsai), ha None, akkor mindegyik
+    :param seed: a véletlenszám-generátor kezdőértéke
+    :return: a DataFrame
+    """
+    if cardinalities is None:
+        cardinalities = {}
+    if columns is None:
+        columns = list(column_generators)
+    rng = np.random.default_rng(seed)
+    data = {}
+    for column in columns:
+        if column not in column_generators:
+            raise ValueError("Unknown column: {}".format(column))
+        cardinality = cardinalities.get(column)
+        if cardinality is None:
+            data[column] = column_generators[column](rows, rng)
+        else:
+            pool = pd.unique(column_generators[column](min(cardinality, rows), rng))
+            data[column] = pool[rng.integers(0, len(pool), size=rows)]
+    return pd.DataFrame(data)
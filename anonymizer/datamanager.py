@@ -1,6 +1,19 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
 import pandas as pd
 from unidecode import unidecode
 
+# a referenciaadatok lemezen tárolt gyorsítótárának helye
+reference_cache_dir = 'data/local/cache'
+# a korábbi futások címkéit tartalmazó gyorsítótár
+label_cache_path = 'data/local/label_cache.json'
+
 
 def replace_nan_values(df, categorical):
     """
@@ -21,6 +34,36 @@ def read_labels_file():
     return pd.read_csv('data/local/labels.csv', index_col=None, dtype={'identifier': 'boolean'})
 
 
+def write_labels_file(labels_frame):
+    """
+    Kiírja a címkéket tartalmazó DataFramet a labels.csv fileba, egyetlen atomi írással.
+    :param labels_frame: a címkéket tartalmazó DataFrame
+    :return:
+    """
+    write_atomically('data/local/labels.csv', labels_frame.to_csv(index=False).encode('utf-8'))
+
+
+def read_label_cache():
+    """
+    Beolvassa a korábbi futások címkéit tartalmazó gyorsítótárat (lásd detection.find_and_label()).
+    :return: szótár, ami adathalmaz-nevekhez oszlopnevenként az oszlop lenyomatát és a címkéit rendeli
+    """
+    try:
+        with open(label_cache_path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_label_cache(cache):
+    """
+    Elmenti a címkék gyorsítótárát, egyetlen atomi írással.
+    :param cache: a read_label_cache() által visszaadott formátumú szótár
+    :return:
+    """
+    write_atomically(label_cache_path, json.dumps(cache, indent=1).encode('utf-8'))
+
+
 def read_hungarian_names():
     female_names = pd.read_csv(filepath_or_buffer="http://www.nytud.mta.hu/oszt/nyelvmuvelo/utonevek/osszesnoi.txt",
                                delimiter="\n", encoding="ISO-8859-1")
@@ -54,20 +97,515 @@ def read_hungarian_diseases():
     return hungarian_diseases
 
 
+def read_country_regions():
+    country_regions = pd.read_csv(
+        'https://raw.githubusercontent.com/lukes/ISO-3166-Countries-with-Regional-Codes/master/all/all.csv',
+        usecols=['name', 'alpha-2', 'alpha-3', 'region'])
+    return country_regions
+
+
+# a referenciaadatok nevei, a betöltésüket végző függvények és a gyorsítótárban tárolt formátum verziója. Ha egy
+# betöltő függvény kimenete megváltozik, akkor a verziószámot növelni kell, így a régi gyorsítótár érvénytelenné válik.
+reference_datasets = {
+    'hungarian names': (read_hungarian_names, 1),
+    'countries': (read_countries, 1),
+    'country regions': (read_country_regions, 1),
+    'diseases': (read_diseases, 1),
+    'hungarian diseases': (read_hungarian_diseases, 1)
+}
+
+# a futás során már betöltött referenciaadatok
+loaded_reference_data = {}
+
+
+def read_reference_manifest():
+    """
+    Beolvassa a gyorsítótárban tárolt referenciaadatok verzióit és ellenőrző összegeit tartalmazó filet.
+    :return: a referenciaadatok nevei és a hozzájuk tartozó bejegyzések
+    """
+    try:
+        with open(os.path.join(reference_cache_dir, 'manifest.json'), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_atomically(path, content):
+    """
+    A filet egy ideiglenes fileba írja, majd átnevezi, így megszakadt írás esetén sem marad félig megírt file. Az
+    ideiglenes file neve egyedi, így az egyszerre író folyamatok nem zavarják egymást.
+    :param path: a file elérési útja
+    :param content: a file tartalma (bytes)
+    :return:
+    """
+    directory, name = os.path.split(path)
+    handle, temporary = tempfile.mkstemp(dir=directory or '.', prefix=name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            file.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+@contextmanager
+def file_lock(path, timeout=60.0, stale_after=600.0):
+    """
+    Kizárólagos zárat tart a blokk idejére egy zárolófile létrehozásával, így a file olvasás-módosítás-írás lépései nem
+    keveredhetnek össze több folyamat között. A megadott időnél régebbi zárolófile egy megszakadt folyamat maradványa,
+    ezért törlődik.
+    :param path: a zárolandó file elérési útja, a zárolófile ennek '.lock' végződésű párja
+    :param timeout: legfeljebb ennyi másodpercig vár a zárra
+    :param stale_after: az ennél régebbi (másodpercben) zárolófile elavultnak számít
+    """
+    lock_path = path + '.lock'
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError("Could not acquire lock on {}".format(path))
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+def load_cached_reference_data(name, version):
+    """
+    A gyorsítótárból tölti be a referenciaadatot, ha az ott tárolt verzió megegyezik a kérttel, és a file ellenőrző
+    összege helyes.
+    :param name: a referenciaadat neve
+    :param version: a referenciaadat elvárt verziója
+    :return: a betöltött adat, vagy None, ha nincs érvényes gyorsítótárbeli példány
+    """
+    entry = read_reference_manifest().get(name)
+    if entry is None or entry['version'] != version:
+        return None
+    try:
+        with open(os.path.join(reference_cache_dir, entry['file']), 'rb') as file:
+            content = file.read()
+    except OSError:
+        return None
+    if hashlib.sha256(content).hexdigest() != entry['sha256']:
+        return None
+    return pickle.loads(content)
+
+
+def save_cached_reference_data(name, version, data):
+    """
+    A referenciaadatot bináris formában a gyorsítótárba menti, és feljegyzi a verzióját és ellenőrző összegét.
+    :param name: a referenciaadat neve
+    :param version: a referenciaadat verziója
+    :param data: a mentendő adat
+    :return:
+    """
+    os.makedirs(reference_cache_dir, exist_ok=True)
+    content = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    file_name = '{}-v{}.pkl'.format(name.replace(' ', '_'), version)
+    write_atomically(os.path.join(reference_cache_dir, file_name), content)
+
+    # a manifest a zár alatt olvasódik újra, így a más folyamatok által közben felvett bejegyzések nem vesznek el
+    manifest_path = os.path.join(reference_cache_dir, 'manifest.json')
+    with file_lock(manifest_path):
+        manifest = read_reference_manifest()
+        manifest[name] = {'version': version, 'file': file_name, 'sha256': hashlib.sha256(content).hexdigest()}
+        write_atomically(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+
+def get_reference_data(name):
+    """
+    Visszaadja a névhez tartozó referenciaadatot. Az adat az első használatkor töltődik be: ha a gyorsítótárban van
+    érvényes példánya, akkor onnan, egyébként a betöltő függvény hívásával (ami letöltést is jelenthet), és ilyenkor a
+    gyorsítótárba is elmentődik. Így a program a gyorsítótár feltöltése után hálózat nélkül is működik.
+    :param name: a referenciaadat neve, a reference_datasets kulcsai közül
+    :return: a referenciaadat
+    """
+    if name not in loaded_reference_data:
+        loader, version = reference_datasets[name]
+        data = load_cached_reference_data(name, version)
+        if data is None:
+            data = loader()
+            save_cached_reference_data(name, version, data)
+        loaded_reference_data[name] = data
+    return loaded_reference_data[name]
+
+
+def prefetch_reference_data(names=None):
+    """
+    Betölti (és szükség esetén letölti) a referenciaadatokat, hogy a gyorsítótár később hálózat nélkül is használható
+    legyen.
+    :param names: a betöltendő referenciaadatok nevei, ha None, akkor az összes
+    :return:
+    """
+    for name in names if names is not None else reference_datasets:
+        get_reference_data(name)
+
+
+# a fájlkiterjesztésekhez tartozó adatformátumok, a többi kiterjesztés csv-nek számít
+dataset_formats = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather'
+}
+
+
+def get_dataset_format(path):
+    """
+    A file kiterjesztése alapján megállapítja az adatformátumot.
+    :param path: a file elérési útja
+    :return: 'parquet', 'feather' vagy 'csv'
+    """
+    return dataset_formats.get(os.path.splitext(str(path))[1].lower(), 'csv')
+
+
+def read_csv_dataset(path, columns=None, column_names=None, **kwargs):
+    """
+    Csv filet olvas be. Ha a column_names meg van adva, akkor a filenak nincs fejléce, és az oszlopok ezeket a neveket
+    kapják, egyébként a nevek a fejlécből jönnek.
+    """
+    if column_names is None:
+        return pd.read_csv(path, index_col=False, usecols=columns, **kwargs)
+    return pd.read_csv(path, index_col=False, header=None, names=column_names, usecols=columns, **kwargs)
+
+
+def read_dataset(path, columns=None, column_names=None, nrows=None):
+    """
+    Beolvas egy adathalmazt csv, Parquet vagy Feather (Arrow IPC) fileból. Oszlopos formátumok esetén csak a kért
+    oszlopok olvasódnak be a lemezről, és a kategorikus oszlopok típusa megmarad.
+    :param path: a file elérési útja
+    :param columns: ha meg van adva, akkor csak ezek az oszlopok olvasódnak be
+    :param column_names: fejléc nélküli csv file esetén az oszlopok nevei, oszlopos formátumoknál nincs hatása
+    :param nrows: ha meg van adva, akkor csak az első nrows sor olvasódik be
+    :return: a DataFrame
+    """
+    dataset_format = get_dataset_format(path)
+    if dataset_format == 'csv':
+        return read_csv_dataset(path, columns, column_names, nrows=nrows)
+    if nrows is not None:
+        chunks = []
+        remaining = nrows
+        for chunk in iter_dataset(path, min(nrows, 65536) or 1, columns):
+            chunks.append(chunk.iloc[:remaining])
+            remaining -= len(chunks[-1])
+            if remaining <= 0:
+                break
+        return pd.concat(chunks, ignore_index=True) if chunks else read_dataset(path, columns).iloc[:0]
+    if dataset_format == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_feather(path, columns=columns)
+
+
+def iter_dataset(path, chunksize, columns=None, column_names=None, dtype=None):
+    """
+    Darabokban olvas be egy adathalmazt, a darabok indexe 0-tól indul. Parquet file esetén a darabok a sorcsoportokból
+    (row group) készülnek, és legfeljebb chunksize sorosak, így egyszerre csak egy sorcsoport van a memóriában.
+    :param path: a file elérési útja
+    :param chunksize: egy darab legnagyobb mérete
+    :param columns: ha meg van adva, akkor csak ezek az oszlopok olvasódnak be
+    :param column_names: fejléc nélküli csv file esetén az oszlopok nevei, oszlopos formátumoknál nincs hatása
+    :param dtype: csv file esetén a pd.read_csv() dtype paramétere, pl. {'id': str}, így az oszlop típusa nem
+    darabonként dől el; oszlopos formátumoknál nincs hatása, ott a típus a fileban tárolt séma
+    :return: a darabokat adó generátor
+    """
+    dataset_format = get_dataset_format(path)
+    if dataset_format == 'csv':
+        yield from read_csv_dataset(path, columns, column_names, chunksize=chunksize, dtype=dtype)
+    elif dataset_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            # a táblán keresztüli konverzió a pandas metaadatokat (pl. a kategóriák sorrendjét) is visszaállítja
+            yield pa.Table.from_batches([batch]).to_pandas()
+    else:
+        # a Feather file-t memóriába képezve olvassa, így a darabolás nem másolja az egész filet
+        import pyarrow.feather as feather
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        for start in range(0, table.num_rows, chunksize):
+            yield table.slice(start, chunksize).to_pandas()
+
+
+class DatasetWriter:
+    """
+    Darabonként ír ki egy adathalmazt csv, Parquet vagy Feather fileba. Parquet esetén minden darab egy külön
+    sorcsoport lesz, és a kategorikus oszlopok szótárként (dictionary) tárolódnak, így a kategorikus típus a
+    visszaolvasáskor megmarad. A Parquet séma oszloponként az első olyan darabból jön, amiben az oszlopnak van nem
+    hiányzó értéke, ezért a darabok addig a memóriában várakoznak, amíg minden oszlopban elő nem fordul érték (vagy a
+    file le nem zárul). Feather esetén a darabok a lezáráskor íródnak ki egyben.
+    Használata: with DatasetWriter(path) as writer: writer.write(df)
+    """
+
+    def __init__(self, path):
+        """
+        :param path: a kimeneti file elérési útja, a formátum a kiterjesztésből jön
+        """
+        self.path = path
+        self.format = get_dataset_format(path)
+        self.rows = 0
+        self.writer = None
+        self.schema = None
+        self.chunks = []
+        self.null_columns = None
+
+    def write(self, df: pd.DataFrame):
+        """
+        Kiírja a következő darabot. Az index nem íródik ki.
+        :param df: a darab
+        :return:
+        """
+        if self.format == 'csv':
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=(self.rows == 0), index=False)
+        elif self.format == 'parquet' and self.writer is not None:
+            self.write_parquet(df)
+        elif self.format == 'parquet':
+            self.chunks.append(df)
+            null_columns = {column for column in df.columns if df[column].isna().all()}
+            self.null_columns = null_columns if self.null_columns is None else self.null_columns & null_columns
+            if not self.null_columns:
+                self.open_parquet()
+        else:
+            self.chunks.append(df)
+        self.rows += len(df)
+
+    def open_parquet(self):
+        """
+        Megnyitja a Parquet filet a várakozó darabokból összeállított sémával, és kiírja a darabokat.
+        :return:
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # oszloponként az első nem hiányzó érték adja a típust, a csupa hiányzó értékű oszlopoké az első darabból jön
+        sample = {}
+        for column in self.chunks[0].columns:
+            values = next((chunk[column] for chunk in self.chunks if chunk[column].notna().any()),
+                          self.chunks[0][column])
+            sample[column] = values[values.notna()].iloc[:1].reset_index(drop=True)
+            if sample[column].empty:
+                sample[column] = values.iloc[:1].reset_index(drop=True)
+        self.schema = pa.Table.from_pandas(pd.DataFrame(sample), preserve_index=False).schema
+        self.writer = pq.ParquetWriter(self.path, self.schema)
+        for chunk in self.chunks:
+            self.write_parquet(chunk)
+        self.chunks = []
+
+    def write_parquet(self, df):
+        """
+        Sorcsoportként kiírja a darabot a séma szerint. A csupa hiányzó értékű oszlopok None értékekké alakulnak, így
+        bármilyen típusra konvertálhatók (pl. egy NaN-okat tartalmazó float oszlop is szöveges oszlopra).
+        :param df: a darab
+        :return:
+        """
+        import pyarrow as pa
+        null_columns = {column: pd.Series([None] * len(df), index=df.index, dtype=object)
+                        for column in df.columns if df[column].isna().all()}
+        if null_columns:
+            df = df.assign(**null_columns)
+        self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        """
+        Lezárja a filet.
+        :return:
+        """
+        if self.format == 'parquet' and self.writer is None and self.chunks:
+            self.open_parquet()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.chunks:
+            pd.concat(self.chunks, ignore_index=True).to_feather(self.path)
+            self.chunks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_dataset(df: pd.DataFrame, path):
+    """
+    Kiír egy adathalmazt csv, Parquet vagy Feather fileba, a formátum a kiterjesztésből jön.
+    :param df: a DataFrame
+    :param path: a kimeneti file elérési útja
+    :return:
+    """
+    with DatasetWriter(path) as writer:
+        writer.write(df)
+
+
+class MappingStore:
+    """
+    Lemezen, SQLite adatbázisban tárolt hozzárendelés-tár az eredeti értékek és a pszeudonimek között. A hozzárendelések
+    névterekbe (pl. oszlopnevekbe) vannak sorolva. Több folyamat is használhatja egyszerre ugyanazt a filet: a beszúrás
+    nem írja felül a már létező hozzárendelést, a sorszámok és a véletlen szövegek kiosztása pedig kizárólagos zárolás
+    mellett történik.
+    """
+
+    def __init__(self, path, timeout=60.0):
+        """
+        Megnyitja (szükség esetén létrehozza) a hozzárendelés-tárat.
+        :param path: az adatbázis file elérési útja
+        :param timeout: ennyi másodpercig vár, ha egy másik folyamat zárolja az adatbázist
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS mappings (namespace TEXT NOT NULL, original TEXT NOT NULL, '
+            'pseudonym TEXT NOT NULL, PRIMARY KEY (namespace, original))')
+        # a kiosztott pszeudonimek kereséséhez (lásd assign_texts())
+        self.connection.execute('CREATE INDEX IF NOT EXISTS mappings_pseudonym ON mappings (namespace, pseudonym)')
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS lookup_keys (original TEXT PRIMARY KEY)')
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """
+        Tranzakciót nyit, ami a blokk végén véglegesítődik, hiba esetén pedig visszagörgetődik.
+        :param immediate: ha True, akkor az írási zár már a tranzakció elején megszerződik
+        """
+        self.connection.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def select(self, namespace, originals):
+        """
+        Egy már megnyitott tranzakción belül kikeresi az értékekhez tartozó pszeudonimeket. A keresett értékek egy
+        ideiglenes táblába kerülnek, így a keresés egyetlen lekérdezéssel történik.
+        :param namespace: a névtér
+        :param originals: a keresett értékek
+        :return: szótár, ami a megtalált értékekhez (szövegként) a pszeudonimjeiket rendeli
+        """
+        self.connection.execute('DELETE FROM lookup_keys')
+        self.connection.executemany('INSERT OR IGNORE INTO lookup_keys VALUES (?)', ((str(x),) for x in originals))
+        rows = self.connection.execute(
+            'SELECT m.original, m.pseudonym FROM mappings AS m JOIN lookup_keys AS k ON m.original = k.original '
+            'WHERE m.namespace = ?', (namespace,))
+        return dict(rows)
+
+    def lookup(self, namespace, originals):
+        """
+        Kikeresi az értékekhez tartozó pszeudonimeket.
+        :param namespace: a névtér
+        :param originals: a keresett értékek
+        :return: szótár, ami a megtalált értékekhez (szövegként) a pszeudonimjeiket rendeli
+        """
+        with self.transaction():
+            return self.select(namespace, originals)
+
+    def insert(self, namespace, pairs):
+        """
+        Elmenti a hozzárendeléseket. A már létező hozzárendelések nem íródnak felül.
+        :param namespace: a névtér
+        :param pairs: (eredeti érték, pszeudonim) párok
+        :return:
+        """
+        with self.transaction():
+            self.connection.executemany('INSERT OR IGNORE INTO mappings VALUES (?, ?, ?)',
+                                        ((namespace, str(original), str(pseudonym)) for original, pseudonym in pairs))
+
+    def assign_numbers(self, namespace, originals):
+        """
+        Az értékekhez sorszámot rendel: a már ismert értékek a korábban kiosztott sorszámukat kapják, az újak pedig a
+        következő szabad sorszámokat. A kiosztás kizárólagos zárolás mellett történik, így párhuzamosan futó
+        folyamatok is ugyanazt a sorszámot kapják ugyanarra az értékre.
+        :param namespace: a névtér
+        :param originals: az értékek
+        :return: szótár, ami az értékekhez (szövegként) a sorszámukat rendeli
+        """
+        originals = list(dict.fromkeys(str(x) for x in originals))
+        with self.transaction(immediate=True):
+            assigned = self.select(namespace, originals)
+            next_number = self.connection.execute(
+                'SELECT COALESCE(MAX(CAST(pseudonym AS INTEGER)) + 1, 0) FROM mappings WHERE namespace = ?',
+                (namespace,)).fetchone()[0]
+            new_pairs = []
+            for original in originals:
+                if original not in assigned:
+                    assigned[original] = str(next_number)
+                    new_pairs.append((namespace, original, str(next_number)))
+                    next_number += 1
+            self.connection.executemany('INSERT INTO mappings VALUES (?, ?, ?)', new_pairs)
+        return {original: int(number) for original, number in assigned.items()}
+
+    def assign_texts(self, namespace, originals, generate):
+        """
+        Az értékekhez pszeudonim szövegeket rendel: a már ismert értékek a korábban kiosztott szövegüket kapják, az
+        újak pedig a generate függvény által adott szövegeket. Az új szövegek közül a névtérben már kiosztottak
+        kiesnek, és helyettük újak generálódnak. A kiosztás kizárólagos zárolás mellett történik, így párhuzamosan
+        futó folyamatok sem adhatják ugyanazt a pszeudonimet különböző értékeknek.
+        :param namespace: a névtér
+        :param originals: az értékek
+        :param generate: függvény, ami a kért számú, egymástól különböző szöveget adja vissza, és a kizárandó
+        szövegek halmazát is megkapja, pl. lambda count, exclude: generate_texts(count, 10, exclude)
+        :return: szótár, ami az értékekhez (szövegként) a pszeudonimjüket rendeli
+        """
+        originals = list(dict.fromkeys(str(x) for x in originals))
+        with self.transaction(immediate=True):
+            assigned = self.select(namespace, originals)
+            missing = [original for original in originals if original not in assigned]
+            texts = []
+            taken = set()
+            while len(texts) < len(missing):
+                candidates = [str(text) for text in generate(len(missing) - len(texts), taken | set(texts))]
+                self.connection.execute('DELETE FROM lookup_keys')
+                self.connection.executemany('INSERT OR IGNORE INTO lookup_keys VALUES (?)',
+                                            ((text,) for text in candidates))
+                used = {row[0] for row in self.connection.execute(
+                    'SELECT m.pseudonym FROM mappings AS m JOIN lookup_keys AS k ON m.pseudonym = k.original '
+                    'WHERE m.namespace = ?', (namespace,))}
+                taken |= used
+                texts.extend(text for text in candidates if text not in used)
+            new_pairs = list(zip(missing, texts))
+            self.connection.executemany('INSERT INTO mappings VALUES (?, ?, ?)',
+                                        ((namespace, original, text) for original, text in new_pairs))
+            assigned.update(new_pairs)
+        return assigned
+
+    def close(self):
+        self.connection.close()
+
+
 class WorkData:
     def __init__(self, df: pd.DataFrame, sensitive_column: str, k: int, ldiv: int = None, p: float = None,
-                 column_names: tuple = None, categorical: set = None, feature_columns=None):
+                 column_names: tuple = None, categorical: set = None, feature_columns=None, pseudonym_key=None,
+                 mapping_store: MappingStore = None, hierarchies: dict = None):
         self.df = df
         self.sensitive_column = sensitive_column
         self.k = k
         self.ldiv = ldiv
         self.p = p
+        # ha meg van adva, akkor a pszeudonimizálás ezzel a titkos kulccsal, determinisztikusan (HMAC) történik
+        if isinstance(pseudonym_key, str):
+            pseudonym_key = pseudonym_key.encode('utf-8')
+        self.pseudonym_key = pseudonym_key
+        # ha meg van adva, akkor a kiosztott pszeudonimek ebbe a tárba is elmentődnek
+        self.mapping_store = mapping_store
         if column_names is None:
             self.column_names = set(df.columns)
         else:
             self.column_names = column_names
         # TODO itt is ellenorizni a None erteket
         self.categorical = categorical
+        # a kategorikus oszlopok általánosítási hierarchiái (oszlopnév -> hierarchy.Hierarchy), az ezekkel rendelkező
+        # oszlopokban az anonimizálás a partíció értékeinek legközelebbi közös ősét írja ki
+        self.hierarchies = hierarchies if hierarchies is not None else {}
         if feature_columns is None:
             self.feature_columns = list(self.column_names)
             self.feature_columns.remove(sensitive_column)
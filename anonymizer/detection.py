@@ -1,16 +1,24 @@
+import hashlib
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import pandas as pd
 from unidecode import unidecode
 import ipaddress
+from statistics import NormalDist
 import numpy as np
 import datamanager
+import instrumentation
+from automaton import Automaton
 
-tax_regex = re.compile(r'^8[0-9]{9}$')
-taj_regex = re.compile(r'^[0-9]{9}$')
-personal_number_regex = re.compile(r'^[1-8]([0-9]{2})(0[1-9]|1[0-2])(0[1-9]|[1-2][0-9]|[3][0-1])[0-9]{4}$')
-phone_number_regex = re.compile(r'^(?:(?:\+?3|0)6)(?:[-( ])?(?:[0-9]{1,2})(?:[-) ])?(?:[0-9]{3})[- ]?(?:[0-9]{3,4})$')
+phone_number_regex = re.compile(r'^(?:(?:\+?3|0)6)(?:[-( ])?(?:[0-9]{1,2})(?:[-) ])?(?:[0-9]{3})[- ]?(?:[0-9]{3,4})\Z')
 mac_regex = re.compile(r'^(([0-9A-Fa-f]{2}[-:. ]){5}[0-9A-Fa-f]{2})|(([0-9A-Fa-f]{4}[:. ]){2}[0-9A-Fa-f]{4})$')
 email_regex = re.compile(r'^.+@.+\..+$')
+# szigorú IPv4 kifejezés: pontosan négy, vezető nullák nélküli 0-255 közötti szám
+ipv4_octet = r'(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+ipv4_regex = re.compile(r'^(?:{0}\.){{3}}{0}\Z'.format(ipv4_octet))
+# az IPv6 címek előszűrője: csak hexadecimális számjegyeket, kettőspontot és pontot tartalmaz, opcionális zóna
+# azonosítóval
+ipv6_candidate_regex = re.compile(r'^[0-9A-Fa-f.]*:[0-9A-Fa-f:.]*(?:%[^%]+)?\Z')
 
 # magyar rendszamokat felismero regex, a tema szempontjabol kevesbe jelentosek kikommentezhetok
 licence_plate_regex = re.compile(
@@ -23,7 +31,7 @@ licence_plate_regex = re.compile(
     r'|[o][t][- ]?[0-9]{2}[- ]?[0-9]{2}'  # old timer, veteran jarmuvek
     r'|[epvz][- ]?[0-9]{5}'  # ideiglenes, proba, vamugyintezes alatt allo (be / ki)
     r'|[c][- ]?[cx][- ]?[0-9]{2}[- ]?[0-9]{2}'  # kulfoldi allampolgarok Mo-n uzemeltetett jarmuvei 2009.04.01 elott
-    r'|[x][- ]?[abc][- ]?[0-9]{2}[- ]?[0-9]{2})$'  # berautok 2004.07.01 elott
+    r'|[x][- ]?[abc][- ]?[0-9]{2}[- ]?[0-9]{2})\Z'  # berautok 2004.07.01 elott
     # r'|[c][d][- ]?[0-9]{3}[- ]?[0-9]{3}'  # diplomaciai testuletek hivatalos jarmuvei 2017.05.01 utan
     # r'|[c][k][- ]?[0-9]{2}[- ]?[0-9]{2}'  # konzuli testuletek diplomaciai mentesseget nem elvezo tagjainak jarmuvei
     # r'|[d][t][- ]?[0-9]{2}[- ]?[0-9]{2}' # diplomaciai testuletek hivatalos jarmuvei 2017.05.01 elott
@@ -38,148 +46,158 @@ licence_plate_regex = re.compile(
 
 def is_disease(
         param,
-        diseases=datamanager.read_diseases()
+        diseases=None
 ):
     """
     A paraméterben kapott Series egyes értékei betegségnevek e.
     :param param: az ellenőrzendő series
-    :param diseases: a betegségeket tartalmazó csv. Forrás: https://www.targetvalidation.org/downloads/data
+    :param diseases: a betegségeket tartalmazó csv, ha None, akkor a 'diseases' referenciaadat. Forrás:
+    https://www.targetvalidation.org/downloads/data
     :return: egy Series, ahol az érték True: ha betegségnév, False: egyébként
     """
+    if diseases is None:
+        diseases = datamanager.get_reference_data('diseases')
     param = param.str.lower()
     return param.isin(diseases)
 
 
 def is_disease_hungarian(
         param,
-        diseases_hu=datamanager.read_hungarian_diseases()
+        diseases_hu=None
 ):
     """
     A paraméterben kapott Series egyes értékei magyar betegségnevek e.
     :param param: az ellenőrzendő Series
-    :param diseases_hu: a betegségeket tartalmazó csv. Forrás: https://koronavirus.gov.hu/elhunytak
+    :param diseases_hu: a betegségeket tartalmazó csv, ha None, akkor a 'hungarian diseases' referenciaadat. Forrás:
+    https://koronavirus.gov.hu/elhunytak
     :return: egy Series, ahol az érték True: ha magyar betegségnév, False: egyébként
     """
+    if diseases_hu is None:
+        diseases_hu = datamanager.get_reference_data('hungarian diseases')
     param = param.str.lower().apply(unidecode)
     return param.isin(diseases_hu['0'])
 
 
+def digit_matrix(param, length):
+    """
+    A paraméterben kapott Series azon értékeit, amelyek pontosan length darab számjegyből állnak, egy kétdimenziós
+    számjegy-mátrixba alakítja. Az átalakítás egy lépésben, a karakterkódok egész tömbként való értelmezésével történik.
+    :param param: a Series
+    :param length: a számjegyek elvárt száma
+    :return: egy logikai tömb, ami megmondja, melyik érték áll length darab számjegyből, valamint ezeknek az értékeknek
+    a számjegyeit soronként tartalmazó uint8 mátrix
+    """
+    values = param.astype(str)
+    mask = (values.str.len() == length).values
+    codes = values.values[mask].astype('U{}'.format(length)).view(np.uint32).reshape(-1, length)
+    is_digit = ((codes >= ord('0')) & (codes <= ord('9'))).all(axis=1)
+    mask[mask] = is_digit
+    digits = (codes[is_digit] - ord('0')).astype(np.uint8)
+    return mask, digits
+
+
 def is_tax_number_hungarian(param):
     """
-    A paraméterben kapott Series egyes értékei magyar adószámok e.
+    A paraméterben kapott Series egyes értékei magyar adószámok e. A magyar adóazonosító számokban az első számjegy a
+    konstans 8, ami a magánszemély minőségre utal. A 2-6. számjegyek a személy születési időpontja és az 1867. január 1.
+    között eltelt napok száma. A 7-9. számjegyek az azonos napon születettek megkülönböztetésére szolgáló
+    véletlenszerűen képzett szám. A 10. számjegy az 1-9. számjegyek felhasználásával készített ellenőrző összeg: ezek
+    értékeit meg kell szorozni azzal, ahányadik helyet foglalják el az azonosítón belül. A kapott szorzatok összegét el
+    kell osztani 11-gyel, és az osztás maradéka lesz a 10. számjegy. Az ellenőrző összegek egyetlen mátrixszorzással
+    számolódnak ki.
     :param param: az ellenőrzendő Series
     :return: egy Series, ahol az érték True: ha magyar adószám, False: egyébként
     """
-    def check_tax_number(par):
-        """
-        Az adószám ellenőrzését végző belső függvény. A magyar adóazonosító számokban az első számjegy a konstans 8, ami
-        a magánszemély minőségre utal. A 2-6. számjegyek a személy születési időpontja és az 1867. január 1. között
-        eltelt napok száma. A 7-9. számjegyek az azonos napon születettek megkülönböztetésére szolgáló véletlenszerűen
-        képzett szám. A 10. számjegy az 1-9. számjegyek felhasználásával készített ellenőrző összeg: ezek értékeit meg
-        kell szorozni azzal, ahányadik helyet foglalják el az azonosítón belül. A kapott szorzatok összegét el kell
-        osztani 11-gyel, és az osztás maradéka lesz a 10. számjegy.
-        :param par: az ellenőrzendő érték
-        :return: True: ha magyar adószám, False: egyébként
-        """
-        if not re.match(tax_regex, par):
-            return False
-        numbers = [int(x) for x in par]
-        sum = 0
-        for i in range(len(numbers) - 1):
-            sum += numbers[i] * (i + 1)
-
-        if sum % 11 != numbers[9]:
-            return False
-        return True
-
-    mask = param.apply(lambda x: check_tax_number(x))
-    return mask
+    mask, digits = digit_matrix(param, 10)
+    checksum = digits[:, :9] @ np.arange(1, 10)
+    mask[mask] = (digits[:, 0] == 8) & (checksum % 11 == digits[:, 9])
+    return pd.Series(mask, index=param.index, name=param.name)
 
 
 def is_taj_number_hungarian(param):
     """
-    A paraméterben kapott Series egyes értékei magyar TAJ számok e.
+    A paraméterben kapott Series egyes értékei magyar TAJ számok e. A TAJ szám 9 számjegyből áll, ebből az első 8
+    számjegyet sorban osztják ki, a 9. számjegy pedig ellenőrző összeg. Ez úgy képződik, hogy a páratlan sorszámú
+    számejgyek értékeit hárommal, a páros sorszámúakat pedig héttel kell megszorozni. Az így kapott számokat össze kell
+    adni, majd az összeget el kell osztani tízzel, és az osztás maradéka lesz 9. számjegy. Az ellenőrző összegek
+    egyetlen mátrixszorzással számolódnak ki.
     :param param: az ellenőrzendő Series
     :return: egy Series, ahol az érték True: ha magyar TAJ szám, False: egyébként
     """
-    def check_taj_number(par):
-        """
-        A TAJ szám ellenőrzését végző belső függvény. A TAJ szám 9 számjegyből áll, ebből az első 8 számjegyet sorban
-        osztják ki, a 9. számjegy pedig ellenőrző összeg. Ez úgy képződik, hogy a páratlan sorszámú számejgyek értékeit
-        hárommal, a páros sorszámúakat pedig héttel kell megszorozni. Az így kapott számokat össze kell adni, majd az
-        összeget el kell osztani tízzel, és az osztás maradéka lesz 9. számjegy.
-        :param par: az ellenőrzendő érték
-        :return: True: ha magyar TAJ szám, False: egyébként
-        """
-        if not re.match(taj_regex, par):
-            return False
-        numbers = [int(x) for x in par]
-        sum = 0
-        for i in range(len(numbers) - 1):
-            if i % 2 == 0 or i == 0:
-                sum += numbers[i] * 3
-            else:
-                sum += numbers[i] * 7
-        if sum % 10 != numbers[8]:
-            return False
-        return True
-
-    mask = param.apply(lambda x: check_taj_number(x))
-    return mask
+    mask, digits = digit_matrix(param, 9)
+    checksum = digits[:, :8] @ np.array([3, 7, 3, 7, 3, 7, 3, 7])
+    mask[mask] = checksum % 10 == digits[:, 8]
+    return pd.Series(mask, index=param.index, name=param.name)
 
 
 def is_personal_number_hungarian(param):
     """
-    A paraméterben kapott Series egyes értékei magyar személyi számok e.
+    A paraméterben kapott Series egyes értékei magyar személyi számok e. A személyi szám első számjegye 1-8 közötti
+    érték lehet. Utána ÉÉHHNN formátumban a születési dátum következik. Ezt három számjegy követi, ami az ugyanakkor
+    születettek megkülönböztetésére szolgál. A 11. szám egy ellenőrző összeg, aminet két számítási módja van. Az
+    1996.12.31 előtt születettek esetén az első 10 számjegy értékeit meg kell szorozni azzal a számmal, ahányadik helyet
+    elfoglalják a sorban. A kapott szorzatokat össze kell adni, majd az összeget el kell osztani 11-gyel, és az osztás
+    maradéka lesz a 11. számjegy. Az 1996.12.31 után születettek esetén annyi a változás, hogy meg van fordítva tehát az
+    első számjegyet kell 10-zel szorozni ... a tizediket pedig 1-gyel. Mindkét súlyozással egy-egy mátrixszorzás
+    készül, és az évszám alapján választódik ki a megfelelő összeg.
     :param param: az ellenőrzendő Series
     :return: egy Series, ahol az érték True: ha magyar személyi szám, False: egyébként
     """
-    def check_personal_number(par):
-        """
-        A személyi szám ellenőrzést végző belső függvény. A személyi szám első számjegye 1-8 közötti érték lehet. Utána
-        ÉÉHHNN formátumban a születési dátum következik. Ezt három számjegy követi, ami az ugyanakkor születettek
-        megkülönböztetésére szolgál. A 11. szám egy ellenőrző összeg, aminet két számítási módja van. Az 1996.12.31
-        előtt születettek esetén az első 10 számjegy értékeit meg kell szorozni azzal a számmal, ahányadik helyet
-        elfoglalják a sorban. A kapott szorzatokat össze kell adni, majd az összeget el kell osztani 11-gyel, és az
-        osztás maradéka lesz a 11. számjegy. Az 1996.12.31 után születettek esetén annyi a változás, hogy meg van
-        fordítva tehát az első számjegyet kell 10-zel szorozni ... a tizediket pedig 1-gyel.
-        :param par: az ellenőrzendő érték
-        :return: True: ha magyar személyi szám, False: egyébként
-        """
-        groups = re.search(personal_number_regex, par)
-        if not groups:
-            return False
-        numbers = [int(x) for x in par]
-        sum = 0
-        if int(groups[1]) > 96:
-            length = len(numbers)
-            for i in range(length - 1):
-                sum += numbers[i] * (length - 1)
-                length -= 1
-        else:
-            for i in range(len(numbers) - 1):
-                sum += numbers[i] * (i + 1)
-        if sum % 11 != numbers[10]:
-            return False
-        return True
-
-    mask = param.apply(lambda x: check_personal_number(x))
-    return mask
+    mask, digits = digit_matrix(param, 11)
+    first = digits[:, 0]
+    year = digits[:, 1] * 10 + digits[:, 2]
+    month = digits[:, 3] * 10 + digits[:, 4]
+    day = digits[:, 5] * 10 + digits[:, 6]
+    # a formátum ellenőrzése: az első számjegy 1-8, a hónap 01-12, a nap 01-31
+    well_formed = (first >= 1) & (first <= 8) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+
+    weights = np.arange(1, 11)
+    checksum = np.where(year > 96, digits[:, :10] @ weights[::-1], digits[:, :10] @ weights)
+    mask[mask] = well_formed & (checksum % 11 == digits[:, 10])
+    return pd.Series(mask, index=param.index, name=param.name)
+
+
+# a névlistákból felépített automaták, hogy ne kelljen minden hívásnál újraépíteni őket
+name_automatons = {}
+
+
+def get_name_automaton(names):
+    """
+    Visszaadja a névlistához tartozó Aho-Corasick automatát. Az automata névlistánként egyszer épül fel.
+    :param names: a neveket tartalmazó Series
+    :return: az Automaton példány
+    """
+    cached = name_automatons.get(id(names))
+    if cached is None or cached[0] is not names:
+        cached = (names, Automaton(names.values))
+        name_automatons[id(names)] = cached
+    return cached[1]
 
 
 def is_hungarian_name(
         param,
-        names=datamanager.read_hungarian_names()
+        names=None,
+        whole_word=False
 ):
     """
-    A paraméterben kapott Series egyes értékei tartalmaznak e magyar keresztnevet.
+    A paraméterben kapott Series egyes értékei tartalmaznak e magyar keresztnevet. A keresés egy, a névlistából
+    előre felépített Aho-Corasick automatával történik, így minden különböző érték egyszer, lineáris időben olvasódik
+    végig.
     :param param: az ellenőrzendő Series
-    :param names: a neveket tartalmazó csv
+    :param names: a neveket tartalmazó csv, ha None, akkor a 'hungarian names' referenciaadat
+    :param whole_word: ha True, akkor csak a teljes szóként előforduló nevek számítanak találatnak
     :return: egy Series, ahol az érték True: ha tartalmaz magyar keresztnevet, False: egyébként
     """
-    param = param.str.lower().apply(unidecode)
-    mask = param.apply(lambda x: any(item for item in names.values if item in x))
-    return mask
+    if names is None:
+        names = datamanager.get_reference_data('hungarian names')
+    automaton = get_name_automaton(names)
+    codes, uniques = pd.factorize(param)
+    found = np.array(
+        [automaton.search(unidecode(value.lower()), whole_word) for value in uniques], dtype=bool
+    )
+    # a hiányzó értékek kódja -1, ezekre nincs találat
+    found = np.append(found, False)
+    return pd.Series(found[codes], index=param.index, name=param.name)
 
 
 def is_licence_plate_hungarian(param):
@@ -219,38 +237,76 @@ def is_email_address(param):
     return param.str.match(email_regex)
 
 
-def is_ip_address(param):
+def pack_ip_addresses(param):
     """
-    A paraméterben kapott Series egyes értékei IP címek e.
-    :param param: az ellenőrzendő Series
-    :return: egy Series, ahol az érték True: ha IP cím, False: egyébként
+    A paraméterben kapott Series értékeit IP címként értelmezi, és egész számokká alakítja. Az egyedi értékek közül az
+    IPv4 címek egy szigorú reguláris kifejezéssel ismerődnek fel, és vektorosan alakulnak számmá. Az ipaddress modul
+    csak azokat az értékeket kapja meg, amelyek az előszűrő alapján IPv6 címek lehetnek, így a nem IP címeket tartalmazó
+    oszlopokon nem keletkeznek kivételek.
+    :param param: az átalakítandó Series
+    :return: a param indexével indexelt DataFrame, a 'version' oszlop értéke 4, 6, vagy 0, ha az érték nem IP cím, a
+    'hi' és 'lo' oszlopok pedig a cím felső és alsó 64 bitje (IPv4 esetén a cím a 'lo' oszlopban van)
     """
-    def check_ip(par):
-        """
-        Az IP cím ellenőrzést végző belső függvény.
-        :param par: az ellenőrzendő érték
-        :return: True: ha IP cím, False: egyébként
-        """
+    codes, uniques = pd.factorize(param)
+    uniques = pd.Series(uniques, dtype=object).map(str)
+    # az utolsó elem a -1 kódú (hiányzó) értékeké
+    version = np.zeros(len(uniques) + 1, dtype=np.uint8)
+    hi = np.zeros(len(uniques) + 1, dtype=np.uint64)
+    lo = np.zeros(len(uniques) + 1, dtype=np.uint64)
+    lengths = uniques.str.len().to_numpy()
+
+    ipv4 = (lengths >= 7) & (lengths <= 15)
+    ipv4[ipv4] = uniques[ipv4].str.match(ipv4_regex).to_numpy(dtype=bool)
+    if ipv4.any():
+        # a karakterkódok mátrixán oszloponként haladva: számjegynél az aktuális szám bővül, pontnál a cím eggyel
+        # balra tolódik, a kitöltő nulla kódok nem számítanak
+        chars = uniques[ipv4].to_numpy().astype('U15').view(np.uint32).reshape(-1, 15).astype(np.int64)
+        address = np.zeros(len(chars), dtype=np.int64)
+        octet = np.zeros(len(chars), dtype=np.int64)
+        for char in chars.T:
+            is_digit = (char >= ord('0')) & (char <= ord('9'))
+            is_dot = char == ord('.')
+            octet = np.where(is_digit, octet * 10 + char - ord('0'), octet)
+            address = np.where(is_dot, (address << 8) | octet, address)
+            octet[is_dot] = 0
+        lo[:-1][ipv4] = (address << 8) | octet
+        version[:-1][ipv4] = 4
+
+    ipv6 = (lengths >= 2) & ~ipv4
+    ipv6[ipv6] = uniques[ipv6].str.match(ipv6_candidate_regex).to_numpy(dtype=bool)
+    for position in np.flatnonzero(ipv6):
         try:
-            ipaddress.ip_address(par)
-            return True
+            number = int(ipaddress.IPv6Address(uniques[position]))
         except ValueError:
-            return False
+            continue
+        version[position] = 6
+        hi[position] = number >> 64
+        lo[position] = number & 0xFFFFFFFFFFFFFFFF
 
-    mask = param.apply(lambda x: check_ip(x))
-    return mask
+    return pd.DataFrame({'version': version[codes], 'hi': hi[codes], 'lo': lo[codes]}, index=param.index)
+
+
+def is_ip_address(param):
+    """
+    A paraméterben kapott Series egyes értékei IP címek e (lásd pack_ip_addresses()).
+    :param param: az ellenőrzendő Series
+    :return: egy Series, ahol az érték True: ha IP cím, False: egyébként
+    """
+    return pd.Series(pack_ip_addresses(param)['version'].to_numpy() > 0, index=param.index, name=param.name)
 
 
 def is_country_or_region(
         param,
-        countries=datamanager.read_countries()
+        countries=None
 ):
     """
     A paraméterben kapott Series egyes értékei országnevek (angol), vagy 2-3 jegyű országkódok e.
     :param param: az ellenőrzendő Series
-    :param countries: a országokat és kódokat tartalmazó csv
+    :param countries: a országokat és kódokat tartalmazó csv, ha None, akkor a 'countries' referenciaadat
     :return: egy Series, ahol az érték True: országnév vagy kód, False: egyébként
     """
+    if countries is None:
+        countries = datamanager.get_reference_data('countries')
     return param.str.lower().isin(countries)
 
 
@@ -267,16 +323,12 @@ def is_human_age(param):
     try:
         maximum = int(param.max())
         minimum = int(param.min())
+        is_age = param.name.lower() in possible_column_names and maximum < 130 and minimum >= 0
     except (ValueError, TypeError):
-        param.values[:] = False
-        return param
-
-    if param.name.lower() in possible_column_names and maximum < 130 and minimum >= 0:
-        param.values[:] = True
-    else:
-        param.values[:] = False
+        is_age = False
 
-    return param
+    # a paraméter nem íródik felül, mert a kereső függvények ugyanazt a Seriest kapják (lásd run_detectors())
+    return pd.Series(is_age, index=param.index, name=param.name, dtype=bool)
 
 
 # a kereső függvények és a hozzájuk tartozó címkék
@@ -297,25 +349,236 @@ functions_and_labels = {
 }
 
 
-def find_and_label(df, labels_frame):
+# a reguláris kifejezéssel kereső függvények: a kifejezés, a legkisebb és legnagyobb illeszkedő hossz, egy kötelezően
+# előforduló karakter, valamint hogy a keresés kisbetűsített értékeken történik-e. A legnagyobb hosszal szűrt
+# kifejezések \Z-vel zárulnak, mert a $ a záró sortörés előtt is illeszkedne, és az ilyen érték hosszabb a korlátnál.
+pattern_detectors = {
+    is_phone_number_hungarian: (phone_number_regex, 9, 15, None, False),
+    is_mac_address: (mac_regex, 14, None, None, False),
+    is_email_address: (email_regex, 5, None, '@', False),
+    is_licence_plate_hungarian: (licence_plate_regex, 6, 9, None, True)
+}
+
+
+def scan_patterns(param, functions):
+    """
+    A pattern_detectors-ban szereplő kereső függvények eredményét egyszerre számolja ki egy szövegeket tartalmazó
+    Seriesre. Az egyedi értékek és a hosszaik egyszer számolódnak ki, és minden kifejezés csak azokon az egyedi
+    értékeken fut le, amelyek hossza (és kötelező karaktere) alapján egyáltalán illeszkedhetnek. Az eredmény
+    megegyezik a kereső függvények eredményével.
+    :param param: a szövegeket tartalmazó Series, hiányzó értékek nélkül
+    :param functions: a kiszámolandó kereső függvények
+    :return: szótár, ami a kereső függvényekhez az eredményüket (logikai Series) rendeli
+    """
+    codes, uniques = pd.factorize(param)
+    uniques = pd.Series(uniques, dtype=object)
+    lengths = uniques.str.len().to_numpy()
+    results = {}
+    for function in functions:
+        with instrumentation.stage('detector', rows=len(param), column=param.name, function=function.__name__):
+            regex, min_length, max_length, required, lower = pattern_detectors[function]
+            candidates = lengths >= min_length
+            if max_length is not None:
+                candidates &= lengths <= max_length
+            if required is not None:
+                candidates[candidates] = uniques[candidates].str.contains(required, regex=False).to_numpy(dtype=bool)
+            values = uniques[candidates]
+            if lower:
+                values = values.str.lower()
+            # az utolsó elem a -1 kódú (hiányzó) értékeké
+            found = np.zeros(len(uniques) + 1, dtype=bool)
+            found[:-1][candidates] = values.str.match(regex).to_numpy(dtype=bool)
+            results[function] = pd.Series(found[codes], index=param.index, name=param.name)
+    return results
+
+
+def run_detectors(functions, param):
+    """
+    Lefuttatja a kereső függvényeket ugyanarra a szövegeket tartalmazó Seriesre. A reguláris kifejezéssel keresők egy
+    közös menetben futnak (lásd scan_patterns()), a többiek egyenként. Minden kereső függvény futása külön 'detector'
+    lépésként mérődik (lásd instrumentation.stage()).
+    :param functions: a kereső függvények
+    :param param: a szövegeket tartalmazó Series, hiányzó értékek nélkül
+    :return: a kereső függvények eredményei (logikai Seriesek) a functions sorrendjében
+    """
+    results = scan_patterns(param, [function for function in functions if function in pattern_detectors])
+    for function in functions:
+        if function not in results:
+            with instrumentation.stage('detector', rows=len(param), column=param.name, function=function.__name__):
+                results[function] = function(param)
+    return [results[function] for function in functions]
+
+
+def ratio_bounds(ratio, size, confidence):
+    """
+    A mintán mért arányra vonatkozó Wilson-féle konfidenciaintervallumot adja vissza.
+    :param ratio: a mintán mért arány
+    :param size: a minta mérete
+    :param confidence: a konfidenciaszint, pl. 0.99
+    :return: az intervallum alsó és felső határa
+    """
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    denominator = 1 + z * z / size
+    center = (ratio + z * z / (2 * size)) / denominator
+    margin = z * np.sqrt(ratio * (1 - ratio) / size + z * z / (4 * size * size)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def detect_ratios(functions, column, sample_size=None, confidence=0.99, zero_ratio=0.01, certain_ratio=0.5,
+                  random_state=0):
+    """
+    Kiszámítja, hogy az oszlop értékeinek mekkora hányadára adnak igaz értéket a kereső függvények. Az oszlop egyszer
+    alakul szöveggé, és a kereső függvények ugyanazt a szöveges Seriest kapják (lásd run_detectors()). Ha a
+    sample_size meg van adva, akkor először csak egy véletlen mintán futnak a függvények. Ha a minta alapján egy
+    függvény aránya biztosan elhanyagolható (a konfidenciaintervallum felső határa a zero_ratio alatt van) vagy
+    biztosan nagy (az alsó határ legalább certain_ratio), akkor a minta eredménye lesz a válasz, a többi függvény pedig
+    a teljes oszlopon is lefut.
+    :param functions: a kereső függvények
+    :param column: a vizsgálandó oszlop
+    :param sample_size: a minta mérete, ha None, akkor a teljes oszlop vizsgálódik
+    :param confidence: a konfidenciaszint
+    :param zero_ratio: ez alatti felső határ esetén az arány nullának tekinthető
+    :param certain_ratio: legalább ekkora alsó határ esetén a minta aránya elfogadható
+    :param random_state: a mintavételezés véletlenszám-generátorának kezdőértéke
+    :return: a talált értékek arányai a functions sorrendjében
+    """
+    values = column.dropna()
+    ratios = {}
+    if sample_size is not None and len(values) > sample_size:
+        sample = values.sample(n=sample_size, random_state=random_state).map(str)
+        for function, result in zip(functions, run_detectors(functions, sample)):
+            ratio = result.values.sum() / result.size
+            lower, upper = ratio_bounds(ratio, result.size, confidence)
+            if upper < zero_ratio:
+                ratios[function] = 0.0
+            elif lower >= certain_ratio:
+                ratios[function] = ratio
+
+    remaining = [function for function in functions if function not in ratios]
+    if remaining:
+        strings = values.map(str)
+        for function, result in zip(remaining, run_detectors(remaining, strings)):
+            ratios[function] = result.values.sum() / result.size
+    return [ratios[function] for function in functions]
+
+
+def detect_ratio(function, column, sample_size=None, confidence=0.99, zero_ratio=0.01, certain_ratio=0.5,
+                 random_state=0):
+    """
+    Kiszámítja, hogy az oszlop értékeinek mekkora hányadára ad igaz értéket a kereső függvény (lásd detect_ratios()).
+    :param function: a kereső függvény
+    :param column: a vizsgálandó oszlop
+    :param sample_size: a minta mérete, ha None, akkor a teljes oszlop vizsgálódik
+    :param confidence: a konfidenciaszint
+    :param zero_ratio: ez alatti felső határ esetén az arány nullának tekinthető
+    :param certain_ratio: legalább ekkora alsó határ esetén a minta aránya elfogadható
+    :param random_state: a mintavételezés véletlenszám-generátorának kezdőértéke
+    :return: a talált értékek aránya
+    """
+    return detect_ratios([function], column, sample_size, confidence, zero_ratio, certain_ratio, random_state)[0]
+
+
+def column_fingerprint(column, settings='', sample_size=1000):
+    """
+    Az oszlop tartalmának lenyomatát adja vissza: az oszlop nevéből, típusából, hosszából és egyenletes közönként vett
+    legfeljebb sample_size értékének hash-éből képzett SHA-256 összeg. A teljes oszlop nem olvasódik végig, így a
+    lenyomat nagy oszlopokra is gyorsan elkészül.
+    :param column: az oszlop
+    :param settings: a lenyomatba kerülő további szöveg, pl. a felismerés paraméterei
+    :param sample_size: a lenyomatba kerülő értékek legnagyobb száma
+    :return: a lenyomat hexadecimális szövegként
+    """
+    positions = np.unique(np.linspace(0, len(column) - 1, min(len(column), sample_size)).astype(np.int64))
+    digest = hashlib.sha256('{}\x00{}\x00{}\x00{}'.format(column.name, column.dtype, len(column), settings)
+                            .encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(column.iloc[positions], index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def find_and_label(df, labels_frame, sample_size=None, confidence=0.99, zero_ratio=0.01, certain_ratio=0.5,
+                   workers=None, use_threads=False, dataset=None):
     """
     Megvizsgálja a DataFramet és megmondja, hogy a program milyen típusú adatokat talál benne. A címkéket tartalmazó
-    filet bővíti az újonnan talált címkékkel.
+    filet bővíti az újonnan talált címkékkel, a file a végén egyszer íródik ki. Ha a sample_size meg van adva, akkor az
+    oszlopok először csak mintavétellel vizsgálódnak, és csak a bizonytalan eredményű oszlopokon fut le a teljes keresés
+    (lásd detect_ratios()). Soros futás esetén egy oszlopon az összes kereső függvény egyszerre fut, az oszlop egyszer
+    alakul szöveggé. Ha a workers meg van adva, akkor az (oszlop, kereső függvény) párok vizsgálata párhuzamosan, több
+    folyamatban (vagy use_threads esetén több szálon) történik, a reguláris kifejezéssel keresők oszloponként egy
+    közös feladatot alkotnak. Az eredmény megegyezik a soros futás eredményével. Soros futás esetén minden oszlop
+    vizsgálata külön 'column detection', azon belül minden kereső függvény hívása külön 'detector' lépésként mérődik
+    (lásd instrumentation.stage()). Ha a dataset meg van adva, akkor az oszlopok címkéi az adathalmaz neve, az
+    oszlopnév és az oszlop lenyomata (lásd column_fingerprint()) szerint gyorsítótárazódnak, így a változatlan
+    oszlopokon a kereső függvények nem futnak le újra. A gyorsítótár a végén egyszer, atomi írással mentődik.
     :param df: a vizsgálandó DataFrame
     :param labels_frame: a DataFrame, ahová a címkézett adatok kerülnek
+    :param sample_size: a minta mérete, ha None, akkor minden oszlop teljes egészében vizsgálódik
+    :param confidence: a mintavételezés konfidenciaszintje
+    :param zero_ratio: ez alatti felső határ esetén a minta alapján nincs találat
+    :param certain_ratio: legalább ekkora alsó határ esetén a minta aránya elfogadható
+    :param workers: a párhuzamosan futó folyamatok (szálak) száma, ha None vagy 1, akkor a vizsgálat sorosan történik
+    :param use_threads: ha True, akkor folyamatok helyett szálak futtatják a kereső függvényeket
+    :param dataset: az adathalmaz neve (pl. a bemeneti file), ha None, akkor a gyorsítótár nem használódik
     :return: a talált adatokkal kiegészített, címkéket tartalmazó DataFrame
     """
-    for i in list(df):
-        for j in functions_and_labels:
-            result = j(df[i].dropna().map(str))
-            ratio = result.values.sum() / result.size
-
+    columns = list(df)
+    found = {}
+    fingerprints = {}
+    cache = None
+    if dataset is not None:
+        # a lenyomatba a kereső függvények és a paraméterek is bekerülnek, így ezek változása esetén újra fut a keresés
+        settings = repr((sorted(label for label, _ in functions_and_labels.values()), sample_size, confidence,
+                         zero_ratio, certain_ratio))
+        cache = datamanager.read_label_cache()
+        entries = cache.setdefault(str(dataset), {})
+        for i in columns:
+            fingerprints[i] = column_fingerprint(df[i], settings)
+            entry = entries.get(str(i))
+            if entry is not None and entry['fingerprint'] == fingerprints[i]:
+                found[i] = entry['labels']
+
+    functions = list(functions_and_labels)
+    tasks = [i for i in columns if i not in found]
+    if workers is None or workers == 1:
+        ratios = []
+        for i in tasks:
+            with instrumentation.stage('column detection', rows=len(df), column=i):
+                ratios.append(detect_ratios(functions, df[i], sample_size, confidence, zero_ratio, certain_ratio))
+    else:
+        # a reguláris kifejezéssel keresők együtt, a többi kereső függvény külön feladatként fut
+        groups = [[j for j in functions if j in pattern_detectors]] + [[j] for j in functions
+                                                                       if j not in pattern_detectors]
+        groups = [group for group in groups if group]
+        executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+        with executor_class(max_workers=workers) as executor:
+            futures = [
+                [executor.submit(detect_ratios, group, df[i], sample_size, confidence, zero_ratio, certain_ratio)
+                 for group in groups]
+                for i in tasks
+            ]
+            ratios = []
+            for column_futures in futures:
+                column_ratios = {}
+                for group, future in zip(groups, column_futures):
+                    column_ratios.update(zip(group, future.result()))
+                ratios.append([column_ratios[j] for j in functions])
+
+    detected = {i: [] for i in tasks}
+    for i, column_ratios in zip(tasks, ratios):
+        for j, ratio in zip(functions, column_ratios):
             if ratio > 0.0:
-                new_row = pd.Series(
-                    [i, ratio, functions_and_labels[j][0], functions_and_labels[j][1]],
-                    index=labels_frame.columns)
-                labels_frame = labels_frame.append(new_row, ignore_index=True)
-
-                labels_frame = labels_frame.drop_duplicates(ignore_index=True)
-                labels_frame.to_csv(path_or_buf='data/local/labels.csv', index=False)
+                detected[i].append([functions_and_labels[j][0], float(ratio)])
+    if cache is not None and detected:
+        for i, labels in detected.items():
+            cache[str(dataset)][str(i)] = {'fingerprint': fingerprints[i], 'labels': labels}
+        datamanager.save_label_cache(cache)
+    found.update(detected)
+
+    # az új címkék a soros futással megegyező sorrendben, egyszerre kerülnek a címkék közé
+    identifiers = dict(functions_and_labels.values())
+    new_rows = [[i, ratio, label, identifiers[label]] for i in columns for label, ratio in found[i]]
+    if new_rows:
+        labels_frame = pd.concat([labels_frame, pd.DataFrame(new_rows, columns=labels_frame.columns)],
+                                 ignore_index=True)
+        labels_frame = labels_frame.drop_duplicates(ignore_index=True)
+        datamanager.write_labels_file(labels_frame)
     return labels_frame
@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+import datamanager
+
+
+class HierarchyTree:
+    """
+    Egy általánosítási hierarchia egész számokkal kódolt fája. A levelek mélységi bejárás szerinti sorszámot kapnak, így
+    minden csúcs alatti levelek egy összefüggő sorszám-tartományt alkotnak. Egy levélhalmaz legközelebbi közös őse a
+    legkisebb és legnagyobb sorszámú levél közös őse, ami az ősöket szintenként tartalmazó táblából olvasható ki.
+    """
+
+    def __init__(self, labels, parents, leaf_nodes):
+        """
+        :param labels: a csúcsok címkéi, a 0. csúcs a gyökér
+        :param parents: a csúcsok szülőinek sorszámai (a gyökér szülője -1), minden szülő a gyerekei előtt szerepel
+        :param leaf_nodes: a levelek csúcs-sorszámai mélységi bejárás szerinti sorrendben
+        """
+        self.labels = np.asarray(labels, dtype=object)
+        self.parents = np.asarray(parents, dtype=np.int64)
+        self.leaf_nodes = np.asarray(leaf_nodes, dtype=np.int64)
+        depths = np.zeros(len(self.parents), dtype=np.int64)
+        for node in range(1, len(self.parents)):
+            depths[node] = depths[self.parents[node]] + 1
+        self.depths = depths
+
+        # az ősök táblája: ancestors[d, l] az l. levél d mélységű őse, a levélnél mélyebb szinteken maga a levél
+        max_depth = int(depths[self.leaf_nodes].max()) if len(self.leaf_nodes) else 0
+        ancestors = np.empty((max_depth + 1, len(self.leaf_nodes)), dtype=np.int64)
+        path = self.leaf_nodes.copy()
+        for depth in range(max_depth, -1, -1):
+            ancestors[depth] = path
+            path = np.where(depths[path] >= depth, self.parents[path], path)
+            path[path < 0] = 0
+        self.ancestors = ancestors
+
+        # a csúcsok alatti levelek sorszám-tartományának eleje és vége
+        first_leaf = np.full(len(self.parents), len(self.leaf_nodes), dtype=np.int64)
+        last_leaf = np.full(len(self.parents), -1, dtype=np.int64)
+        ranks = np.arange(len(self.leaf_nodes))
+        for depth in range(max_depth + 1):
+            np.minimum.at(first_leaf, ancestors[depth], ranks)
+            np.maximum.at(last_leaf, ancestors[depth], ranks)
+        self.first_leaf = first_leaf
+        self.last_leaf = last_leaf
+
+    def common_ancestors(self, lowest, highest):
+        """
+        Visszaadja a levél-sorszám tartományok legközelebbi közös őseit.
+        :param lowest: a tartományok legkisebb levél-sorszámai
+        :param highest: a tartományok legnagyobb levél-sorszámai
+        :return: a közös ősök csúcs-sorszámai
+        """
+        lowest = np.asarray(lowest)
+        highest = np.asarray(highest)
+        equal = self.ancestors[:, lowest] == self.ancestors[:, highest]
+        # a gyökértől kezdve az utolsó szint, ahol a két levél őse még megegyezik
+        depth = len(self.ancestors) - 1 - np.argmax(equal[::-1], axis=0)
+        return self.ancestors[depth, lowest]
+
+    def span(self, ranks):
+        """
+        A levélhalmaz legközelebbi közös őse alatti levelek száma.
+        :param ranks: a levelek sorszámai
+        :return: a levelek száma
+        """
+        node = self.common_ancestors(ranks.min(), ranks.max())
+        return int(self.last_leaf[node] - self.first_leaf[node] + 1)
+
+    def split(self, ranks):
+        """
+        A levélhalmazt a legközelebbi közös ős gyerekei mentén két részre osztja. A gyerekek mélységi bejárás szerinti
+        sorrendben maradnak, és a vágás úgy történik, hogy a két részbe a lehető legkiegyenlítettebb számú érték
+        kerüljön. Ha a közös ős levél, akkor minden érték a bal oldalra kerül.
+        :param ranks: a levelek sorszámai
+        :return: logikai tömb, ami a bal oldali részbe kerülő értékeknél True
+        """
+        node = self.common_ancestors(ranks.min(), ranks.max())
+        depth = self.depths[node]
+        if depth + 1 >= len(self.ancestors):
+            return np.ones(len(ranks), dtype=bool)
+        children, counts = np.unique(self.first_leaf[self.ancestors[depth + 1, ranks]], return_counts=True)
+        if len(children) < 2:
+            return np.ones(len(ranks), dtype=bool)
+        cumulative = np.cumsum(counts)[:-1]
+        cut = np.argmin(np.abs(2 * cumulative - len(ranks)))
+        return ranks < children[cut + 1]
+
+
+class Hierarchy:
+    """
+    Egy kategorikus oszlop általánosítási hierarchiája. Minden értékhez az ősei tartoznak a legszűkebbtől a
+    legtágabbig, pl. 'Hungary' -> ('Eastern Europe', 'Europe'). A legtágabb ősök közös őse a gyökér. Az anonimizálás
+    a hierarchia mentén vágja a partíciókat, és a partíció értékeinek legközelebbi közös ősét írja ki.
+    """
+
+    def __init__(self, paths, root='*'):
+        """
+        :param paths: szótár, ami az értékekhez az őseik sorozatát rendeli, a legszűkebbtől a legtágabbig
+        :param root: a gyökér címkéje
+        """
+        self.paths = {value: tuple(ancestors) for value, ancestors in paths.items()}
+        self.root = root
+
+    @classmethod
+    def from_frame(cls, df, columns, root='*'):
+        """
+        Hierarchiát készít egy DataFrame oszlopaiból, pl. az országokat és régiókat tartalmazó táblázatból.
+        :param df: a DataFrame
+        :param columns: az oszlopok a legszűkebbtől (az értékektől) a legtágabbig
+        :param root: a gyökér címkéje
+        :return: a Hierarchy példány
+        """
+        rows = df[list(columns)].drop_duplicates(subset=columns[0]).itertuples(index=False, name=None)
+        return cls({row[0]: row[1:] for row in rows}, root)
+
+    def encode(self, column):
+        """
+        Kódolja az oszlopot: felépíti a hierarchia oszlopban előforduló részének fáját, és az értékeket a levelek
+        sorszámaira cseréli. A hierarchiában nem szereplő értékek (és a hiányzó érték) közvetlenül a gyökér alá
+        kerülnek.
+        :param column: az oszlop (Series)
+        :return: a levelek sorszámait tartalmazó tömb és a HierarchyTree példány
+        """
+        codes, uniques = pd.factorize(column)
+        values = list(uniques)
+        if (codes < 0).any():
+            values.append(np.nan)
+
+        # a belső csúcsokat a gyökértől induló útvonaluk azonosítja, így az azonos nevű, de különböző helyen álló
+        # csúcsok nem keverednek össze; az értékek mindig saját levelet kapnak, akkor is, ha a címkéjük egy ős
+        # címkéjével egyezik (pl. 'Europe' érték és 'Europe' régió)
+        nodes = {(): 0}
+        labels = [self.root]
+        parents = [-1]
+        children = [[]]
+        leaf_of_value = []
+        for value in values:
+            path = () if pd.isna(value) else tuple(reversed(self.paths.get(value, ())))
+            key = ()
+            for label in path:
+                parent = nodes[key]
+                key = key + (label,)
+                if key not in nodes:
+                    nodes[key] = len(labels)
+                    labels.append(label)
+                    parents.append(parent)
+                    children.append([])
+                    children[parent].append(nodes[key])
+            parent = nodes[key]
+            leaf_of_value.append(len(labels))
+            labels.append(value)
+            parents.append(parent)
+            children.append([])
+            children[parent].append(leaf_of_value[-1])
+
+        # a levelek mélységi bejárás szerinti sorszámozása
+        leaf_nodes = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not children[node]:
+                leaf_nodes.append(node)
+            stack.extend(reversed(children[node]))
+        rank_of_node = np.zeros(len(labels), dtype=np.int64)
+        rank_of_node[leaf_nodes] = np.arange(len(leaf_nodes))
+
+        ranks = rank_of_node[leaf_of_value]
+        # a hiányzó érték kódja -1, ami a lista utolsó elemére mutat
+        return ranks[codes], HierarchyTree(labels, parents, leaf_nodes)
+
+
+def country_region_hierarchy(countries=None):
+    """
+    Az országnevekből és 2-3 jegyű országkódokból a régiókra általánosító hierarchiát készít (lásd
+    pseudonymisation.generalize_country_to_region()).
+    :param countries: az országokat, kódokat és régiókat tartalmazó DataFrame, ha None, akkor a 'country regions'
+    referenciaadat
+    :return: a Hierarchy példány
+    """
+    if countries is None:
+        countries = datamanager.get_reference_data('country regions')
+    paths = {}
+    for column in ('name', 'alpha-2', 'alpha-3'):
+        for value, region in zip(countries[column], countries['region']):
+            if not pd.isna(value):
+                paths.setdefault(value, (region,))
+    return Hierarchy(paths)
+
+
+def date_hierarchy(column, date_format=None):
+    """
+    Az oszlopban szereplő dátumokhoz nap -> hónap -> év hierarchiát készít.
+    :param column: a dátumokat (szövegként vagy dátumként) tartalmazó oszlop
+    :param date_format: a dátumok formátuma a pd.to_datetime() számára, ha None, akkor automatikus
+    :return: a Hierarchy példány
+    """
+    uniques = pd.Series(column.dropna().unique())
+    dates = pd.to_datetime(uniques, format=date_format, errors='coerce')
+    valid = dates.notna().to_numpy()
+    months = dates[valid].dt.strftime('%Y-%m')
+    years = dates[valid].dt.strftime('%Y')
+    return Hierarchy({value: (month, year) for value, month, year in zip(uniques[valid], months, years)})
@@ -0,0 +1,113 @@
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows alatt nincs resource modul
+    resource = None
+
+# a regisztrált hookok, mindegyik egy eseményt (szótárat) kapó függvény; ha üres, akkor a mérés ki van kapcsolva
+hooks = []
+
+logger = logging.getLogger('anonymizer')
+
+
+def add_hook(hook):
+    """
+    Regisztrál egy hookot, ami a lépések végén megkapja a mért adatokat tartalmazó eseményt. Pl. az add_hook(events.append)
+    hívás után az események az events listába gyűlnek.
+    :param hook: egy szótárat kapó függvény
+    :return:
+    """
+    hooks.append(hook)
+
+
+def remove_hook(hook):
+    """
+    Eltávolít egy korábban regisztrált hookot.
+    :param hook: a hook
+    :return:
+    """
+    hooks.remove(hook)
+
+
+def is_enabled():
+    """
+    :return: True, ha van regisztrált hook
+    """
+    return bool(hooks)
+
+
+def peak_rss():
+    """
+    Visszaadja a folyamat eddigi legnagyobb rezidens memóriahasználatát bájtban, vagy None-t, ha ez nem kérdezhető le.
+    :return: a memóriahasználat
+    """
+    if resource is None:
+        return None
+    maximum = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux alatt kilobájtban, macOS alatt bájtban adja vissza
+    return maximum if sys.platform == 'darwin' else maximum * 1024
+
+
+def emit(event):
+    """
+    Átadja az eseményt az összes regisztrált hooknak.
+    :param event: az eseményt leíró szótár
+    :return:
+    """
+    for hook in list(hooks):
+        hook(event)
+
+
+@contextmanager
+def stage(name, rows=None, **fields):
+    """
+    Egy lépés futási idejét és memóriahasználatát mérő környezetkezelő. A blokk végén a hookok megkapják a lépés
+    nevét, a további mezőket, a futási időt (seconds), a sor/másodperc átbocsátást (rows_per_second, ha a rows meg van
+    adva) és a folyamat legnagyobb memóriahasználatát (peak_rss). A blokkban a visszaadott szótárba további mezők
+    írhatók, pl. a létrejött partíciók száma. Ha nincs regisztrált hook, akkor semmi nem mérődik.
+    Használata: with instrumentation.stage('anonymisation', rows=len(df)) as event: ...
+    :param name: a lépés neve
+    :param rows: a feldolgozott sorok száma
+    :param fields: az eseménybe kerülő további mezők
+    :return:
+    """
+    event = {'stage': name}
+    if not hooks:
+        yield event
+        return
+    event.update(fields)
+    start = time.perf_counter()
+    yield event
+    seconds = time.perf_counter() - start
+    event['seconds'] = seconds
+    if rows is not None:
+        event['rows'] = rows
+        event['rows_per_second'] = rows / seconds if seconds > 0 else None
+    event['peak_rss'] = peak_rss()
+    emit(event)
+
+
+def logging_hook(event):
+    """
+    Az eseményt JSON formátumban, INFO szinten az 'anonymizer' loggerbe írja.
+    :param event: az esemény
+    :return:
+    """
+    logger.info(json.dumps(event, default=str))
+
+
+def json_lines_hook(path):
+    """
+    Egy olyan hookot ad vissza, ami az eseményeket soronként egy JSON objektumként a megadott filehoz fűzi.
+    :param path: a file elérési útja
+    :return: a hook
+    """
+    def hook(event):
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(event, default=str) + '\n')
+    return hook
@@ -1,114 +1,232 @@
+import hmac
+import ipaddress
 import re
 import secrets
 import string
+import numpy as np
 import pandas as pd
 import datamanager
+import detection
+import instrumentation
 
 
 email_split_regex = re.compile(r'(.+)@(.+)\.(.+)')
-reconstruct_regex = re.compile(r"'(.+)', '(.+)', '(.+)'")
+mac_separator_regex = re.compile(r'[-:. ]')
+mac_digits_regex = re.compile(r'^[0-9A-Fa-f]{12}\Z')
+# a 0-255 közötti számok szöveges alakja, az IPv4 címek szöveggé alakításához
+octet_texts = np.array([str(i) for i in range(256)], dtype=object)
 
+# a pszeudonimek karakterkészlete
+alphabet = np.array(list(string.ascii_letters + string.digits))
 
-def partition_email(email, local_part, domain_part, tld_part):
-    """Egy email címet három részre oszt fel, a @ jel és a tld végződés előtt álló pont mentén."""
-    email = str(email).lower()
-    m = re.search(email_split_regex, email)
-    if m:
-        groups = m.groups()
-    else:
-        groups = ("nan", "na", "n")
-    local_part.update({groups[0]: ''})
-    domain_part.update({groups[1]: ''})
-    tld_part.update({groups[2]: ''})
-    return str(groups)
-
-
-def generate_text(hossz) -> str:
-    """A paraméterben kapott hosszúságú szöveget generál."""
-    alphabet = string.ascii_letters + string.digits
-    text = ''.join(secrets.choice(alphabet) for i in range(hossz))
-    return text
-
-
-def generate_secret_text(p_set, p_dictionary, length):
-    """A paraméterben kapott set-et tölti fel elemekkel a generate_text függvény hívásával addig, amíg nincs annyi
-    eleme, mint a paraméterben kapott szótárnak."""
-    while len(p_set) < len(p_dictionary):
-        p_set.add(generate_text(length))
 
+def generate_texts(count, length, exclude=None):
+    """
+    A paraméterben kapott számú, egymástól különböző, adott hosszúságú véletlen szöveget generál egyszerre. A véletlen
+    bájtok egyetlen pufferből származnak, a karakterkészlet méreténél nagyobb maradékot adó bájtok eldobódnak, így minden
+    karakter egyenletes eloszlású marad.
+    :param count: a generálandó szövegek száma
+    :param length: a szövegek hossza
+    :param exclude: halmaz, amelynek elemei nem generálhatók (pl. a már kiosztott pszeudonimek)
+    :return: a szövegeket tartalmazó tömb
+    """
+    limit = 256 - 256 % len(alphabet)
+    texts = np.empty(0, dtype='U{}'.format(length))
+    while len(texts) < count:
+        needed = count - len(texts)
+        raw = np.frombuffer(secrets.token_bytes(2 * needed * length + length), dtype=np.uint8)
+        raw = raw[raw < limit]
+        rows = len(raw) // length
+        candidates = alphabet[(raw[:rows * length] % len(alphabet)).reshape(rows, length)]
+        candidates = candidates.view('U{}'.format(length)).ravel()
+        # a duplikátumok és a kizárt szövegek kiszűrése, a véletlen sorrend megtartásával
+        candidates = pd.unique(np.concatenate((texts, candidates)))[len(texts):]
+        if exclude:
+            candidates = candidates[~pd.Index(candidates).isin(exclude)]
+        texts = np.concatenate((texts, candidates[:needed]))
+    return texts
+
+
+def keyed_digests(values, key, namespace):
+    """
+    Az értékekből a titkos kulccsal HMAC-SHA256 lenyomatot készít. A névtér is bekerül a lenyomatba, így ugyanaz az
+    érték különböző névterekben különböző lenyomatot kap.
+    :param values: az értékek
+    :param key: a titkos kulcs (bytes)
+    :param namespace: a névtér
+    :return: a lenyomatok egymás után fűzve, értékenként 32 bájt
+    """
+    prefix = str(namespace).encode('utf-8') + b'\x00'
+    return b''.join(hmac.digest(key, prefix + str(value).encode('utf-8'), 'sha256') for value in values)
 
-def add_value_to_dict(p_dict, p_set):
-    """A paraméterben kapott szótárhoz hozzárendeli a paraméterben kapott halmaz elemeit."""
-    for key, value in p_dict.items():
-        p_dict[key] = p_set.pop()
-
-
-def reconstruct_email(text, local_part, domain_part, tld_part) -> str:
-    """A paraméterben kapott szótárak alapján a pszeudonimizált verzióra írja át a szöveget."""
-    m = re.search(reconstruct_regex, text)
-    if m:
-        groups = m.groups()
-        reconstructed = str(local_part.get(groups[0])) + "@" + str(domain_part.get(groups[1])) + "." + str(tld_part.get(
-            groups[2]))
-        return reconstructed
-    else:
-        return None
-
-
-def email_multi_pseudonymise(workdata, column):
-    """A paraméterben kapott DataFrame paraméterben kapott oszlopában szereplő email címeket pszeudonimizálja a
-    megfelelő függvények meghívásával. Az email cím három részre bontódik, és mindegyik rész külön kerül
-    pszeudonimizálásra. """
-
-    # a szótárakba kerülnek kulcsként az egyes email cím részek unique értékei
-    local_part = dict()  # az email cím @ jel előtt álló része
-    domain_part = dict()  # az email cím domain része, nem számítva a tld végződést
-    tld_part = dict()  # az email cím tld végződése
 
-    # a halmazok garantálják, hogy egy pszeudonimizált szöveg ne tartozhasson több eredeti értékhez
-    pseudo_local = set()
-    pseudo_domain = set()
-    pseudo_tld = set()
+def keyed_texts(values, key, length, namespace):
+    """
+    Az értékekhez a titkos kulcs alapján determinisztikus, adott hosszúságú pszeudonim szövegeket rendel: ugyanaz az
+    érték ugyanazzal a kulccsal mindig ugyanazt a szöveget kapja, futástól és géptől függetlenül. A karakterek a
+    lenyomat 16 bites egységeiből képződnek, így a karakterkészlet szerinti maradékképzés torzítása elhanyagolható.
+    Rövid pszeudonimek esetén (pl. tld) két különböző érték kis valószínűséggel ugyanazt a szöveget kaphatja.
+    :param values: az értékek
+    :param key: a titkos kulcs (bytes)
+    :param length: a szövegek hossza, legfeljebb 16
+    :param namespace: a névtér
+    :return: a szövegeket tartalmazó tömb
+    """
+    if length > 16:
+        raise ValueError("Keyed pseudonyms can be at most 16 characters long")
+    units = np.frombuffer(keyed_digests(values, key, namespace), dtype='>u2').reshape(-1, 16)
+    texts = alphabet[units[:, :length] % len(alphabet)]
+    return texts.view('U{}'.format(length)).ravel()
 
-    # a szótárak kulcsainak feltöltése
-    workdata.df[column] = workdata.df[column].apply(lambda x: partition_email(x, local_part, domain_part, tld_part))
 
-    # a pszeudonimizált szövegváltozatok generálása
-    generate_secret_text(pseudo_local, local_part, 10)  # 10 hosszú szöveg generálása
-    generate_secret_text(pseudo_domain, domain_part, 5)  # 5 hosszú szöveg generálása
-    generate_secret_text(pseudo_tld, tld_part, 4)  # 4 hosszú szöveg generálása a tld
+def keyed_numbers(values, key, namespace):
+    """
+    Az értékekhez a titkos kulcs alapján determinisztikus, nemnegatív 63 bites egész számokat rendel.
+    :param values: az értékek
+    :param key: a titkos kulcs (bytes)
+    :param namespace: a névtér
+    :return: a számokat tartalmazó tömb
+    """
+    words = np.frombuffer(keyed_digests(values, key, namespace), dtype='>u8').reshape(-1, 4)
+    return (words[:, 0] >> np.uint64(1)).astype(np.int64)
 
-    # a szótár kulcsokhoz a halmazbeli értékek hozzárendelése
-    add_value_to_dict(local_part, pseudo_local)
-    add_value_to_dict(domain_part, pseudo_domain)
-    add_value_to_dict(tld_part, pseudo_tld)
 
-    # az eredeti email címek átírása a szótár alapján a pszeudonimizált változatra
-    workdata.df[column] = workdata.df[column].apply(lambda x: reconstruct_email(x, local_part, domain_part, tld_part))
+def pseudonymise_values(values, mapping, length, key=None, store=None, namespace=None, used=None):
+    """
+    A paraméterben kapott értékeket pszeudonimekre cseréli. Az egyedi értékek egyszer kódolódnak, az új értékek
+    pszeudonimjei egyszerre generálódnak, és a szótárba kerülnek, a kimenet pedig tömbindexeléssel áll elő. Ha a key
+    meg van adva, akkor a pszeudonimek a kulcs alapján, determinisztikusan képződnek (lásd keyed_texts()). Ha a store
+    meg van adva, akkor a korábban a tárba mentett hozzárendelések is felhasználódnak, az új értékek pedig a tárban még
+    nem szereplő pszeudonimeket kapnak (lásd datamanager.MappingStore.assign_texts()).
+    :param values: az értékeket tartalmazó Series
+    :param mapping: a korábban kiosztott pszeudonimeket tartalmazó szótár, ami az új értékekkel bővül
+    :param length: a pszeudonimek hossza
+    :param key: a titkos kulcs (bytes), vagy None
+    :param store: a datamanager.MappingStore példány, vagy None
+    :param namespace: a hozzárendelések névtere a kulcsos pszeudonimizáláshoz és a tárban
+    :param used: a szótárban már kiosztott pszeudonimek halmaza, ami az új pszeudonimekkel bővül, így nem kell minden
+    hívásnál újra felépíteni; ha None, akkor a szótár értékeiből készül
+    :return: a pszeudonimeket tartalmazó tömb
+    """
+    codes, uniques = pd.factorize(values)
+    if key is not None:
+        texts = keyed_texts(uniques, key, length, namespace)
+        if store is not None:
+            store.insert(namespace, zip(uniques, texts.tolist()))
+        return texts.astype(object)[codes]
+
+    assigned = pd.Series(uniques).map(mapping)
+    new_values = uniques[assigned.isna().to_numpy()]
+    if len(new_values) and store is not None:
+        mapping.update(store.lookup(namespace, new_values))
+        assigned = pd.Series(uniques).map(mapping)
+        new_values = uniques[assigned.isna().to_numpy()]
+    if len(new_values):
+        if store is None:
+            if used is None:
+                used = set(mapping.values())
+            texts = generate_texts(len(new_values), length, used).tolist()
+            mapping.update(zip(new_values, texts))
+            used.update(texts)
+        else:
+            # a tár zárolás mellett osztja ki a szövegeket, így egy másik folyamat által közben kiosztott pszeudonim
+            # nem ismétlődik, és az ugyanarra az értékre közben elmentett hozzárendelés marad érvényben
+            texts = store.assign_texts(namespace, new_values,
+                                       lambda count, exclude: generate_texts(count, length, exclude))
+            mapping.update(texts)
+            if used is not None:
+                used.update(texts.values())
+        assigned = pd.Series(uniques).map(mapping)
+    return assigned.to_numpy(dtype=object)[codes]
+
+
+def new_email_mappings():
+    """Üres hozzárendeléseket hoz létre az email_multi_pseudonymise() számára, amelyek több hívás (pl. egy file egymás
+    utáni darabjai) között megőrizhetők. A részenkénti hozzárendelések mellett a már kiosztott pszeudonimek halmazai
+    is megmaradnak, így ezek nem épülnek fel újra minden darabnál."""
+    return {'local': dict(), 'domain': dict(), 'tld': dict(), 'used': {'local': set(), 'domain': set(), 'tld': set()}}
+
+
+def email_multi_pseudonymise(workdata, column, mappings=None):
+    """A paraméterben kapott DataFrame paraméterben kapott oszlopában szereplő email címeket pszeudonimizálja. Az email
+    cím három részre bontódik, és mindegyik rész külön kerül pszeudonimizálásra. A felbontás és az átírás az egész
+    oszlopon egyszerre történik. Ha a mappings (lásd new_email_mappings()) meg van adva, akkor a korábbi hívások során
+    kiosztott pszeudonimek megmaradnak, és csak az új értékek kapnak újat. Ha a WorkData pseudonym_key attribútuma meg
+    van adva, akkor a pszeudonimek a kulcs alapján, determinisztikusan képződnek, így különböző futások és párhuzamosan
+    feldolgozott darabok eredményei is összekapcsolhatók. A WorkData mapping_store attribútumában megadott tárba a
+    hozzárendelések elmentődnek."""
+    if mappings is None:
+        mappings = new_email_mappings()
+
+    # a felbontás és a pszeudonimizálás az egyedi email címeken történik
+    codes, emails = pd.factorize(workdata.df[column].astype(str))
+
+    # az email cím @ jel előtt álló része, a domain része a tld végződés nélkül, és a tld végződés
+    parts = pd.Series(emails).str.lower().str.extract(email_split_regex)
+    parts = parts.fillna({0: 'nan', 1: 'na', 2: 'n'})
+
+    key = workdata.pseudonym_key
+    store = workdata.mapping_store
+    # a 10, 5 és 4 hosszú szövegek a helyi rész, a domain és a tld pszeudonimjei
+    used = mappings.get('used', {})
+    local = pseudonymise_values(parts[0], mappings['local'], 10, key, store, 'email local', used.get('local'))
+    domain = pseudonymise_values(parts[1], mappings['domain'], 5, key, store, 'email domain', used.get('domain'))
+    tld = pseudonymise_values(parts[2], mappings['tld'], 4, key, store, 'email tld', used.get('tld'))
+
+    # az eredeti email címek átírása a pszeudonimizált változatra
+    workdata.df[column] = (local + '@' + domain + '.' + tld)[codes]
 
 
 # def text_to_number(df, column: str):
-def text_to_number(workdata, column: str):
+def text_to_number(workdata, column: str, mapping=None):
     """
     A DataFrame adott oszlopában szereplő értékeket cseréli ki számokra, az inkrementálás módszerét használva. Az
     egymással megegyező adatoknak a pszeudonimizált számértéke is megegyezik.
+    Ha a WorkData pseudonym_key attribútuma meg van adva, akkor a számok a kulcs alapján, determinisztikusan képződnek
+    (lásd keyed_numbers()). Egyébként, ha a mapping_store attribútum meg van adva, akkor a sorszámokat a tár osztja ki
+    (lásd datamanager.MappingStore.assign_numbers()), így azok több futás és folyamat között is megegyeznek.
     :param workdata: a WorkData példány
     :param column: az oszlop neve
+    :param mapping: ha meg van adva, akkor egy szótár, ami a korábbi hívások során kiosztott számokat tartalmazza, így
+    ugyanaz az érték több hívás során is ugyanazt a számot kapja. Az új értékek a szótárba kerülnek.
     :return:
     """
-    workdata.df[column] = pd.factorize(workdata.df[column])[0]
+    codes, uniques = pd.factorize(workdata.df[column])
+    key = workdata.pseudonym_key
+    store = workdata.mapping_store
+    if key is not None:
+        numbers = keyed_numbers(uniques, key, column)
+        if store is not None:
+            store.insert(column, zip(uniques, numbers.tolist()))
+    elif store is not None:
+        assigned = store.assign_numbers(column, uniques)
+        numbers = np.array([assigned[str(value)] for value in uniques], dtype=np.int64)
+    elif mapping is None:
+        workdata.df[column] = codes
+        return
+    else:
+        # a kulcsok szövegek, ahogy a tárban is
+        for value in uniques:
+            mapping.setdefault(str(value), len(mapping))
+        numbers = np.array([mapping[str(value)] for value in uniques], dtype=np.int64)
+    # a hiányzó értékek kódja -1 marad, ahogy a pd.factorize() esetén
+    workdata.df[column] = np.append(numbers, -1)[codes]
 
 
-def number_to_interval(workdata, column: str, distance=10):
+def number_to_interval(workdata, column: str, distance=10, maximum=None):
     """
     A DataFrame paraméterben adott oszlopában található számokat sorolja be egy intervallumba. Az intervallum távolságot
     a distance paraméter tartalamzza. Pozitív számokra működik.
     :param workdata: a WorkData példány
     :param column: az oszlop neve
     :param distance: az intervallum távolság
+    :param maximum: az intervallumok felső határa, ha None, akkor az oszlopban szereplő legnagyobb érték. Darabokban
+    feldolgozott file esetén a teljes filera vett maximumot kell megadni, hogy minden darab ugyanazokat a kategóriákat
+    kapja.
     :return:
     """
-    maximum = workdata.df[column].max()  # az oszlopban szereplő legnagyobb érték
+    if maximum is None:
+        maximum = workdata.df[column].max()  # az oszlopban szereplő legnagyobb érték
 
     # a címkék létrehozása, 0-tól a maximum értékig, megadott távolsággal
     labels = ["{0} - {1}".format(i, i + distance - 1) for i in range(0, maximum, distance)]
@@ -122,18 +240,19 @@ def number_to_interval(workdata, column: str, distance=10):
 def generalize_country_to_region(
         workdata,
         column: str,
-        countries=pd.read_csv(
-            'https://raw.githubusercontent.com/lukes/ISO-3166-Countries-with-Regional-Codes/master/all/all.csv',
-            usecols=['name', 'alpha-2', 'alpha-3', 'region'])
+        countries=None
 ):
     """
     A DataFrame adott oszlopában lévő országneveket és kódokat cseréli le annak a régiónak a nevére,
     ahol az ország található.
     :param workdata: a WorkData példány, ami a DataFramet tartalmazza
     :param column: az oszlop neve
-    :param countries: az országokat, kódokat, és régiókat tartalmazó file
+    :param countries: az országokat, kódokat, és régiókat tartalmazó file, ha None, akkor a 'country regions'
+    referenciaadat
     :return:
     """
+    if countries is None:
+        countries = datamanager.get_reference_data('country regions')
     reshaped = pd.lreshape(countries,
                            {'country': ['name', 'alpha-2', 'alpha-3'], 'region': ['region', 'region', 'region']},
                            dropna=False)
@@ -141,40 +260,263 @@ def generalize_country_to_region(
     workdata.df[column] = workdata.df[column].map(dictionary)
 
 
+def format_ipv4_addresses(numbers):
+    """
+    Egész számként tárolt IPv4 címeket alakít pontozott szöveggé.
+    :param numbers: a címeket tartalmazó egész tömb
+    :return: a szövegeket tartalmazó tömb
+    """
+    octets = [octet_texts[(numbers >> np.uint64(shift)) & np.uint64(255)] for shift in (24, 16, 8, 0)]
+    return octets[0] + '.' + octets[1] + '.' + octets[2] + '.' + octets[3]
+
+
+def format_ipv6_addresses(hi, lo):
+    """
+    A felső és alsó 64 bitjükkel megadott IPv6 címeket alakítja tömörített szöveges alakra.
+    :param hi: a címek felső 64 bitje
+    :param lo: a címek alsó 64 bitje
+    :return: a szövegeket tartalmazó tömb
+    """
+    return np.array([str(ipaddress.IPv6Address((int(h) << 64) | int(l))) for h, l in zip(hi, lo)], dtype=object)
+
+
+def map_ip_addresses(workdata, column, ipv4_function, ipv6_function):
+    """
+    A DataFrame adott oszlopában lévő IP címeket alakítja át. Az oszlop egyedi értékei egyszer alakulnak egész
+    számokká (lásd detection.pack_ip_addresses()), az átalakító függvények pedig az összes IPv4, illetve IPv6 címet
+    egyszerre kapják meg. Az IP címként nem értelmezhető értékek változatlanok maradnak, a hiányzó értékek hiányzók. Az
+    oszlop a kategorikus oszlopok közé kerül.
+    :param workdata: a WorkData példány
+    :param column: az oszlop neve
+    :param ipv4_function: az IPv4 címek egész tömbjét kapó, a szöveges eredményeket visszaadó függvény
+    :param ipv6_function: az IPv6 címek felső és alsó 64 bitjét kapó, a szöveges eredményeket visszaadó függvény
+    :return:
+    """
+    codes, uniques = pd.factorize(workdata.df[column])
+    packed = detection.pack_ip_addresses(pd.Series(uniques, dtype=object))
+    version = packed['version'].to_numpy()
+    hi = packed['hi'].to_numpy()
+    lo = packed['lo'].to_numpy()
+    # az utolsó elem a -1 kódú (hiányzó) értékeké
+    result = np.append(np.asarray(uniques, dtype=object), np.nan)
+    ipv4 = np.append(version == 4, False)
+    ipv6 = np.append(version == 6, False)
+    if ipv4.any():
+        result[ipv4] = ipv4_function(lo[ipv4[:-1]])
+    if ipv6.any():
+        result[ipv6] = ipv6_function(hi[ipv6[:-1]], lo[ipv6[:-1]])
+    workdata.df[column] = result[codes]
+    if workdata.categorical is not None:
+        workdata.categorical.add(column)
+
+
+def prefix_masks(prefix, width):
+    """
+    Visszaadja az adott hosszú hálózati előtag maszkját egy width bites címre, 64 bites részekre bontva.
+    :param prefix: az előtag hossza bitekben
+    :param width: a cím hossza bitekben (32 vagy 128)
+    :return: a maszk 64 bites részei a legfelsőtől kezdve
+    """
+    if not 0 <= prefix <= width:
+        raise ValueError("The prefix length must be between 0 and {}".format(width))
+    mask = ((1 << width) - 1) ^ ((1 << (width - prefix)) - 1)
+    parts = max(1, width // 64)
+    return [np.uint64((mask >> (64 * (parts - 1 - part))) & 0xFFFFFFFFFFFFFFFF) for part in range(parts)]
+
+
+def truncate_ip_addresses(workdata, column: str, ipv4_prefix=24, ipv6_prefix=48):
+    """
+    A DataFrame adott oszlopában lévő IP címeket a hálózatuk címére általánosítja CIDR alakban, pl. 192.168.1.23
+    helyett 192.168.1.0/24 lesz. Az azonos hálózatba tartozó címek ugyanazt az értéket kapják.
+    :param workdata: a WorkData példány
+    :param column: az oszlop neve
+    :param ipv4_prefix: az IPv4 címekből megtartott előtag hossza bitekben
+    :param ipv6_prefix: az IPv6 címekből megtartott előtag hossza bitekben
+    :return:
+    """
+    ipv4_mask = prefix_masks(ipv4_prefix, 32)[0]
+    ipv6_hi_mask, ipv6_lo_mask = prefix_masks(ipv6_prefix, 128)
+
+    # csak a különböző hálózatok címei alakulnak szöveggé
+    def truncate_ipv4(lo):
+        networks, inverse = np.unique(lo & ipv4_mask, return_inverse=True)
+        return (format_ipv4_addresses(networks) + '/{}'.format(ipv4_prefix))[inverse.ravel()]
+
+    def truncate_ipv6(hi, lo):
+        networks, inverse = np.unique(np.stack([hi & ipv6_hi_mask, lo & ipv6_lo_mask], axis=1), axis=0,
+                                      return_inverse=True)
+        return (format_ipv6_addresses(networks[:, 0], networks[:, 1]) + '/{}'.format(ipv6_prefix))[inverse.ravel()]
+
+    map_ip_addresses(workdata, column, truncate_ipv4, truncate_ipv6)
+
+
+def prefix_preserving_bytes(addresses, key, namespace):
+    """
+    Előtagmegőrző kulcsos pszeudonimizálás (a Crypto-PAn elvén): a kimenet minden bitje a bemenet bitjének és egy, a
+    bemenet előtte álló bitjeiből a titkos kulccsal képzett álvéletlen bitnek a kizáró vagya. Így két cím pszeudonimje
+    pontosan annyi bitben egyezik az elejéről, ahányban az eredeti címek, és az átalakítás kölcsönösen egyértelmű. Az
+    álvéletlen bitek bájtonként egy HMAC-SHA256 lenyomatból jönnek, ami az előtag összes további, bájton belüli
+    előtagjához tartozó bitet tartalmazza, így egy bájthoz az előtagok egyedi értékeinek számával megegyező lenyomat
+    készül, a bitek kiválasztása pedig vektorosan történik.
+    :param addresses: a címek bájtjait soronként tartalmazó uint8 mátrix
+    :param key: a titkos kulcs (bytes)
+    :param namespace: a névtér
+    :return: a pszeudonimizált címek bájtjai
+    """
+    count, width = addresses.shape
+    result = np.empty_like(addresses)
+    rows = np.arange(count)
+    for position in range(width):
+        if position == 0:
+            prefixes, inverse = [b''], np.zeros(count, dtype=np.int64)
+        else:
+            unique_prefixes, inverse = np.unique(
+                np.ascontiguousarray(addresses[:, :position]).view('V{}'.format(position)).ravel(),
+                return_inverse=True
+            )
+            raw = unique_prefixes.tobytes()
+            prefixes = [raw[i:i + position] for i in range(0, len(raw), position)]
+        label = '{} {}'.format(namespace, position).encode('utf-8') + b'\x00'
+        digests = b''.join(hmac.digest(key, label + prefix, 'sha256') for prefix in prefixes)
+        pads = np.frombuffer(digests, dtype=np.uint8).reshape(-1, 32)[inverse.ravel()]
+        value = addresses[:, position].astype(np.int64)
+        output = np.zeros(count, dtype=np.int64)
+        for bit in range(8):
+            # a bájton belüli előtag sorszáma egy teljes bináris fában: 1, 2-3, 4-7, ..., 128-255
+            index = ((1 << bit) | (value >> (8 - bit))) - 1
+            flip = (pads[rows, index >> 3] >> (7 - (index & 7))) & 1
+            output = (output << 1) | (((value >> (7 - bit)) & 1) ^ flip)
+        result[:, position] = output
+    return result
+
+
+def pseudonymise_ip_addresses(workdata, column: str, key=None):
+    """
+    A DataFrame adott oszlopában lévő IP címeket előtagmegőrző módon, a titkos kulccsal pszeudonimizálja (lásd
+    prefix_preserving_bytes()), így az azonos hálózatba tartozó címek pszeudonimjei is azonos hálózatba tartoznak.
+    Ugyanaz a cím ugyanazzal a kulccsal mindig ugyanazt a pszeudonimet kapja.
+    :param workdata: a WorkData példány
+    :param column: az oszlop neve
+    :param key: a titkos kulcs, ha None, akkor a WorkData pseudonym_key attribútuma
+    :return:
+    """
+    if key is None:
+        key = workdata.pseudonym_key
+    if key is None:
+        raise ValueError("A pseudonym key is required for prefix-preserving pseudonymisation")
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+
+    def pseudonymise_ipv4(lo):
+        addresses = lo.astype('>u4').view(np.uint8).reshape(-1, 4)
+        pseudonyms = prefix_preserving_bytes(addresses, key, 'ipv4')
+        return format_ipv4_addresses(pseudonyms.view('>u4').ravel().astype(np.uint64))
+
+    def pseudonymise_ipv6(hi, lo):
+        addresses = np.stack([hi, lo], axis=1).astype('>u8').view(np.uint8).reshape(-1, 16)
+        pseudonyms = prefix_preserving_bytes(addresses, key, 'ipv6').view('>u8').reshape(-1, 2)
+        return format_ipv6_addresses(pseudonyms[:, 0], pseudonyms[:, 1])
+
+    map_ip_addresses(workdata, column, pseudonymise_ipv4, pseudonymise_ipv6)
+
+
+def mask_mac_addresses(workdata, column: str, key=None):
+    """
+    A DataFrame adott oszlopában lévő MAC címeknek csak a gyártót azonosító első három bájtját (OUI) tartja meg. Az
+    eszközt azonosító második három bájt kulcs nélkül nullázódik, kulccsal pedig a teljes címből képzett kulcsos
+    pszeudonimre cserélődik, így a különböző eszközök megkülönböztethetők maradnak. A kimenet kisbetűs, kettősponttal
+    tagolt alakú. A MAC címként nem értelmezhető értékek változatlanok maradnak.
+    :param workdata: a WorkData példány
+    :param column: az oszlop neve
+    :param key: a titkos kulcs, ha None, akkor a WorkData pseudonym_key attribútuma, ha az is None, akkor az eszközt
+    azonosító bájtok nullázódnak
+    :return:
+    """
+    if key is None:
+        key = workdata.pseudonym_key
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    codes, uniques = pd.factorize(workdata.df[column])
+    digits = pd.Series(uniques, dtype=object).map(str).str.replace(mac_separator_regex, '', regex=True)
+    is_mac = digits.str.match(mac_digits_regex).to_numpy(dtype=bool)
+    result = np.append(np.asarray(uniques, dtype=object), np.nan)
+    if is_mac.any():
+        # a hexadecimális számjegyek értékei a karakterkódok alapján, egy lépésben
+        hex_values = np.zeros(128, dtype=np.uint64)
+        hex_values[ord('0'):ord('9') + 1] = np.arange(10)
+        hex_values[ord('a'):ord('f') + 1] = np.arange(10, 16)
+        hex_values[ord('A'):ord('F') + 1] = np.arange(10, 16)
+        nibbles = hex_values[digits[is_mac].to_numpy().astype('U12').view(np.uint32).reshape(-1, 12)]
+        numbers = (nibbles << (np.uint64(4) * np.arange(11, -1, -1, dtype=np.uint64))).sum(axis=1, dtype=np.uint64)
+        devices = np.zeros(len(numbers), dtype=np.uint64)
+        if key is not None:
+            digests = np.frombuffer(keyed_digests(numbers, key, 'mac device'), dtype=np.uint8).reshape(-1, 32)
+            devices = (digests[:, :3].astype(np.uint64) << np.array([16, 8, 0], dtype=np.uint64)).sum(
+                axis=1, dtype=np.uint64)
+        masked = (numbers & np.uint64(0xFFFFFF000000)) | devices
+        # szöveggé alakítás a karakterkódok mátrixán keresztül: 12 hexadecimális számjegy, közöttük kettőspontok
+        hex_chars = np.array([ord(char) for char in '0123456789abcdef'], dtype=np.uint32)
+        chars = np.full((len(masked), 17), ord(':'), dtype=np.uint32)
+        for digit in range(12):
+            chars[:, digit + digit // 2] = hex_chars[(masked >> np.uint64(4 * (11 - digit))) & np.uint64(15)]
+        result[np.append(is_mac, False)] = chars.view('U17').ravel()
+    workdata.df[column] = result[codes]
+    if workdata.categorical is not None:
+        workdata.categorical.add(column)
+
+
 # az egyes címkékhez tartozó pszeudonimizáló függvények
 labels_and_psudonymisation_functions = {
     'country or region': generalize_country_to_region,
     'human age': number_to_interval,
-    'email address': email_multi_pseudonymise
+    'email address': email_multi_pseudonymise,
+    'ip address': truncate_ip_addresses,
+    'mac address': mask_mac_addresses
 }
 
 
-def auto_pseudonymise_by_label(workdata, labels_df=datamanager.read_labels_file()):
+def auto_pseudonymise_by_label(workdata, labels_df=None, options=None):
     """
     A DataFrame azon oszlopait pszeudonimizálja a megfelelő függvények hívásával, ahol az oszlopnév címkéjéhez létezik
     specializált pszeudonimizáló függvény.
     :param workdata: a WorkData példány
-    :param labels_df: a címkéket tartalmazó DataFrame
+    :param labels_df: a címkéket tartalmazó DataFrame, ha None, akkor a labels.csv tartalma
+    :param options: (oszlopnév, címke) párokkal indexelt szótár, ami a pszeudonimizáló függvénynek átadott további
+    paramétereket tartalmazza (pl. a hívások között megőrzött hozzárendeléseket)
     :return:
     """
+    if options is None:
+        options = {}
+    if labels_df is None:
+        labels_df = datamanager.read_labels_file()
     filtered = labels_df[labels_df['name'].isin(workdata.df.columns.values)]
     filtered = filtered.to_dict('records')
     for i in filtered:
         for j, func in labels_and_psudonymisation_functions.items():
             if j == i['type']:
-                func(workdata, workdata.df[i['name']].name)
+                with instrumentation.stage('pseudonymiser', rows=len(workdata.df), column=i['name'],
+                                           function=func.__name__):
+                    func(workdata, workdata.df[i['name']].name, **options.get((i['name'], i['type']), {}))
 
 
-def auto_pseudonymise_id_data(workdata, labels_df=datamanager.read_labels_file()):
+def auto_pseudonymise_id_data(workdata, labels_df=None, options=None):
     """
     Pszeudonimizálja a DataFrame azon oszlopait, amelyek címkéihez nem létezik specializált pszeudonimizáló függvény.
     Ilyenkor a text_to_number() függvény hívódik meg.
     :param workdata: a WorkData példány
-    :param labels_df: a címkéket tartalmazó DataFrame
+    :param labels_df: a címkéket tartalmazó DataFrame, ha None, akkor a labels.csv tartalma
+    :param options: (oszlopnév, címke) párokkal indexelt szótár, ami a text_to_number() függvénynek átadott további
+    paramétereket tartalmazza (pl. a hívások között megőrzött hozzárendelést)
     :return:
     """
+    if options is None:
+        options = {}
+    if labels_df is None:
+        labels_df = datamanager.read_labels_file()
     filtered = labels_df[labels_df['name'].isin(workdata.df.columns.values)]
     filtered = filtered.to_dict('records')
     for i in filtered:
         if i['identifier'] is True and i['type'] not in labels_and_psudonymisation_functions:
-            text_to_number(workdata, i['name'])
+            with instrumentation.stage('pseudonymiser', rows=len(workdata.df), column=i['name'],
+                                       function=text_to_number.__name__):
+                text_to_number(workdata, i['name'], **options.get((i['name'], i['type']), {}))
@@ -0,0 +1,325 @@
+import itertools
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import analysis
+
+
+class ColumnLevels:
+    """
+    Egy oszlop általánosítási szintjei a teljes tartományú (globális) átkódoláshoz. Az oszlop értékei egyszer
+    kódolódnak (0. szint), és minden szinthez egy tömb adja meg, hogy a 0. szintű kódok melyik általánosított kódba
+    kerülnek. Mivel a szintek egymásba ágyazottak, egy csoport bármelyik tagjának 0. szintű kódjából kiszámolható a
+    csoport kódja bármelyik magasabb szinten. A legmagasabb szinten minden érték (a hiányzó is) egyetlen kódba kerül.
+    """
+
+    def __init__(self, codes, level_codes, level_labels, level_spans, full_span, is_categorical):
+        """
+        :param codes: a sorok 0. szintű kódjai
+        :param level_codes: szintenként a 0. szintű kódokhoz tartozó általánosított kódok tömbje
+        :param level_labels: szintenként az általánosított kódok címkéi (a 0. szinten None, ott az eredeti érték marad)
+        :param level_spans: szintenként az általánosított kódok által lefedett tartomány (lásd
+        anonymisation.information_loss())
+        :param full_span: az oszlop teljes tartománya
+        :param is_categorical: True, ha az oszlop kategorikus
+        """
+        self.codes = codes
+        self.level_codes = level_codes
+        self.level_labels = level_labels
+        self.level_spans = level_spans
+        self.full_span = full_span
+        self.is_categorical = is_categorical
+
+    @property
+    def height(self):
+        """
+        :return: a legmagasabb szint sorszáma
+        """
+        return len(self.level_codes) - 1
+
+
+def factorize_values(column):
+    """
+    Az oszlop értékeit 0. szintű kódokká alakítja, a hiányzó érték kódja az utolsó.
+    :param column: az oszlop (Series)
+    :return: a kódok és a kódokhoz tartozó értékek (a hiányzó értékhez NaN)
+    """
+    codes, uniques = pd.factorize(column)
+    values = np.asarray(uniques, dtype=object)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(values), codes)
+        values = np.append(values, np.nan)
+    return codes.astype(np.int64), values
+
+
+def top_level(count):
+    """
+    :param count: a 0. szintű kódok száma
+    :return: a legmagasabb szint kódjai és címkéi, ahol minden érték a '*' címkét kapja
+    """
+    return np.zeros(count, dtype=np.int64), np.array(['*'], dtype=object)
+
+
+def continuous_levels(column):
+    """
+    Folytonos oszlop szintjei: a h. szinten az értékek w * 2^(h-1) szélességű intervallumokba kerülnek (a
+    number_to_interval() függvényhez hasonlóan 'alsó - felső' címkével), amíg egyetlen intervallum le nem fedi az
+    összes értéket, a legmagasabb szinten pedig minden érték '*' lesz. Az első szint w szélessége a szomszédos
+    különböző értékek legkisebb távolságánál nagyobb legkisebb kettőhatvány (egész értékeknél legalább 2), így pl. a 0
+    és 1 közötti értékek sem kerülnek már az első szinten egyetlen intervallumba.
+    :param column: az oszlop (Series)
+    :return: a ColumnLevels példány
+    """
+    codes, values = factorize_values(column)
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+    valid = ~np.isnan(numbers)
+    minimum = numbers[valid].min() if valid.any() else 0.0
+    maximum = numbers[valid].max() if valid.any() else 0.0
+    full_span = maximum - minimum
+    integral = bool(np.all(np.mod(numbers[valid], 1) == 0))
+
+    level_codes = [np.arange(len(values))]
+    level_labels = [None]
+    level_spans = [np.where(valid, 0.0, np.nan)]
+    gaps = np.diff(np.unique(numbers[valid]))
+    width = 2.0 ** (np.floor(np.log2(gaps.min())) + 1) if len(gaps) else 2.0
+    if integral:
+        width = max(width, 2.0)
+    while True:
+        bins, uniques = pd.factorize(np.floor(numbers / width) * width)
+        lower = np.asarray(uniques, dtype=float)
+        upper = lower + width - 1 if integral else lower + width
+        bins = np.where(bins < 0, len(lower), bins)
+        if integral:
+            labels = ['{} - {}'.format(int(low), int(high)) for low, high in zip(lower, upper)]
+        else:
+            labels = ['{} - {}'.format(low, high) for low, high in zip(lower, upper)]
+        level_codes.append(bins.astype(np.int64))
+        level_labels.append(np.array(labels + [np.nan], dtype=object))
+        level_spans.append(np.append(np.minimum(upper, maximum) - np.maximum(lower, minimum), np.nan))
+        if len(lower) <= 1:
+            break
+        width *= 2
+    codes_top, labels_top = top_level(len(values))
+    level_codes.append(codes_top)
+    level_labels.append(labels_top)
+    level_spans.append(np.array([full_span]))
+    return ColumnLevels(codes, level_codes, level_labels, level_spans, full_span, False)
+
+
+def categorical_levels(column):
+    """
+    Hierarchia nélküli kategorikus oszlop szintjei: az értékek megmaradnak, vagy mindegyik '*' lesz.
+    :param column: az oszlop (Series)
+    :return: a ColumnLevels példány
+    """
+    codes, values = factorize_values(column)
+    codes_top, labels_top = top_level(len(values))
+    return ColumnLevels(codes, [np.arange(len(values)), codes_top], [None, labels_top],
+                        [np.ones(len(values)), np.array([len(values)])], len(values), True)
+
+
+def hierarchy_levels(column, hierarchy):
+    """
+    Hierarchiával rendelkező oszlop szintjei: a h. szinten minden érték a hierarchiában h szinttel feljebb álló ősére
+    (legfeljebb a gyökérre) cserélődik.
+    :param column: az oszlop (Series)
+    :param hierarchy: a hierarchy.Hierarchy példány
+    :return: a ColumnLevels példány
+    """
+    codes, values = factorize_values(column)
+    ranks, tree = hierarchy.encode(pd.Series(values, dtype=object))
+    leaf_depths = tree.depths[tree.leaf_nodes[ranks]]
+    level_codes = [np.arange(len(values))]
+    level_labels = [None]
+    level_spans = [np.ones(len(values))]
+    for height in range(1, int(leaf_depths.max()) + 1 if len(values) else 1):
+        nodes = tree.ancestors[np.maximum(leaf_depths - height, 0), ranks]
+        node_codes, uniques = pd.factorize(nodes)
+        level_codes.append(node_codes.astype(np.int64))
+        level_labels.append(tree.labels[uniques])
+        level_spans.append((tree.last_leaf[uniques] - tree.first_leaf[uniques] + 1).astype(float))
+    if len(level_codes) == 1:
+        codes_top, labels_top = top_level(len(values))
+        level_codes.append(codes_top)
+        level_labels.append(labels_top)
+        level_spans.append(np.array([len(tree.leaf_nodes)], dtype=float))
+    return ColumnLevels(codes, level_codes, level_labels, level_spans, len(tree.leaf_nodes), True)
+
+
+def column_levels(df, column, is_categorical, hierarchy=None):
+    """
+    Az oszlop típusának megfelelő általánosítási szinteket adja vissza.
+    :param df: a DataFrame
+    :param column: az oszlop neve
+    :param is_categorical: True, ha az oszlop kategorikus
+    :param hierarchy: az oszlop hierarchy.Hierarchy példánya, vagy None
+    :return: a ColumnLevels példány
+    """
+    if hierarchy is not None:
+        return hierarchy_levels(df[column], hierarchy)
+    if is_categorical:
+        return categorical_levels(df[column])
+    return continuous_levels(df[column])
+
+
+def frequency_table(levels):
+    """
+    Elkészíti a 0. szintek (a legkevésbé általánosított csomópont) gyakorisági tábláját.
+    :param levels: a ColumnLevels példányok listája
+    :return: a csoportok 0. szintű kódjait tartalmazó mátrix (soronként egy csoport) és a csoportok méretei
+    """
+    rows = len(levels[0].codes) if levels else 0
+    group_ids = np.zeros(rows, dtype=np.int64)
+    group_count = 1 if rows else 0
+    for column in levels:
+        group_ids, group_count = analysis.combine_groups(group_ids, column.codes, len(column.level_codes[0]))
+    first = np.zeros(group_count, dtype=np.int64)
+    first[group_ids[::-1]] = np.arange(rows - 1, -1, -1)
+    representatives = np.column_stack([column.codes[first] for column in levels]) if levels else np.zeros((1, 0))
+    return representatives, np.bincount(group_ids, minlength=group_count)
+
+
+def roll_up(table, node, levels):
+    """
+    Egy kevésbé általánosított csomópont gyakorisági táblájából kiszámítja egy általánosabb csomópontét: a csoportok
+    kódjai az új szintekre képeződnek, az így egybeeső csoportok méretei összeadódnak. A számolás a csoportokon, nem a
+    sorokon történik.
+    :param table: a kiinduló gyakorisági tábla (lásd frequency_table())
+    :param node: a cél csomópont, oszloponként a szint sorszáma
+    :param levels: a ColumnLevels példányok listája
+    :return: a cél csomópont gyakorisági táblája
+    """
+    representatives, counts = table
+    group_ids = np.zeros(len(counts), dtype=np.int64)
+    group_count = 1
+    for index, (column, level) in enumerate(zip(levels, node)):
+        level_codes = column.level_codes[level]
+        group_ids, group_count = analysis.combine_groups(
+            group_ids, level_codes[representatives[:, index]], int(level_codes.max()) + 1
+        )
+    first = np.zeros(group_count, dtype=np.int64)
+    first[group_ids[::-1]] = np.arange(len(group_ids) - 1, -1, -1)
+    return representatives[first], np.bincount(group_ids, weights=counts, minlength=group_count).astype(np.int64)
+
+
+def search_lattice(levels, k, cache_size=32, max_nodes=1000000, counters=None):
+    """
+    Megkeresi a szintek hálójában a legkevésbé általánosított k-anonim csomópontot (Flash-szerű keresés). A csomópontok
+    magasság szerint növekvő sorrendben dolgozódnak fel; egy még címkézetlen csomópontból a háló teteje felé vezető
+    útvonalon bináris kereséssel dől el, hol kezdődnek a k-anonim csomópontok. Minden vizsgálat eredménye tovább
+    terjed: egy k-anonim csomópont minden általánosítása k-anonim, egy nem k-anonim csomópont minden specializációja
+    sem az. A gyakorisági táblák a legkisebb már ismert, kevésbé általánosított csomópont táblájából gördülnek fel
+    (lásd roll_up()), az utoljára használt cache_size darab tábla a memóriában marad. A k-anonim csomópontok közül a
+    szintek relatív magasságainak átlaga szerint legkisebb, egyenlőség esetén a kisebb discernibility értékű
+    választódik.
+    :param levels: a ColumnLevels példányok listája
+    :param k: a k-anonimitás paramétere
+    :param cache_size: a megőrzött gyakorisági táblák száma
+    :param max_nodes: a háló csomópontjainak legnagyobb megengedett száma
+    :param counters: ha meg van adva, akkor egy szótár, amibe a háló mérete ('lattice nodes') és a vizsgált
+    csomópontok száma ('checked nodes') kerül
+    :return: a kiválasztott csomópont (oszloponként a szint sorszáma) és a gyakorisági táblája; ha egyik csomópont
+    sem k-anonim (az adathalmaznak k-nál kevesebb sora van), akkor ValueError
+    """
+    heights = np.array([column.height for column in levels], dtype=np.int64)
+    node_count = int(np.prod(heights + 1))
+    if node_count > max_nodes:
+        raise ValueError("The generalisation lattice has {} nodes, more than {}".format(node_count, max_nodes))
+    nodes = np.array(list(itertools.product(*[range(height + 1) for height in heights])), dtype=np.int64)
+    nodes = nodes.reshape(node_count, len(levels))
+    strides = np.append(np.cumprod((heights + 1)[::-1])[::-1][1:], 1).astype(np.int64)
+    # -1: még nem ismert, 0: nem k-anonim, 1: k-anonim
+    tags = np.full(node_count, -1, dtype=np.int8)
+    base = tuple([0] * len(levels))
+    base_table = frequency_table(levels)
+    # a táblák a használatuk sorrendjében állnak, a legrégebben használt kerül ki először
+    cache = OrderedDict()
+    checked = 0
+
+    def table_of(node):
+        node = np.asarray(node)
+        key = tuple(int(level) for level in node)
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        source_key = None
+        source = base_table
+        for cached_key, table in cache.items():
+            if len(table[1]) < len(source[1]) and np.all(np.asarray(cached_key) <= node):
+                source_key, source = cached_key, table
+        if source_key is not None:
+            cache.move_to_end(source_key)
+        table = roll_up(source, node, levels) if key != base else base_table
+        cache[key] = table
+        if len(cache) > cache_size:
+            cache.popitem(last=False)
+        return table
+
+    def is_anonymous(index):
+        nonlocal checked
+        if tags[index] >= 0:
+            return bool(tags[index])
+        checked += 1
+        node = nodes[index]
+        anonymous = table_of(node)[1].min() >= k
+        if anonymous:
+            tags[np.all(nodes >= node, axis=1)] = 1
+        else:
+            tags[np.all(nodes <= node, axis=1)] = 0
+        return anonymous
+
+    relative = nodes / np.maximum(heights, 1)
+    for start in np.argsort(nodes.sum(axis=1), kind='stable'):
+        if tags[start] >= 0:
+            continue
+        # útvonal a háló tetejéig, mindig a relatíve legkevésbé általánosított oszlop szintje nő
+        path = [start]
+        node = nodes[start].copy()
+        while np.any(node < heights):
+            candidates = np.where(node < heights, node / np.maximum(heights, 1), np.inf)
+            node[np.argmin(candidates)] += 1
+            path.append(int(node @ strides))
+        low, high = 0, len(path)
+        while low < high:
+            middle = (low + high) // 2
+            if is_anonymous(path[middle]):
+                high = middle
+            else:
+                low = middle + 1
+
+    if counters is not None:
+        counters['lattice nodes'] = node_count
+        counters['checked nodes'] = checked
+    anonymous = np.flatnonzero(tags == 1)
+    if not len(anonymous):
+        # a legfelső csomópontban minden sor egy csoportba kerül, így ez csak k-nál kevesebb sor esetén fordulhat elő
+        raise ValueError("No generalisation is {}-anonymous, the dataset has fewer than {} rows".format(k, k))
+    losses = relative[anonymous].mean(axis=1)
+    best = anonymous[np.isclose(losses, losses.min())]
+    tables = [table_of(nodes[index]) for index in best]
+    choice = int(np.argmin([np.sum(table[1].astype(np.int64) ** 2) for table in tables]))
+    return tuple(int(level) for level in nodes[best[choice]]), tables[choice]
+
+
+def apply_levels(df, columns, levels, node):
+    """
+    Az oszlopok értékeit a csomópont szintjeinek megfelelő általánosított értékekre cseréli.
+    :param df: a DataFrame
+    :param columns: az oszlopok nevei
+    :param levels: a ColumnLevels példányok listája
+    :param node: a csomópont, oszloponként a szint sorszáma
+    :return: az általánosított DataFrame (a többi oszlop változatlan)
+    """
+    data = {}
+    for column in df.columns:
+        if column not in columns:
+            data[column] = df[column].values
+            continue
+        column_level = levels[columns.index(column)]
+        level = node[columns.index(column)]
+        if level == 0:
+            data[column] = df[column].values
+        else:
+            data[column] = column_level.level_labels[level][column_level.level_codes[level][column_level.codes]]
+    return pd.DataFrame(data, index=df.index, columns=df.columns)
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+import analysis
+from datamanager import WorkData
+
+# a kockázati eloszlás sávjainak határai: a rekordok az újraazonosítási valószínűségük szerint kerülnek a sávokba
+risk_bins = (0, 0.05, 0.1, 0.2, 1 / 3, 0.5, 1)
+
+
+def group_records(df, columns):
+    """
+    A sorokat az oszlopok értékei szerint ekvivalencia-osztályokba sorolja. Az oszlopok egész kódokká alakulnak, a
+    kódok pedig oszloponként egyetlen egész kulccsá keverednek (lásd analysis.combine_groups()), a hiányzó érték
+    külön értéknek számít.
+    :param df: a DataFrame
+    :param columns: az oszlopok listája
+    :return: a sorok osztályainak 0-tól kezdődő sorszámai és az osztályok száma
+    """
+    group_ids = np.zeros(len(df), dtype=np.int64)
+    group_count = 1 if len(df) else 0
+    for codes, cardinality in analysis.factorize_columns(df, columns):
+        group_ids, group_count = analysis.combine_groups(group_ids, codes, cardinality)
+    return group_ids, group_count
+
+
+def equivalence_class_sizes(df, columns):
+    """
+    Minden sorra megadja, hogy hány sor egyezik meg vele az oszlopokban, vagyis mekkora az ekvivalencia-osztálya.
+    :param df: a DataFrame
+    :param columns: a kvázi-azonosító oszlopok listája
+    :return: a soronkénti osztályméreteket tartalmazó Series
+    """
+    group_ids, group_count = group_records(df, columns)
+    sizes = np.bincount(group_ids, minlength=group_count)[group_ids]
+    return pd.Series(sizes, index=df.index, name='class size')
+
+
+def population_class_sizes(df, population, columns):
+    """
+    Minden sorra megadja, hogy a populációban (pl. a teljes nyilvántartásban, aminek a DataFrame egy mintája) hány sor
+    egyezik meg vele az oszlopokban. A minta és a populáció értékei közösen kódolódnak, így az osztályok egyeznek.
+    :param df: a DataFrame
+    :param population: a populációt tartalmazó DataFrame, ugyanezekkel az oszlopokkal
+    :param columns: a kvázi-azonosító oszlopok listája
+    :return: a soronkénti populációbeli osztályméreteket tartalmazó Series
+    """
+    combined = pd.concat([df[columns], population[columns]], ignore_index=True)
+    group_ids, group_count = group_records(combined, columns)
+    sizes = np.bincount(group_ids[len(df):], minlength=group_count)[group_ids[:len(df)]]
+    return pd.Series(sizes, index=df.index, name='population class size')
+
+
+def record_risks(df, columns, population=None, sampling_fraction=None):
+    """
+    Kiszámítja a sorok újraazonosítási kockázatát. A prosecutor kockázat azt feltételezi, hogy a támadó tudja, hogy az
+    egyén szerepel az adathalmazban, értéke 1 / az osztály mérete. A journalist kockázat azt feltételezi, hogy a
+    támadó egy populációból indul ki, aminek az adathalmaz egy mintája, értéke 1 / a populációbeli osztály mérete. A
+    populációbeli osztályméret a populációból számolódik, ha az meg van adva, egyébként a mintavételi arányból
+    becsülődik (legalább a mintabeli méret), ha pedig egyik sincs megadva, akkor az adathalmaz maga a populáció.
+    :param df: a DataFrame
+    :param columns: a kvázi-azonosító oszlopok listája
+    :param population: a populációt tartalmazó DataFrame, vagy None
+    :param sampling_fraction: az adathalmaz mérete a populációéhoz képest (0 és 1 között), vagy None
+    :return: DataFrame a 'class size', 'prosecutor risk' és 'journalist risk' oszlopokkal
+    """
+    sizes = equivalence_class_sizes(df, columns)
+    if population is not None:
+        population_sizes = np.maximum(population_class_sizes(df, population, columns), sizes)
+    elif sampling_fraction is not None:
+        if not 0 < sampling_fraction <= 1:
+            raise ValueError("Sampling fraction must be between 0 and 1")
+        population_sizes = np.maximum(np.round(sizes / sampling_fraction), sizes)
+    else:
+        population_sizes = sizes
+    return pd.DataFrame({
+        'class size': sizes,
+        'prosecutor risk': 1 / sizes,
+        'journalist risk': 1 / population_sizes
+    }, index=df.index)
+
+
+def risk_distribution(risks, bins=risk_bins):
+    """
+    Megszámolja, hogy hány rekord kockázata esik az egyes sávokba.
+    :param risks: a rekordok kockázatai
+    :param bins: a sávok határai
+    :return: Series, ami a sávokhoz (pl. '(0.1, 0.2]') a rekordok számát rendeli
+    """
+    counts = pd.cut(risks, bins=bins, include_lowest=True).value_counts(sort=False)
+    counts.index = counts.index.astype(str)
+    return counts
+
+
+def risk_summary(df, columns, k=None, population=None, sampling_fraction=None):
+    """
+    Összefoglalja az adathalmaz újraazonosítási kockázatát: az ekvivalencia-osztályok számát és méretét, a prosecutor és
+    journalist kockázat legnagyobb és átlagos értékét, valamint eloszlását (lásd record_risks()), és ha a k meg van
+    adva, akkor a k-nál kisebb osztályokba tartozó rekordok és az ilyen osztályok számát.
+    :param df: a DataFrame
+    :param columns: a kvázi-azonosító oszlopok listája
+    :param k: a k-anonimitás paramétere, vagy None
+    :param population: a populációt tartalmazó DataFrame, vagy None
+    :param sampling_fraction: az adathalmaz mérete a populációéhoz képest, vagy None
+    :return: az összefoglalót tartalmazó szótár
+    """
+    risks = record_risks(df, columns, population, sampling_fraction)
+    sizes = risks['class size'].to_numpy()
+    summary = {
+        'records': len(df),
+        'equivalence classes': int(np.round(np.sum(1 / sizes))),
+        'smallest class': int(sizes.min()) if len(sizes) else None,
+        'average class size': float(sizes.mean()) if len(sizes) else None
+    }
+    for name in ('prosecutor risk', 'journalist risk'):
+        values = risks[name]
+        summary[name] = {
+            'max': float(values.max()) if len(values) else None,
+            'average': float(values.mean()) if len(values) else None,
+            'distribution': risk_distribution(values).to_dict()
+        }
+    if k is not None:
+        below = sizes < k
+        summary['records below k'] = int(np.count_nonzero(below))
+        summary['classes below k'] = int(np.round(np.sum(1 / sizes[below])))
+    return summary
+
+
+def compare_risk(workdata: WorkData, anonymised_df, population=None, sampling_fraction=None):
+    """
+    Összeveti az eredeti és az anonimizált (anonymisation.anonymise_dataset() által visszaadott) adathalmaz
+    kockázatát a WorkData feature oszlopai és k paramétere alapján. Az anonimizált adathalmaz általánosított értékei nem
+    vethetők össze a populáció eredeti értékeivel, ezért annak journalist kockázata csak a mintavételi arányból
+    becsülődik.
+    :param workdata: a WorkData példány, ami az eredeti DataFramet tartalmazza
+    :param anonymised_df: az anonimizált DataFrame
+    :param population: a populációt tartalmazó DataFrame (eredeti értékekkel), vagy None
+    :param sampling_fraction: az adathalmaz mérete a populációéhoz képest, vagy None
+    :return: szótár a 'before' és 'after' összefoglalókkal (lásd risk_summary())
+    """
+    columns = list(workdata.feature_columns)
+    return {
+        'before': risk_summary(workdata.df, columns, workdata.k, population, sampling_fraction),
+        'after': risk_summary(anonymised_df, columns, workdata.k, None, sampling_fraction)
+    }
+
+
+def is_release_safe(summary, max_risk=None):
+    """
+    Megmondja, hogy az adathalmaz kiadható-e: nincs k-nál kisebb osztályba tartozó rekord, és ha a max_risk meg van
+    adva, akkor egyik rekord prosecutor kockázata sem nagyobb ennél.
+    :param summary: a risk_summary() által visszaadott szótár
+    :param max_risk: a legnagyobb megengedett kockázat, vagy None
+    :return: True, ha az adathalmaz kiadható
+    """
+    if summary.get('records below k', 0) > 0:
+        return False
+    maximum = summary['prosecutor risk']['max']
+    return max_risk is None or maximum is None or maximum <= max_risk
@@ -0,0 +1,38 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'anonymizer'))
+
+import analysis  # noqa: E402
+
+
+def test_combinations_match_drop_duplicates():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({name: rng.integers(0, cardinality, size=200) for name, cardinality in
+                       (('a', 3), ('b', 150), ('c', 5), ('d', 40))}).astype(float)
+    df.loc[::9, 'c'] = np.nan
+    result = analysis.combinations_unique_percentage(df, list(df.columns))
+    for size in range(1, 5):
+        for combination in itertools.combinations(df.columns, size):
+            expected = len(df[list(combination)].drop_duplicates()) / len(df) * 100
+            assert np.isclose(result[', '.join(combination)], expected)
+
+
+def test_supersets_of_unique_combinations_are_not_computed(monkeypatch):
+    combined = []
+    combine_groups = analysis.combine_groups
+
+    def counting_combine_groups(*args):
+        combined.append(args)
+        return combine_groups(*args)
+
+    monkeypatch.setattr(analysis, 'combine_groups', counting_combine_groups)
+    # csak a (b, c) kombináció teljesen egyedi, így az (a, b, c) már nem számolódik
+    df = pd.DataFrame({'a': [0, 0, 0, 0], 'b': [0, 0, 1, 1], 'c': [0, 1, 0, 1]})
+    result = analysis.combinations_unique_percentage(df, ['a', 'b', 'c'])
+    assert result['a, b, c'] == 100.0
+    assert len(combined) == 6
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'anonymizer'))
+
+import anonymisation  # noqa: E402
+from datamanager import WorkData  # noqa: E402
+
+
+
+def random_workdata(seed, rows=60, missing_ratio=0.15):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'age': rng.integers(0, 90, size=rows).astype(float),
+        'zip': rng.integers(1000, 1100, size=rows),
+        'sex': rng.choice(['f', 'm'], size=rows),
+        'disease': rng.choice(['a', 'b', 'c', 'd'], size=rows)
+    })
+    df.loc[rng.random(rows) < missing_ratio, 'age'] = np.nan
+    return WorkData(df, 'disease', 3, 2, 0.3, categorical={'sex', 'disease'}, feature_columns=['age', 'zip', 'sex'])
+
+
+@pytest.mark.parametrize('func', ['k', 'l', 't'])
+def test_partitions_with_missing_continuous_values_match_generic_partitioning(func):
+    for seed in range(50):
+        workdata = random_workdata(seed)
+        scale = anonymisation.get_spans(workdata.df, workdata.df.index, workdata.categorical)
+        global_freqs = anonymisation.get_global_freqs(workdata.df, workdata.sensitive_column)
+
+        def is_valid(data, partition):
+            # az is_valid_histogram() a k-anonimitást minden esetben vizsgálja
+            if not anonymisation.is_k_anonymous(data, partition):
+                return False
+            if func == 'l':
+                return anonymisation.is_l_diverse(data, partition)
+            if func == 't':
+                return anonymisation.is_t_close(data, partition, global_freqs)
+            return True
+        expected = anonymisation.partition_dataset(workdata, scale, is_valid)
+        actual = anonymisation.partition_dataset_by_criteria(workdata, scale, func)
+        assert [list(partition) for partition in actual] == [list(partition) for partition in expected], seed
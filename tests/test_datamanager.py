@@ -0,0 +1,48 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'anonymizer'))
+
+import datamanager  # noqa: E402
+
+
+def save_entries(cache_dir, worker, count):
+    datamanager.reference_cache_dir = cache_dir
+    for i in range(count):
+        datamanager.save_cached_reference_data('worker {} item {}'.format(worker, i), 1, [worker, i])
+
+
+def test_concurrent_cache_writes_keep_every_manifest_entry(tmp_path):
+    workers, count = 4, 10
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(save_entries, str(tmp_path), worker, count) for worker in range(workers)]
+        for future in futures:
+            future.result()
+
+    datamanager.reference_cache_dir = str(tmp_path)
+    manifest = datamanager.read_reference_manifest()
+    assert len(manifest) == workers * count
+    assert datamanager.load_cached_reference_data('worker 3 item 9', 1) == [3, 9]
+    files = ['manifest.json'] + [entry['file'] for entry in manifest.values()]
+    assert sorted(os.listdir(str(tmp_path))) == sorted(files)
+
+
+def test_parquet_writer_takes_column_types_from_first_non_null_chunk(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'chunks.parquet')
+    chunks = [pd.DataFrame({'id': [1, 2], 'name': [None, None], 'score': [np.nan, np.nan]}),
+              pd.DataFrame({'id': [3], 'name': ['x'], 'score': ['high']}),
+              pd.DataFrame({'id': [4], 'name': [np.nan], 'score': ['low']})]
+    with datamanager.DatasetWriter(path) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+    result = pd.read_parquet(path)
+    assert result['id'].tolist() == [1, 2, 3, 4]
+    assert result['name'].tolist() == [None, None, 'x', None]
+    assert result['score'].tolist() == [None, None, 'high', 'low']
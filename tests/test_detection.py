@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'anonymizer'))
+
+import detection  # noqa: E402
+import instrumentation  # noqa: E402
+
+
+values = pd.Series(['+36-20-123-4567', '+36-20-123-4567\n', '06 1 234 5678', '0612345678', 'ABC-123', 'abc-123\n',
+                    'xb-12-34', 'm-123456', 'user@example.com', 'user@example.com\n', 'a@b.c', '00:1A:2B:3C:4D:5E',
+                    '001a.2b3c.4d5e', '001A.2B3C.4D5E\n', 'not a match', '', '12345'])
+
+
+def test_pattern_scan_matches_individual_detectors():
+    functions = list(detection.pattern_detectors)
+    results = detection.scan_patterns(values, functions)
+    for function in functions:
+        assert results[function].tolist() == function(values).tolist(), function.__name__
+    assert not results[detection.is_phone_number_hungarian][1]
+    assert not results[detection.is_licence_plate_hungarian][5]
+
+
+def test_each_detector_reports_its_own_stage():
+    events = []
+    instrumentation.add_hook(events.append)
+    try:
+        functions = [detection.is_email_address, detection.is_human_age, detection.is_licence_plate_hungarian]
+        detection.detect_ratios(functions, values.rename('contact'))
+    finally:
+        instrumentation.remove_hook(events.append)
+    detectors = [(event['column'], event['function']) for event in events if event['stage'] == 'detector']
+    assert sorted(detectors) == sorted(('contact', function.__name__) for function in functions)
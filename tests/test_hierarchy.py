@@ -0,0 +1,30 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'anonymizer'))
+
+from hierarchy import Hierarchy  # noqa: E402
+
+
+def test_value_named_like_an_ancestor_gets_its_own_leaf():
+    hierarchy = Hierarchy({'Hungary': ('Eastern Europe', 'Europe'), 'Austria': ('Western Europe', 'Europe'),
+                           'Europe': (), 'Eastern Europe': ('Europe',)})
+    column = pd.Series(['Hungary', 'Europe', 'Austria', 'Eastern Europe', None, 'Hungary'])
+    ranks, tree = hierarchy.encode(column)
+
+    leaves = set(tree.leaf_nodes.tolist())
+    internal = set(tree.parents[1:].tolist())
+    assert leaves.isdisjoint(internal)
+    nodes = tree.leaf_nodes[ranks]
+    assert all(node in leaves for node in nodes)
+    assert list(tree.labels[nodes][:4]) == ['Hungary', 'Europe', 'Austria', 'Eastern Europe']
+    assert pd.isna(tree.labels[nodes[4]])
+    # minden érték külön levél, kivéve az ismétlődő értéket
+    assert len(np.unique(ranks)) == 5
+    assert ranks[0] == ranks[5]
+    assert tree.labels[tree.common_ancestors(ranks[0], ranks[3])] == 'Europe'
+    assert tree.labels[tree.common_ancestors(ranks[0], ranks[2])] == 'Europe'
+    assert tree.labels[tree.common_ancestors(ranks[0], ranks[1])] == '*'
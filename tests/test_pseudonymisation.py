@@ -0,0 +1,135 @@
+import ipaddress
+import os
+import sys
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'anonymizer'))
+
+import datamanager  # noqa: E402
+import pseudonymisation  # noqa: E402
+
+
+def pseudonymise_with_store(path, worker):
+    store = datamanager.MappingStore(path)
+    try:
+        values = pd.Series(['value {}'.format(i) for i in range(worker * 300, worker * 300 + 600)])
+        texts = pseudonymisation.pseudonymise_values(values, {}, 2, store=store, namespace='short')
+        return dict(zip(values, texts))
+    finally:
+        store.close()
+
+
+def test_shared_store_never_gives_two_values_the_same_text(tmp_path):
+    path = str(tmp_path / 'mappings.sqlite')
+    datamanager.MappingStore(path).close()
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(pseudonymise_with_store, [path] * 4, range(4)))
+
+    combined = {}
+    for result in results:
+        for value, text in result.items():
+            assert combined.setdefault(value, text) == text
+    assert len(set(combined.values())) == len(combined)
+    assert all(len(text) == 2 for text in combined.values())
+
+
+def test_email_mappings_keep_their_used_pseudonyms_across_chunks():
+    mappings = pseudonymisation.new_email_mappings()
+    emails = ['user{}@host{}.org'.format(i, i % 7) for i in range(300)]
+    results = []
+    for start in range(0, 300, 100):
+        chunk = datamanager.WorkData(pd.DataFrame({'email': emails[start:start + 100] + emails[:10]}), 'email', 2)
+        pseudonymisation.email_multi_pseudonymise(chunk, 'email', mappings)
+        results.append(chunk.df['email'].tolist())
+    # a korábbi darabok címei ugyanazt a pszeudonimet kapják
+    assert all(result[-10:] == results[0][:10] for result in results)
+    assert len(set(sum((result[:100] for result in results), []))) == 300
+    for part in ('local', 'domain', 'tld'):
+        assert mappings['used'][part] == set(mappings[part].values())
+        assert len(mappings['used'][part]) == len(mappings[part])
+
+
+def keyed_pseudonyms(df, key):
+    workdata = datamanager.WorkData(df.copy(), 'taj', 2, pseudonym_key=key)
+    pseudonymisation.email_multi_pseudonymise(workdata, 'email')
+    pseudonymisation.text_to_number(workdata, 'taj')
+    return {(email, taj): (pseudonym, number) for email, taj, pseudonym, number in
+            zip(df['email'], df['taj'], workdata.df['email'], workdata.df['taj'])}
+
+
+def test_keyed_pseudonyms_do_not_depend_on_the_run_or_the_row_order():
+    df = pd.DataFrame({'email': ['user{}@host{}.org'.format(i, i % 5) for i in range(200)],
+                       'taj': ['{:09d}'.format(i * 7919) for i in range(200)]})
+    shuffled = df.sample(frac=1, random_state=0).reset_index(drop=True)
+    first = keyed_pseudonyms(df, 'secret')
+    assert keyed_pseudonyms(df, b'secret') == first
+    assert keyed_pseudonyms(shuffled, 'secret') == first
+    # a kulcsos pszeudonimek a hozzárendelések nélkül, külön feldolgozott darabokban is ugyanazok
+    chunk = keyed_pseudonyms(df[100:], 'secret')
+    assert all(first[pair] == pseudonyms for pair, pseudonyms in chunk.items())
+    assert len(set(pseudonym for pseudonym, _ in first.values())) == 200
+    assert len(set(number for _, number in first.values())) == 200
+    other = keyed_pseudonyms(df, 'other secret')
+    assert all(other[pair] != first[pair] for pair in first)
+
+
+def number_with_store(path, worker):
+    store = datamanager.MappingStore(path)
+    try:
+        values = ['{:09d}'.format(i) for i in range(worker * 200, worker * 200 + 400)]
+        workdata = datamanager.WorkData(pd.DataFrame({'taj': values}), 'taj', 2, mapping_store=store)
+        pseudonymisation.text_to_number(workdata, 'taj')
+        return dict(zip(values, workdata.df['taj'].tolist()))
+    finally:
+        store.close()
+
+
+def test_shared_store_gives_consistent_distinct_numbers(tmp_path):
+    path = str(tmp_path / 'mappings.sqlite')
+    datamanager.MappingStore(path).close()
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(number_with_store, [path] * 4, range(4)))
+
+    combined = {}
+    for result in results:
+        for value, number in result.items():
+            assert combined.setdefault(value, number) == number
+    # a sorszámok hézag nélkül, egyszer kiosztva követik egymást
+    assert sorted(combined.values()) == list(range(len(combined)))
+    store = datamanager.MappingStore(path)
+    try:
+        assert store.assign_numbers('taj', combined) == combined
+    finally:
+        store.close()
+
+
+def common_prefix_length(first, second):
+    return first.max_prefixlen - (int(first) ^ int(second)).bit_length()
+
+
+def test_ip_pseudonyms_keep_prefixes_and_are_bijective():
+    rng = np.random.default_rng(0)
+    ipv4 = ['10.{}.{}.{}'.format(network, rng.integers(0, 2), host) for network in (1, 2, 130) for host in range(8)]
+    ipv6 = ['2001:db8:{:x}::{:x}'.format(network, host) for network in (1, 0x8000) for host in (1, 2, 0x100, 0xffff)]
+    addresses = ipv4 + ipv6 + ['not an address', None]
+    workdata = datamanager.WorkData(pd.DataFrame({'ip': addresses}), 'ip', 2, categorical=set())
+    pseudonymisation.pseudonymise_ip_addresses(workdata, 'ip', key='secret')
+    result = workdata.df['ip'].tolist()
+
+    assert result[-2] == 'not an address' and pd.isna(result[-1])
+    originals = [ipaddress.ip_address(address) for address in addresses[:-2]]
+    pseudonyms = [ipaddress.ip_address(pseudonym) for pseudonym in result[:-2]]
+    assert [pseudonym.version for pseudonym in pseudonyms] == [original.version for original in originals]
+    assert len(set(pseudonyms)) == len(set(originals))
+    for (a, pa), (b, pb) in combinations(zip(originals, pseudonyms), 2):
+        if a.version == b.version:
+            assert common_prefix_length(pa, pb) == common_prefix_length(a, b)
+
+    # ugyanaz a cím más sorrendben is ugyanazt a pszeudonimet kapja
+    reversed_workdata = datamanager.WorkData(pd.DataFrame({'ip': addresses[-3::-1]}), 'ip', 2, categorical=set())
+    pseudonymisation.pseudonymise_ip_addresses(reversed_workdata, 'ip', key='secret')
+    assert reversed_workdata.df['ip'].tolist() == result[-3::-1]
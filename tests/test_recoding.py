@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'anonymizer'))
+
+import anonymisation  # noqa: E402
+import recoding  # noqa: E402
+from datamanager import WorkData  # noqa: E402
+
+
+def level_values(levels, level):
+    codes = levels.level_codes[level][levels.codes]
+    return levels.level_labels[level][codes].tolist()
+
+
+def test_continuous_levels_start_from_the_smallest_gap():
+    levels = recoding.continuous_levels(pd.Series(np.linspace(0, 1, 11)))
+    # 0-1 közötti értékek: az első szint még sok intervallumot tartalmaz, és csak a legfelső szint egyetlen '*'
+    assert len(set(level_values(levels, 1))) == 9
+    assert len(levels.level_codes) > 4
+    assert set(level_values(levels, len(levels.level_codes) - 1)) == {'*'}
+
+
+def test_integer_levels_keep_width_two_first_level():
+    levels = recoding.continuous_levels(pd.Series([20, 21, 22, 23, 30]))
+    assert level_values(levels, 1) == ['20 - 21', '20 - 21', '22 - 23', '22 - 23', '30 - 31']
+
+
+def test_full_domain_generalisation_rejects_parallel_options():
+    df = pd.DataFrame({'age': [20, 21, 22, 23], 'disease': ['a', 'b', 'a', 'b']})
+    workdata = WorkData(df, 'disease', 2, 2, 0.5, categorical={'disease'}, feature_columns=['age'])
+    with pytest.raises(ValueError):
+        anonymisation.anonymise_dataset(workdata, 'g', workers=4)
+    with pytest.raises(ValueError):
+        anonymisation.anonymise_dataset(workdata, 'g', subtree_size=100)
+    assert anonymisation.anonymise_dataset(workdata, 'g', workers=1)['age'].tolist() == ['20 - 21', '20 - 21',
+                                                                                       '22 - 23', '22 - 23']
+
+
+def test_lattice_search_does_not_depend_on_cache_size():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'age': rng.integers(0, 90, size=300), 'zip': rng.integers(1000, 1400, size=300),
+                       'sex': rng.choice(['f', 'm'], size=300)})
+    levels = [recoding.column_levels(df, 'age', False), recoding.column_levels(df, 'zip', False),
+              recoding.column_levels(df, 'sex', True)]
+    node, (_, counts) = recoding.search_lattice(levels, 5)
+    for cache_size in (1, 2, 4):
+        other, (_, other_counts) = recoding.search_lattice(levels, 5, cache_size=cache_size)
+        assert other == node
+        assert sorted(other_counts) == sorted(counts)
+
+
+def test_full_domain_generalisation_rejects_tables_smaller_than_k():
+    df = pd.DataFrame({'age': [20, 30, 40], 'disease': ['a', 'b', 'c']})
+    workdata = WorkData(df, 'disease', 5, 2, 0.5, categorical={'disease'}, feature_columns=['age'])
+    with pytest.raises(ValueError):
+        anonymisation.anonymise_dataset(workdata, 'g')